@@ -1,8 +1,11 @@
 from abc import ABC, abstractmethod
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 import asyncio
+from app.adapters.effects import InboundEffects, TYPING
 
 class BaseAdapter(ABC):
+    platform = "generic"
+
     @abstractmethod
     async def send_message(self, recipient_id: str, text: str, **kwargs) -> Dict[str, Any]:
         pass
@@ -12,6 +15,21 @@ class BaseAdapter(ABC):
         # Left empty as not all platforms support or require an explicit 'off' signal.
         pass
 
+    def _plan_effects(self, effects: InboundEffects) -> Optional[List[dict]]:
+        # Returns the merged status API payloads, or None if the platform has no status API.
+        return None
+
+    async def apply_inbound_effects(self, effects: InboundEffects):
+        calls = self._plan_effects(effects)
+        if calls is None:
+            if effects.wants(TYPING):
+                await self.send_typing_on(effects.recipient_id, message_id=effects.message_id)
+            return
+
+        for payload in calls:
+            await self._post(payload)
+        effects.record(self.platform, len(calls))
+
     async def send_typing_off(self, recipient_id: str):
         # Base implementation for turning off typing indicators.
         # Left empty as not all platforms support or require an explicit 'off' signal.
@@ -19,4 +37,9 @@ class BaseAdapter(ABC):
     
     async def send_feedback_request(self, recipient_id: str, answer_id: int) -> Dict[str, Any]:
         await asyncio.sleep(0)
-        return {"sent": False, "reason": "Not implemented"}
\ No newline at end of file
+        return {"sent": False, "reason": "Not implemented"}
+
+    async def redeliver(self, payload: dict) -> Dict[str, Any]:
+        # Replays a dead-lettered send; payload is whatever the adapter stored when it gave up.
+        await asyncio.sleep(0)
+        return {"sent": False, "error": "Not implemented", "retryable": False}
\ No newline at end of file
@@ -0,0 +1,47 @@
+from typing import Dict, Optional
+from app.core.metrics import metrics
+
+READ = "read"
+TYPING = "typing"
+REACTION = "reaction"
+
+class InboundEffects:
+    """Status side effects requested for one inbound message.
+
+    Requests are collected first and handed to the adapter in one go, so it can
+    merge equivalent actions (e.g. WhatsApp's typing indicator already marks the
+    message as read) into the fewest Graph API calls.
+    """
+
+    def __init__(self, recipient_id: str, message_id: Optional[str] = None):
+        self.recipient_id = recipient_id
+        self.message_id = message_id
+        self.requested = 0
+        self._actions: Dict[str, Optional[str]] = {}
+
+    def _add(self, action: str, value: Optional[str] = None) -> "InboundEffects":
+        self.requested += 1
+        self._actions[action] = value
+        return self
+
+    def mark_read(self) -> "InboundEffects":
+        return self._add(READ)
+
+    def typing(self) -> "InboundEffects":
+        return self._add(TYPING)
+
+    def react(self, emoji: str) -> "InboundEffects":
+        return self._add(REACTION, emoji)
+
+    def wants(self, action: str) -> bool:
+        return action in self._actions
+
+    @property
+    def reaction(self) -> Optional[str]:
+        return self._actions.get(REACTION)
+
+    def record(self, platform: str, calls: int):
+        saved = self.requested - calls
+        metrics.inc("inbound_effect_calls", calls, platform=platform)
+        if saved > 0:
+            metrics.inc("inbound_effect_calls_saved", saved, platform=platform)
@@ -0,0 +1,101 @@
+import asyncio
+import threading
+import time
+import logging
+import msal
+from typing import Optional
+from app.core.config import settings
+
+logger = logging.getLogger("adapters.email.auth")
+
+GRAPH_SCOPES = ["https://graph.microsoft.com/.default"]
+
+class GraphTokenProvider:
+    """Single Azure Graph app-token source shared by the email listener and sender.
+
+    Holds one MSAL application, refreshes proactively before expiry and lets
+    concurrent callers (threads or coroutines) wait on a single refresh.
+    """
+
+    def __init__(self, client_id: Optional[str], client_secret: Optional[str], tenant_id: Optional[str]):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.tenant_id = tenant_id
+        self._app: Optional[msal.ConfidentialClientApplication] = None
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+        self._refresh_task: Optional[asyncio.Future] = None
+
+    @classmethod
+    def from_settings(cls) -> "GraphTokenProvider":
+        return cls(settings.AZURE_CLIENT_ID, settings.AZURE_CLIENT_SECRET, settings.AZURE_TENANT_ID)
+
+    @property
+    def configured(self) -> bool:
+        return all([self.client_id, self.client_secret, self.tenant_id])
+
+    def _is_fresh(self, margin: float = 60) -> bool:
+        return self._token is not None and self._expires_at > time.time() + margin
+
+    def _msal_app(self) -> msal.ConfidentialClientApplication:
+        if self._app is None:
+            self._app = msal.ConfidentialClientApplication(
+                self.client_id,
+                authority=f"https://login.microsoftonline.com/{self.tenant_id}",
+                client_credential=self.client_secret,
+            )
+        return self._app
+
+    def _acquire(self) -> Optional[str]:
+        try:
+            result = self._msal_app().acquire_token_for_client(scopes=GRAPH_SCOPES)
+        except Exception as e:
+            logger.error(f"Azure Auth Exception: {e}")
+            return None
+
+        if "access_token" not in result:
+            logger.error(f"Failed to acquire Graph token: {result.get('error_description')}")
+            return None
+
+        self._token = result["access_token"]
+        self._expires_at = time.time() + result.get("expires_in", 3500)
+        if result.get("token_source") != "cache":
+            logger.info("New Azure OAuth2 token acquired.")
+        return self._token
+
+    def get_token_sync(self, min_validity: float = 60) -> Optional[str]:
+        if self._is_fresh(min_validity):
+            return self._token
+        if not self.configured:
+            logger.error("Azure credentials not fully configured.")
+            return None
+        with self._lock:
+            if self._is_fresh(min_validity):
+                return self._token
+            return self._acquire()
+
+    async def get_token(self, min_validity: float = 60) -> Optional[str]:
+        if self._is_fresh(min_validity):
+            return self._token
+
+        loop = asyncio.get_running_loop()
+        task = self._refresh_task
+        if task is None or task.done() or task.get_loop() is not loop:
+            task = self._refresh_task = asyncio.ensure_future(asyncio.to_thread(self.get_token_sync, min_validity))
+        return await asyncio.shield(task)
+
+    async def run_refresher(self):
+        if not self.configured:
+            return
+        logger.info("Graph token refresher started")
+        margin = settings.AZURE_TOKEN_REFRESH_MARGIN_SECONDS
+        while True:
+            token = await self.get_token(min_validity=margin)
+            if token is None:
+                await asyncio.sleep(30)
+                continue
+            # Wake up `margin` seconds before expiry, but never spin on a cached token.
+            await asyncio.sleep(max(self._expires_at - time.time() - margin, 30))
+
+graph_tokens = GraphTokenProvider.from_settings()
@@ -0,0 +1,135 @@
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Mapping, Optional
+from app.core.config import settings
+from app.core.http import http_clients
+from app.core.metrics import metrics
+
+logger = logging.getLogger("adapters.email.batch")
+
+MAX_BATCH_REQUESTS = 20
+
+class GraphBatch:
+    """Groups mailbox operations into Graph JSON $batch requests (20 per HTTP call).
+
+    Operations are queued with `mark_read`, `move` or `categorize` and sent on
+    `flush()`. Each sub-response is handled on its own: throttled (429) and 5xx
+    operations stay queued for a later flush, up to `max_attempts` sends, and a
+    Retry-After holds every flush until it has passed. Other failures are logged
+    and dropped.
+    """
+
+    def __init__(self, user_id: str, token_getter: Callable[[], Awaitable[Optional[str]]], max_attempts: int = None):
+        self.user_id = user_id
+        self.token_getter = token_getter
+        self.max_attempts = max_attempts or settings.GRAPH_BATCH_MAX_ATTEMPTS
+        self._pending: List[Dict[str, Any]] = []
+        self._attempts: Dict[str, int] = {}
+        self._not_before = 0.0
+        self._seq = 0
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def _add(self, method: str, path: str, body: Optional[dict] = None) -> str:
+        self._seq += 1
+        op = {"id": str(self._seq), "method": method, "url": path}
+        if body is not None:
+            op["body"] = body
+            op["headers"] = {"Content-Type": "application/json"}
+        self._pending.append(op)
+        return op["id"]
+
+    def mark_read(self, message_id: str) -> str:
+        return self._add("PATCH", f"/users/{self.user_id}/messages/{message_id}", {"isRead": True})
+
+    def move(self, message_id: str, destination_id: str) -> str:
+        return self._add("POST", f"/users/{self.user_id}/messages/{message_id}/move", {"destinationId": destination_id})
+
+    def categorize(self, message_id: str, categories: List[str]) -> str:
+        return self._add("PATCH", f"/users/{self.user_id}/messages/{message_id}", {"categories": categories})
+
+    async def flush(self) -> Dict[str, Dict[str, Any]]:
+        if not self._pending:
+            return {}
+        if time.monotonic() < self._not_before:
+            return {}
+        token = await self.token_getter()
+        if not token:
+            logger.warning(f"No Graph token, keeping {len(self._pending)} mailbox operations queued")
+            return {}
+
+        pending, self._pending = self._pending, []
+        results: Dict[str, Dict[str, Any]] = {}
+        for i in range(0, len(pending), MAX_BATCH_REQUESTS):
+            chunk = pending[i:i + MAX_BATCH_REQUESTS]
+            results.update(await self._send(chunk, token))
+        return results
+
+    async def _send(self, chunk: List[Dict[str, Any]], token: str) -> Dict[str, Dict[str, Any]]:
+        by_id = {op["id"]: op for op in chunk}
+        url = f"{settings.GRAPH_API_BASE_URL}/$batch"
+        try:
+            resp = await http_clients.client_for(url).post(
+                url,
+                json={"requests": chunk},
+                headers={"Authorization": f"Bearer {token}", "Content-Type": "application/json"},
+                timeout=settings.GRAPH_BATCH_TIMEOUT_SECONDS
+            )
+        except Exception as e:
+            logger.error(f"Graph $batch request failed: {e}")
+            for op in chunk:
+                self._retry(op, "transport error")
+            return {}
+
+        if resp.status_code != 200:
+            logger.error(f"Graph $batch error {resp.status_code}: {resp.text}")
+            if resp.status_code == 429 or resp.status_code >= 500:
+                self._defer(resp.headers)
+                for op in chunk:
+                    self._retry(op, resp.status_code)
+            else:
+                for op in chunk:
+                    self._attempts.pop(op["id"], None)
+            return {}
+
+        results = {}
+        for sub in resp.json().get("responses", []):
+            op = by_id.get(str(sub.get("id")))
+            if op is None:
+                continue
+            status = int(sub.get("status", 0))
+            results[op["id"]] = sub
+            if status == 429 or status >= 500:
+                self._defer(sub.get("headers") or {})
+                self._retry(op, status)
+                continue
+            self._attempts.pop(op["id"], None)
+            if 200 <= status < 300:
+                metrics.inc("graph_batch_ops", outcome="ok")
+            else:
+                metrics.inc("graph_batch_ops", outcome="failed")
+                logger.warning(f"Graph batch op {op['method']} {op['url']} failed ({status}): {sub.get('body')}")
+        metrics.inc("graph_batch_requests")
+        return results
+
+    def _retry(self, op: Dict[str, Any], reason: Any):
+        attempts = self._attempts.get(op["id"], 0) + 1
+        if attempts >= self.max_attempts:
+            self._attempts.pop(op["id"], None)
+            metrics.inc("graph_batch_ops", outcome="dropped")
+            logger.error(f"Graph batch op {op['method']} {op['url']} dropped after {attempts} attempts ({reason})")
+            return
+        self._attempts[op["id"]] = attempts
+        metrics.inc("graph_batch_ops", outcome="requeued")
+        self._pending.append(op)
+
+    def _defer(self, headers: Mapping[str, str]):
+        # Batch sub-responses carry plain dict headers, so match the name case-insensitively.
+        value = next((v for k, v in headers.items() if k.lower() == "retry-after"), None)
+        try:
+            delay = float(value) if value is not None else 0.0
+        except (TypeError, ValueError):
+            return
+        if delay > 0:
+            self._not_before = max(self._not_before, time.monotonic() + delay)
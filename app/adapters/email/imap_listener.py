@@ -0,0 +1,279 @@
+import asyncio
+import email
+import random
+import re
+import logging
+from email.header import decode_header, make_header
+from email.message import Message
+from email.utils import parseaddr
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import aioimaplib
+
+from app.core.config import settings
+from app.core.exceptions import AdapterError
+from app.core.metrics import metrics
+from app.adapters.email.utils import sanitize_email_body_async
+from app.services.dedup import InboundDeduplicator, inbound_dedup
+from app.repositories.sync_state import SyncStateRepository
+
+logger = logging.getLogger("email.imap")
+
+HEADER_FIELDS = "FROM SUBJECT MESSAGE-ID IN-REPLY-TO REFERENCES CONTENT-TYPE CONTENT-TRANSFER-ENCODING MIME-VERSION"
+
+_FETCH_START = re.compile(rb"^\d+ FETCH ")
+_UID = re.compile(rb"UID (\d+)")
+_UIDVALIDITY = re.compile(rb"UIDVALIDITY (\d+)")
+
+EmailHandler = Callable[[str, str, Dict[str, Any]], Awaitable[None]]
+
+def _decode(value: Optional[str]) -> str:
+    if not value:
+        return ""
+    try:
+        return str(make_header(decode_header(value)))
+    except Exception:
+        return str(value)
+
+def parse_fetch_response(lines: List[Any]) -> List[Tuple[int, bytes, bytes]]:
+    """Turns an aioimaplib UID FETCH response into (uid, header bytes, partial text bytes)."""
+    records: List[Dict[str, Any]] = []
+    current: Optional[Dict[str, Any]] = None
+    pending: Optional[str] = None
+
+    for line in lines:
+        if isinstance(line, bytearray):
+            # Literal payload for the section announced on the previous line.
+            if current is not None and pending:
+                current[pending] = bytes(line)
+            pending = None
+            continue
+
+        if _FETCH_START.match(line):
+            current = {"uid": None, "header": b"", "text": b""}
+            records.append(current)
+        if current is None:
+            continue
+
+        uid = _UID.search(line)
+        if uid:
+            current["uid"] = int(uid.group(1))
+        if line.endswith(b"}"):
+            section = line[line.rfind(b"BODY["):]
+            pending = "header" if b"HEADER" in section else "text" if b"TEXT" in section else None
+
+    return [(r["uid"], r["header"], r["text"]) for r in records if r["uid"] is not None]
+
+def _extract_parts(msg: Message) -> Tuple[Optional[str], Optional[str]]:
+    plain, html = None, None
+    for part in msg.walk():
+        if part.is_multipart() or part.get_content_disposition() == "attachment":
+            continue
+        content_type = part.get_content_type()
+        if content_type not in ("text/plain", "text/html"):
+            continue
+        payload = part.get_payload(decode=True) or b""
+        text = payload.decode(part.get_content_charset() or "utf-8", errors="replace")
+        if content_type == "text/plain" and plain is None:
+            plain = text
+        elif content_type == "text/html" and html is None:
+            html = text
+    return plain, html
+
+def parse_message(header: bytes, text: bytes) -> Tuple[str, Optional[str], Optional[str], Dict[str, Any]]:
+    """Builds (sender, plain, html, metadata) from the peeked header fields and body prefix."""
+    msg = email.message_from_bytes(header.rstrip(b"\r\n") + b"\r\n\r\n" + text)
+    sender_name, sender_email = parseaddr(_decode(msg.get("From")))
+
+    message_id = (msg.get("Message-ID") or "").strip()
+    in_reply_to = (msg.get("In-Reply-To") or "").strip()
+    references = " ".join((msg.get("References") or "").split())
+    thread_refs = references.split() or in_reply_to.split()
+
+    plain, html = _extract_parts(msg)
+    metadata = {
+        "subject": _decode(msg.get("Subject")) or "No Subject",
+        "sender_name": sender_name,
+        "message_id": message_id,
+        "references": f"{references} {message_id}".strip(),
+        "thread_key": thread_refs[0] if thread_refs else message_id
+    }
+    return sender_email, plain, html, metadata
+
+class ImapIdleListener:
+    """Inbound mail for IMAP providers (gmail) over one persistent IDLE session.
+
+    New UIDs are fetched in bulk with BODY.PEEK (selected header fields plus the
+    first `peek_bytes` of the body), handed to the listener's worker queue, then
+    flagged \\Seen. The `uidvalidity:uid` cursor is kept in `bkpm.email_sync_state`
+    so a reconnect or restart only fetches what arrived since. Connection failures
+    reconnect with capped exponential backoff.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        username: Optional[str],
+        password: Optional[str],
+        mailbox: str = "INBOX",
+        use_ssl: bool = True,
+        dedup: Optional[InboundDeduplicator] = None,
+        sync_repo: Optional[SyncStateRepository] = None,
+        idle_timeout: float = 1500.0,
+        fetch_batch: int = 50,
+        peek_bytes: int = 65536,
+        max_backoff: float = 300.0,
+        timeout: float = 30.0
+    ):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.mailbox = mailbox
+        self.use_ssl = use_ssl
+        self.dedup = dedup or inbound_dedup
+        self.sync_repo = sync_repo or SyncStateRepository()
+        self.idle_timeout = idle_timeout
+        self.fetch_batch = fetch_batch
+        self.peek_bytes = peek_bytes
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self._uidvalidity = "0"
+        self._ready = False
+
+    @classmethod
+    def from_settings(cls) -> "ImapIdleListener":
+        return cls(
+            host=settings.IMAP_HOST,
+            port=settings.IMAP_PORT,
+            username=settings.EMAIL_USER,
+            password=settings.EMAIL_PASS,
+            mailbox=settings.IMAP_MAILBOX,
+            use_ssl=settings.IMAP_USE_SSL,
+            idle_timeout=settings.IMAP_IDLE_TIMEOUT_SECONDS,
+            fetch_batch=settings.IMAP_FETCH_BATCH,
+            peek_bytes=settings.IMAP_BODY_PEEK_BYTES,
+            max_backoff=settings.IMAP_RECONNECT_MAX_SECONDS
+        )
+
+    @property
+    def _state_key(self) -> str:
+        return f"imap:{self.username}:{self.mailbox}"
+
+    async def run(self, queue: asyncio.Queue, on_message: EmailHandler):
+        if not self.username or not self.password:
+            logger.warning("IMAP listener needs EMAIL_USER and EMAIL_PASS")
+            return
+        backoff = 1.0
+        while True:
+            self._ready = False
+            try:
+                await self._session(queue, on_message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                metrics.inc("imap_reconnects")
+                if self._ready:
+                    # The session did come up, so this is a fresh outage.
+                    backoff = 1.0
+                delay = random.uniform(backoff / 2, backoff)
+                logger.warning(f"IMAP session lost ({e}), reconnecting in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                backoff = min(backoff * 2, self.max_backoff)
+
+    async def _connect(self) -> aioimaplib.IMAP4:
+        if self.use_ssl:
+            client = aioimaplib.IMAP4_SSL(host=self.host, port=self.port, timeout=self.timeout)
+        else:
+            client = aioimaplib.IMAP4(host=self.host, port=self.port, timeout=self.timeout)
+        await client.wait_hello_from_server()
+
+        resp = await client.login(self.username, self.password)
+        if resp.result != "OK":
+            raise AdapterError(f"IMAP login failed: {resp.lines}")
+        resp = await client.select(self.mailbox)
+        if resp.result != "OK":
+            raise AdapterError(f"IMAP select {self.mailbox} failed: {resp.lines}")
+
+        self._uidvalidity = next(
+            (m.group(1).decode() for m in map(_UIDVALIDITY.search, resp.lines) if m), "0"
+        )
+        self._ready = True
+        logger.info(f"IMAP session ready on {self.host}:{self.port}/{self.mailbox}")
+        return client
+
+    async def _load_cursor(self) -> Optional[int]:
+        state = await asyncio.to_thread(self.sync_repo.get, self._state_key)
+        if not state:
+            return None
+        uidvalidity, _, uid = state.partition(":")
+        if uidvalidity != self._uidvalidity:
+            logger.warning("IMAP UIDVALIDITY changed, resyncing from unseen mail")
+            return None
+        return int(uid)
+
+    async def _session(self, queue: asyncio.Queue, on_message: EmailHandler):
+        client = await self._connect()
+        try:
+            last_uid = await self._load_cursor()
+            idle = client.has_capability("IDLE")
+            while True:
+                last_uid = await self._fetch_new(client, queue, on_message, last_uid)
+                await self._wait_for_mail(client, idle)
+        finally:
+            try:
+                await asyncio.wait_for(client.logout(), 5)
+            except Exception:
+                pass
+
+    async def _wait_for_mail(self, client: aioimaplib.IMAP4, idle: bool):
+        if not idle:
+            await asyncio.sleep(settings.EMAIL_POLL_INTERVAL_SECONDS)
+            return
+        idle_task = await client.idle_start(timeout=self.idle_timeout)
+        try:
+            await client.wait_server_push(timeout=self.idle_timeout + self.timeout)
+        finally:
+            client.idle_done()
+            await asyncio.wait_for(idle_task, self.timeout)
+
+    async def _search(self, client: aioimaplib.IMAP4, last_uid: Optional[int]) -> List[int]:
+        criteria = f"UID {last_uid + 1}:*" if last_uid is not None else "UNSEEN"
+        resp = await client.uid_search(criteria, charset=None)
+        if resp.result != "OK":
+            raise AdapterError(f"IMAP search failed: {resp.lines}")
+        # The last line is the tagged status text, everything before it holds UIDs.
+        uids = [int(tok) for line in resp.lines[:-1] for tok in line.split() if tok.isdigit()]
+        # "N:*" always matches the newest message, even when it is older than N.
+        return sorted(uid for uid in set(uids) if last_uid is None or uid > last_uid)
+
+    async def _fetch_new(self, client: aioimaplib.IMAP4, queue: asyncio.Queue, on_message: EmailHandler, last_uid: Optional[int]) -> Optional[int]:
+        uids = await self._search(client, last_uid)
+        parts = f"(UID BODY.PEEK[HEADER.FIELDS ({HEADER_FIELDS})] BODY.PEEK[TEXT]<0.{self.peek_bytes}>)"
+
+        for i in range(0, len(uids), self.fetch_batch):
+            chunk = uids[i:i + self.fetch_batch]
+            uid_set = ",".join(map(str, chunk))
+            resp = await client.uid("fetch", uid_set, parts)
+            if resp.result != "OK":
+                raise AdapterError(f"IMAP fetch failed: {resp.lines}")
+
+            for uid, header, text in parse_fetch_response(resp.lines):
+                await queue.put(partial(self._handle, uid, header, text, on_message))
+            # Flag and advance the cursor only once the chunk has been handled.
+            await queue.join()
+            await client.uid("store", uid_set, "+FLAGS.SILENT", "(\\Seen)")
+            last_uid = chunk[-1]
+            await asyncio.to_thread(self.sync_repo.set, self._state_key, f"{self._uidvalidity}:{last_uid}")
+            metrics.inc("imap_messages_fetched", len(chunk))
+        return last_uid
+
+    async def _handle(self, uid: int, header: bytes, text: bytes, on_message: EmailHandler):
+        sender, plain, html, metadata = await asyncio.to_thread(parse_message, header, text)
+        unique_id = metadata["message_id"] or f"imap:{self._uidvalidity}:{uid}"
+        if await self.dedup.is_duplicate(unique_id, "email"):
+            return
+        body = await sanitize_email_body_async(plain, html)
+        await on_message(sender, body, metadata)
@@ -1,82 +1,67 @@
-import imaplib
-import email
-import time
 import asyncio
+import time
 import logging
-import msal
-import requests
-from email.header import decode_header
-from typing import Dict, Any, Optional
+from functools import partial
+from datetime import datetime, timedelta, timezone
+from typing import Optional
 
 from app.core.config import settings
-from app.adapters.email.utils import sanitize_email_body
-from app.repositories.message import MessageRepository
+from app.core.http import http_clients
+from app.core.metrics import metrics
+from app.adapters.email.utils import sanitize_email_body_async
+from app.adapters.email.auth import graph_tokens
+from app.adapters.email.graph_batch import GraphBatch
+from app.adapters.email.subscriptions import graph_subscriptions
+from app.adapters.email.imap_listener import ImapIdleListener
+from app.repositories.sync_state import SyncStateRepository
 from app.api.dependencies import get_orchestrator
+from app.services.dedup import inbound_dedup
 from app.schemas.models import IncomingMessage
 
 logger = logging.getLogger("email.listener")
-repo = MessageRepository()
-_token_cache: Dict[str, Any] = {}
-
-def get_graph_token() -> Optional[str]:
-    global _token_cache
-    if _token_cache and _token_cache.get("expires_at", 0) > time.time() + 60:
-        return _token_cache.get("access_token")
-    if not all([settings.AZURE_CLIENT_ID, settings.AZURE_CLIENT_SECRET, settings.AZURE_TENANT_ID]):
-        return None
-    try:
-        app = msal.ConfidentialClientApplication(
-            settings.AZURE_CLIENT_ID,
-            authority=f"https://login.microsoftonline.com/{settings.AZURE_TENANT_ID}",
-            client_credential=settings.AZURE_CLIENT_SECRET,
-        )
-        result = app.acquire_token_for_client(scopes=["https://graph.microsoft.com/.default"])
-        if "access_token" in result:
-            _token_cache = {
-                "access_token": result["access_token"],
-                "expires_at": time.time() + result.get("expires_in", 3500)
-            }
-            return result["access_token"]
-        return None
-    except Exception: return None
-
-def _mark_graph_read(user_id, message_id, token):
-    url = f"https://graph.microsoft.com/v1.0/users/{user_id}/messages/{message_id}"
-    try:
-        requests.patch(url, json={"isRead": True}, headers={"Authorization": f"Bearer {token}", "Content-Type": "application/json"}, timeout=5)
-    except Exception: pass
+sync_repo = SyncStateRepository()
+_batch: Optional[GraphBatch] = None
+_poll_interval: float = settings.EMAIL_POLL_MIN_INTERVAL_SECONDS
 
-def _process_graph_message(user_id, msg, token):
+GRAPH_MESSAGE_FIELDS = "id,conversationId,subject,from,body"
+GRAPH_PAGE_SIZE = 50
+
+async def get_graph_token() -> Optional[str]:
+    return await graph_tokens.get_token()
+
+def _mailbox_batch() -> GraphBatch:
+    global _batch
+    if _batch is None:
+        _batch = GraphBatch(settings.AZURE_EMAIL_USER, get_graph_token)
+    return _batch
+
+async def _process_graph_message(msg):
     graph_id = msg.get("id")
-    azure_conv_id = msg.get("conversationId") 
-    
-    if not graph_id: return
+    azure_conv_id = msg.get("conversationId")
 
-    if repo.is_processed(graph_id, "email"):
-        logger.warning(f"DUPLIKASI DITOLAK: {graph_id}. Menandai sebagai Read.")
-        _mark_graph_read(user_id, graph_id, token)
+    if await inbound_dedup.is_duplicate(graph_id, "email"):
         return
 
-    _mark_graph_read(user_id, graph_id, token)
-
-    clean_body = _extract_graph_body(msg)
+    clean_body = await _extract_graph_body(msg)
     sender_info = msg.get("from", {}).get("emailAddress", {})
-    
+
     metadata = {
         "subject": msg.get("subject", "No Subject"),
         "sender_name": sender_info.get("name", ""),
         "graph_message_id": graph_id,
-        "conversation_id": azure_conv_id 
+        "conversation_id": azure_conv_id
     }
 
-    process_single_email(sender_info.get("address", ""), clean_body, metadata)
+    await process_single_email(sender_info.get("address", ""), clean_body, metadata)
 
-def _extract_graph_body(msg):
+async def _extract_graph_body(msg):
     body_content = msg.get("body", {}).get("content", "")
     body_type = msg.get("body", {}).get("contentType", "Text")
-    return sanitize_email_body(None, body_content) if body_type.lower() == "html" else sanitize_email_body(body_content, None)
+    if body_type.lower() == "html":
+        return await sanitize_email_body_async(None, body_content)
+    return await sanitize_email_body_async(body_content, None)
 
-def process_single_email(sender_email, body, metadata: dict):
+async def process_single_email(sender_email, body, metadata: dict):
     if "mailer-daemon" in sender_email.lower() or "noreply" in sender_email.lower(): return
 
     msg = IncomingMessage(
@@ -85,40 +70,186 @@ def process_single_email(sender_email, body, metadata: dict):
         platform="email",
         metadata=metadata
     )
-    
+
     try:
         orchestrator = get_orchestrator()
-        try: loop = asyncio.get_event_loop()
-        except RuntimeError: 
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-        
-        loop.run_until_complete(orchestrator.process_message(msg))
+        await orchestrator.process_message(msg)
         logger.info(f"Email processed: {sender_email}")
     except Exception as err:
         logger.error(f"Internal Process Error: {err}")
 
-def _poll_graph_api():
-    token = get_graph_token()
-    if not token: return
+async def _enqueue(queue: asyncio.Queue, batch: GraphBatch, msg):
+    if not msg.get("id"): return
+    # Queued now, sent with the cycle's batch flush after queue.join(). A crash before
+    # that flush re-fetches the message next cycle, and inbound dedup skips it.
+    batch.mark_read(msg["id"])
+    await queue.put(partial(_process_graph_message, msg))
+
+async def _graph_get(url: str, token: str, params: Optional[dict] = None, extra_headers: Optional[dict] = None):
+    headers = {"Authorization": f"Bearer {token}"}
+    if extra_headers:
+        headers.update(extra_headers)
+    return await http_clients.client_for(url).get(url, headers=headers, params=params, timeout=20)
+
+async def _poll_graph_api(queue: asyncio.Queue) -> int:
+    token = await get_graph_token()
+    if not token: return 0
     user_id = settings.AZURE_EMAIL_USER
-    url = f"https://graph.microsoft.com/v1.0/users/{user_id}/mailFolders/inbox/messages"
-    params = {"$filter": "isRead eq false", "$top": 10}
+    url = f"{settings.GRAPH_API_BASE_URL}/users/{user_id}/mailFolders/inbox/messages"
+    params = {"$filter": "isRead eq false", "$select": GRAPH_MESSAGE_FIELDS, "$top": GRAPH_PAGE_SIZE}
+    batch = _mailbox_batch()
+    found = 0
     try:
-        resp = requests.get(url, headers={"Authorization": f"Bearer {token}"}, params=params, timeout=20)
-        if resp.status_code == 200:
-            for msg in resp.json().get("value", []):
-                _process_graph_message(user_id, msg, token)
+        # Mark-read is flushed only after the last page, so the unread filter (and the
+        # skip tokens in nextLink) stay stable while we page through the backlog.
+        while url:
+            resp = await _graph_get(url, token, params)
+            if resp.status_code != 200:
+                logger.error(f"Graph Polling Error {resp.status_code}: {resp.text}")
+                break
+            data = resp.json()
+            for msg in data.get("value", []):
+                found += 1
+                await _enqueue(queue, batch, msg)
+            url, params = data.get("@odata.nextLink"), None
+        await queue.join()
     except Exception as e:
         logger.error(f"Graph Polling Error: {e}")
+    finally:
+        await batch.flush()
+    return found
 
-def start_email_listener():
-    if not settings.EMAIL_USER and not settings.AZURE_CLIENT_ID: return
-    logger.info("Starting Email Listener")
+def _delta_start_url(user_id: str) -> str:
+    since = (datetime.now(timezone.utc) - timedelta(hours=settings.EMAIL_DELTA_RESYNC_LOOKBACK_HOURS)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    return (
+        f"{settings.GRAPH_API_BASE_URL}/users/{user_id}/mailFolders/inbox/messages/delta"
+        f"?$filter=receivedDateTime+ge+{since}&$select={GRAPH_MESSAGE_FIELDS},isRead"
+    )
+
+def _is_invalid_delta(resp) -> bool:
+    if resp.status_code == 410:
+        return True
+    if resp.status_code == 400:
+        try:
+            code = resp.json().get("error", {}).get("code", "")
+        except ValueError:
+            code = ""
+        return code in ("syncStateNotFound", "syncStateInvalid", "resyncRequired")
+    return False
+
+async def _poll_graph_delta(queue: asyncio.Queue) -> int:
+    token = await get_graph_token()
+    if not token: return 0
+    user_id = settings.AZURE_EMAIL_USER
+    sync_key = f"graph:{user_id}:inbox"
+    url = await asyncio.to_thread(sync_repo.get, sync_key) or _delta_start_url(user_id)
+    batch = _mailbox_batch()
+    found = 0
+    resynced = False
+    try:
+        while url:
+            resp = await _graph_get(url, token, extra_headers={"Prefer": f"odata.maxpagesize={GRAPH_PAGE_SIZE}"})
+            if _is_invalid_delta(resp):
+                if resynced:
+                    # Even a fresh start was refused; try again next cycle rather than spin on Graph.
+                    logger.error(f"Graph delta resync rejected ({resp.status_code}), retrying next cycle")
+                    break
+                resynced = True
+                logger.warning("Graph delta token invalidated, running a full resync")
+                await asyncio.to_thread(sync_repo.clear, sync_key)
+                url = _delta_start_url(user_id)
+                continue
+            if resp.status_code != 200:
+                logger.error(f"Graph Delta Error {resp.status_code}: {resp.text}")
+                break
+
+            data = resp.json()
+            for msg in data.get("value", []):
+                # Delta also reports deletions and flag changes (including our own mark-as-read).
+                if "@removed" in msg or msg.get("isRead"):
+                    continue
+                found += 1
+                await _enqueue(queue, batch, msg)
+
+            url = data.get("@odata.nextLink")
+            delta_link = data.get("@odata.deltaLink")
+            if delta_link:
+                # Only advance the cursor once everything before it has been handled.
+                await queue.join()
+                await asyncio.to_thread(sync_repo.set, sync_key, delta_link)
+    except Exception as e:
+        logger.error(f"Graph Delta Polling Error: {e}")
+    finally:
+        await batch.flush()
+    return found
+
+async def _poll_once(queue: asyncio.Queue) -> int:
+    if settings.EMAIL_PROVIDER != "azure_oauth2":
+        return 0
+    started = time.monotonic()
+    if settings.EMAIL_SYNC_MODE == "delta":
+        found = await _poll_graph_delta(queue)
+    else:
+        found = await _poll_graph_api(queue)
+    metrics.observe("email_poll_cycle_seconds", time.monotonic() - started)
+    metrics.set_gauge("email_poll_backlog", found)
+    return found
+
+def _next_poll_interval(found: int) -> float:
+    """Polls again quickly while mail keeps arriving, doubling the wait (up to the max) while idle."""
+    global _poll_interval
+    if found:
+        _poll_interval = settings.EMAIL_POLL_MIN_INTERVAL_SECONDS
+    else:
+        _poll_interval = min(max(_poll_interval, 1) * 2, settings.EMAIL_POLL_INTERVAL_SECONDS)
+    metrics.set_gauge("email_poll_interval_seconds", _poll_interval)
+    return _poll_interval
+
+async def _email_worker(queue: asyncio.Queue):
     while True:
+        job = await queue.get()
         try:
-            if settings.EMAIL_PROVIDER == "azure_oauth2":
-                _poll_graph_api()
-        except Exception: 
-            pass
-        time.sleep(settings.EMAIL_POLL_INTERVAL_SECONDS)
\ No newline at end of file
+            await job()
+        except Exception as e:
+            logger.error(f"Email worker error: {e}")
+        finally:
+            queue.task_done()
+
+async def _wait_for_next_poll(found: int) -> bool:
+    """Waits for the next cycle; True if it is a safety poll that no notification asked for."""
+    interval = _next_poll_interval(found)
+    if settings.EMAIL_INGEST_MODE != "push" or settings.EMAIL_PROVIDER != "azure_oauth2":
+        await asyncio.sleep(interval)
+        return False
+    # While push is healthy, poll only on wake-up (plus a slow safety poll) unless the
+    # last cycle found mail; once push has shown a fault, fall back to adaptive polling.
+    safety_poll = graph_subscriptions.healthy() and not found
+    if safety_poll:
+        interval = settings.EMAIL_PUSH_SILENCE_SECONDS
+    notified = await graph_subscriptions.wait_for_mail(interval)
+    return safety_poll and not notified
+
+async def run_email_listener():
+    if not settings.EMAIL_USER and not settings.AZURE_CLIENT_ID: return
+    logger.info(f"Starting Email Listener ({settings.EMAIL_WORKER_CONCURRENCY} workers)")
+    queue: asyncio.Queue = asyncio.Queue(maxsize=settings.EMAIL_WORKER_CONCURRENCY * 2)
+    workers = [asyncio.create_task(_email_worker(queue)) for _ in range(settings.EMAIL_WORKER_CONCURRENCY)]
+    try:
+        if settings.EMAIL_PROVIDER == "gmail":
+            await ImapIdleListener.from_settings().run(queue, process_single_email)
+            return
+        safety_poll = False
+        while True:
+            found = 0
+            try:
+                found = await _poll_once(queue)
+            except Exception as e:
+                logger.error(f"Email Listener Error: {e}")
+            if safety_poll:
+                graph_subscriptions.report_unannounced(found)
+            safety_poll = await _wait_for_next_poll(found)
+    finally:
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        logger.info("Email Listener stopped")
@@ -0,0 +1,237 @@
+"""Linear-time email body sanitizer.
+
+HTML is reduced to text in one tokenizer pass, quoted history is detected line by
+line (no pattern can backtrack across the body), and reading stops as soon as
+the kept text is guaranteed to fill the `max_chars` budget.
+"""
+import asyncio
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from html import unescape
+from itertools import islice
+from typing import Deque, Iterable, Iterator, Optional
+from app.core.config import settings
+
+_WS_RUN = re.compile(r"\s{2,}")
+_ON = re.compile(r"\bon\s")
+_PADA = re.compile(r"\bpada\s")
+_ORIGINAL_MESSAGE = re.compile(r"-{3,}\s*original message\s*-{3,}")
+_RAW_TEXT_END = {
+    "script": re.compile(r"</script>", re.IGNORECASE),
+    "style": re.compile(r"</style>", re.IGNORECASE),
+}
+_LINE_CLOSERS = frozenset(
+    f"</{name}>" for name in ("p", "div", "br", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6")
+)
+# Lines kept in view for multi-line markers (Outlook header blocks, wrapped attributions).
+_LOOKAHEAD = 6
+# (from, sent, to) header labels of Outlook-style reply blocks, English and Indonesian.
+_HEADER_BLOCKS = (
+    ("from:", ("sent:",), ("to:",)),
+    ("dari:", ("kirim:", "dikirim:"), ("kepada:",)),
+)
+
+def _is_bare(tag: str, name_len: int) -> bool:
+    # Matches `<br>`, `<br/>`, `<br />` but not tags with attributes.
+    inner = tag[name_len:-1]
+    if inner.endswith("/"):
+        inner = inner[:-1]
+    return not inner or inner.isspace()
+
+def _text(segment: str) -> str:
+    return unescape(segment) if "&" in segment else segment
+
+def html_pieces(html: str) -> Iterator[str]:
+    """Yields the visible text of `html` in document order, with line breaks for block ends."""
+    pos, end = 0, len(html)
+    find = html.find
+    # Per raw-text kind, the offset after which no closer exists; stops unclosed tags rescanning to the end.
+    unclosed_from = {"script": end + 1, "style": end + 1}
+    while pos < end:
+        lt = find("<", pos)
+        if lt < 0:
+            yield _text(html[pos:])
+            return
+        if lt > pos:
+            yield _text(html[pos:lt])
+        gt = find(">", lt + 1)
+        if gt < 0:
+            yield _text(html[lt:])
+            return
+        if gt == lt + 1:
+            yield "<"
+            pos = lt + 1
+            continue
+
+        tag = html[lt:gt + 1].lower()
+        pos = gt + 1
+        if tag in _LINE_CLOSERS or (tag.startswith("<br") and _is_bare(tag, 3)):
+            yield "\n"
+        elif tag.startswith("<hr") and _is_bare(tag, 3):
+            yield "\n__\n"
+        elif tag.startswith("<script") or tag.startswith("<style"):
+            kind = "script" if tag[2] == "c" else "style"
+            closing = _RAW_TEXT_END[kind].search(html, pos) if pos < unclosed_from[kind] else None
+            if closing:
+                pos = closing.end()
+            else:
+                unclosed_from[kind] = min(unclosed_from[kind], pos)
+                yield " "
+        else:
+            yield " "
+
+def iter_lines(pieces: Iterable[str]) -> Iterator[str]:
+    """Re-chunks a stream of text pieces into lines, skipping leading blank space."""
+    buf = []
+    started = False
+    for piece in pieces:
+        if not started:
+            piece = piece.lstrip()
+            if not piece:
+                continue
+            started = True
+        start = 0
+        while True:
+            nl = piece.find("\n", start)
+            if nl < 0:
+                if start < len(piece):
+                    buf.append(piece[start:])
+                break
+            buf.append(piece[start:nl])
+            yield "".join(buf)
+            buf = []
+            start = nl + 1
+    if started:
+        yield "".join(buf)
+
+def _attribution_cut(low: str, next_line: Optional[str]) -> int:
+    """Start of an "On <date>, <name> wrote:" / "Pada ... menulis:" attribution, or -1."""
+    cuts = []
+    wrote = max(low.rfind("wrote"), low.rfind("menulis"))
+    if wrote >= 0:
+        match = _ON.search(low, 0, wrote)
+        if match:
+            cuts.append(match.start())
+    menulis = low.rfind("menulis:")
+    if menulis >= 0:
+        match = _PADA.search(low, 0, menulis)
+        if match:
+            cuts.append(match.start())
+    if cuts:
+        return min(cuts)
+
+    # Gmail wraps long attributions: "On Mon, 1 Jan 2024 at 10:00, Name <\nname@x.com> wrote:"
+    if next_line is not None:
+        head = low.lstrip()
+        if head.startswith(("on ", "pada ")):
+            tail = next_line.rstrip().lower()
+            if tail.endswith(("wrote:", "menulis:")):
+                return len(low) - len(head)
+    return -1
+
+def _header_block(window: Deque[str]) -> bool:
+    """True when window[0] opens a From:/Sent:/To: (or Dari:/Kirim:/Kepada:) reply header.
+
+    Labels may follow on the same line or start one of the next non-blank lines
+    (Outlook HTML leaves blank lines between them).
+    """
+    head = window[0].lstrip().lower()
+    for first, seconds, thirds in _HEADER_BLOCKS:
+        if not head.startswith(first):
+            continue
+        following = (line.lstrip().lower() for line in islice(window, 1, None))
+        following = (line for line in following if line)
+        rest = head[len(first):]
+        for labels in (seconds, thirds):
+            found = min((i for i in (rest.find(label) for label in labels) if i >= 0), default=-1)
+            if found >= 0:
+                rest = rest[found:]
+                continue
+            rest = next(following, "")
+            if not rest.startswith(labels):
+                return False
+        return True
+    return False
+
+def _quote_cut(window: Deque[str], first: bool) -> int:
+    line = window[0]
+    low = line.lower()
+    if not first:
+        head = low.lstrip()
+        if head.startswith((">", "___")) or (head.startswith("---") and _ORIGINAL_MESSAGE.match(head)):
+            return 0
+    if _header_block(window):
+        return 0
+    return _attribution_cut(low, window[1] if len(window) > 1 else None)
+
+def kept_lines(lines: Iterable[str], budget: Optional[int] = None) -> Iterator[str]:
+    """Yields lines up to the first quoted-history marker.
+
+    Stops early once `budget` non-whitespace characters have been kept: whitespace
+    collapsing never shortens text below that, so later lines cannot reach the output.
+    """
+    it = iter(lines)
+    window: Deque[str] = deque()
+    kept = 0
+    first = True
+    while True:
+        while len(window) < _LOOKAHEAD:
+            try:
+                window.append(next(it))
+            except StopIteration:
+                break
+        if not window:
+            return
+
+        cut = _quote_cut(window, first)
+        if cut >= 0:
+            yield window[0][:cut]
+            return
+        line = window.popleft()
+        yield line
+        first = False
+        if budget is not None:
+            kept += sum(map(len, line.split()))
+            if kept >= budget:
+                return
+
+def html_to_text(html: str) -> str:
+    if not html: return ""
+    return "\n".join(iter_lines(html_pieces(html))).strip()
+
+def strip_quoted(text: str) -> str:
+    if not text: return ""
+    return "\n".join(kept_lines(iter_lines((text,)))).strip()
+
+def sanitize(text_plain: Optional[str], html: Optional[str], max_chars: Optional[int] = None) -> str:
+    if max_chars is None:
+        max_chars = settings.MAX_INPUT_CHARS
+    pieces = (text_plain,) if text_plain else html_pieces(html or "")
+    # +2: the last kept whitespace run may still merge with text we never read.
+    body = "\n".join(kept_lines(iter_lines(pieces), budget=max_chars + 2)).strip()
+    return _WS_RUN.sub(" ", body)[:max_chars].strip()
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+def _offload_pool() -> Optional[ProcessPoolExecutor]:
+    global _pool
+    if settings.EMAIL_SANITIZE_PROCESS_WORKERS <= 0:
+        return None
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=settings.EMAIL_SANITIZE_PROCESS_WORKERS)
+    return _pool
+
+async def sanitize_async(text_plain: Optional[str], html: Optional[str], max_chars: Optional[int] = None) -> str:
+    """Runs `sanitize` off the event loop; bodies over EMAIL_SANITIZE_OFFLOAD_CHARS go to the process pool."""
+    if max_chars is None:
+        max_chars = settings.MAX_INPUT_CHARS
+    size = len(text_plain) if text_plain else len(html or "")
+    pool = _offload_pool() if size >= settings.EMAIL_SANITIZE_OFFLOAD_CHARS else None
+    return await asyncio.get_running_loop().run_in_executor(pool, sanitize, text_plain, html, max_chars)
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
@@ -1,56 +1,30 @@
-import smtplib
-import httpx
+import aiosmtplib
 import logging
-import time
-import re
-import msal
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.utils import make_msgid
-from typing import Optional, Dict, Any
 
 from app.core.config import settings
 from app.adapters.base import BaseAdapter
+from app.core.http import HttpClientRegistry
+from app.adapters.rendering import render
+from app.adapters.email.smtp_pool import SmtpSessionPool
+from app.adapters.email.auth import GraphTokenProvider
+from app.services.retry import DeadLetterOutbox
 
 logger = logging.getLogger("adapters.email")
 
 class EmailAdapter(BaseAdapter):
-    _token_cache: Dict[str, Any] = {}
+    platform = "email"
 
-    def _convert_markdown_to_html(self, text: str) -> str:
-        text = re.sub(r'\*\*(.*?)\*\*', r'<b>\1</b>', text)
-        text = re.sub(r'\*(.*?)\*', r'<i>\1</i>', text)
-        text = re.sub(r'_(.*?)_', r'<i>\1</i>', text)
-        return text
-
-    def _get_graph_token(self) -> Optional[str]:
-        if self._token_cache and self._token_cache.get("expires_at", 0) > time.time() + 60:
-            return self._token_cache.get("access_token")
-
-        if not all([settings.AZURE_CLIENT_ID, settings.AZURE_CLIENT_SECRET, settings.AZURE_TENANT_ID]):
-            logger.error("Azure credentials not fully configured.")
-            return None
+    def __init__(self, http: HttpClientRegistry, outbox: DeadLetterOutbox, smtp: SmtpSessionPool, tokens: GraphTokenProvider):
+        self.http = http
+        self.outbox = outbox
+        self.smtp = smtp
+        self.tokens = tokens
 
-        try:
-            app = msal.ConfidentialClientApplication(
-                settings.AZURE_CLIENT_ID,
-                authority=f"https://login.microsoftonline.com/{settings.AZURE_TENANT_ID}",
-                client_credential=settings.AZURE_CLIENT_SECRET,
-            )
-            result = app.acquire_token_for_client(scopes=["https://graph.microsoft.com/.default"])
-            if "access_token" in result:
-                self._token_cache = {
-                    "access_token": result["access_token"],
-                    "expires_at": time.time() + result.get("expires_in", 3500)
-                }
-                logger.info("New Azure OAuth2 token acquired.")
-                return result["access_token"]
-            else:
-                logger.error(f"Failed to acquire Graph token: {result.get('error_description')}")
-                return None
-        except Exception as e:
-            logger.error(f"Azure Auth Exception: {e}")
-            return None
+    def _convert_markdown_to_html(self, text: str) -> str:
+        return render(text, self.platform)
 
     async def send_message(self, recipient_id: str, text: str, **kwargs):
         subject = kwargs.get("subject", "Re: Your Inquiry")
@@ -65,13 +39,30 @@ class EmailAdapter(BaseAdapter):
             f"Yth. Bapak/Ibu,<br><br>{html_body}<br><br>"
         )
 
-        if settings.EMAIL_PROVIDER == "azure_oauth2":
-            return await self._send_via_graph(recipient_id, subject, formatted_body, graph_message_id)
-        else:
-            return self._send_via_smtp(recipient_id, subject, formatted_body, in_reply_to, references)
+        payload = {
+            "provider": "graph" if settings.EMAIL_PROVIDER == "azure_oauth2" else "smtp",
+            "to_email": recipient_id,
+            "subject": subject,
+            "html_body": formatted_body,
+            "graph_message_id": graph_message_id,
+            "in_reply_to": in_reply_to,
+            "references": references
+        }
+        return await self.outbox.deliver(
+            lambda: self._deliver(payload),
+            kind="outbound", platform="email", recipient_id=recipient_id, payload=payload
+        )
+
+    async def _deliver(self, payload: dict):
+        if payload["provider"] == "graph":
+            return await self._send_via_graph(payload["to_email"], payload["subject"], payload["html_body"], payload.get("graph_message_id"))
+        return await self._send_via_smtp(payload["to_email"], payload["subject"], payload["html_body"], payload.get("in_reply_to"), payload.get("references"))
+
+    async def redeliver(self, payload: dict):
+        return await self._deliver(payload)
 
     async def _send_via_graph(self, to_email: str, subject: str, html_body: str, graph_message_id: str = None):
-        token = self._get_graph_token()
+        token = await self.tokens.get_token()
         if not token:
             return {"sent": False, "error": "Could not acquire Azure token"}
 
@@ -81,45 +72,45 @@ class EmailAdapter(BaseAdapter):
             "Content-Type": "application/json"
         }
         
-        async with httpx.AsyncClient(timeout=10) as client:
-            if graph_message_id:
-                logger.info(f"Replying to existing thread using Graph ID: {graph_message_id}")
-                url = f"https://graph.microsoft.com/v1.0/users/{user_id}/messages/{graph_message_id}/reply"
-                payload = {"comment": html_body}
-                try:
-                    response = await client.post(url, json=payload, headers=headers)
-                    if response.status_code == 202:
-                        return {"sent": True, "method": "azure_graph_reply"}
-                    else:
-                        logger.error(f"Graph Reply Failed ({response.status_code}): {response.text}")
-                        return {"sent": False, "error": f"Reply failed: {response.text}"}
-                except Exception as e:
-                    logger.error(f"Graph Reply Exception: {e}")
-                    return {"sent": False, "error": str(e)}
-
-            url = f"https://graph.microsoft.com/v1.0/users/{user_id}/sendMail"
-            email_msg = {
-                "message": {
-                    "subject": subject,
-                    "body": {"contentType": "HTML", "content": html_body},
-                    "toRecipients": [{"emailAddress": {"address": to_email}}]
-                },
-                "saveToSentItems": "true"
-            }
-
+        client = self.http.client_for(settings.GRAPH_API_BASE_URL)
+        if graph_message_id:
+            logger.info(f"Replying to existing thread using Graph ID: {graph_message_id}")
+            url = f"{settings.GRAPH_API_BASE_URL}/users/{user_id}/messages/{graph_message_id}/reply"
+            payload = {"comment": html_body}
             try:
-                response = await client.post(url, json=email_msg, headers=headers)
+                response = await client.post(url, json=payload, headers=headers)
                 if response.status_code == 202:
-                    logger.info(f"Email sent via Azure sendMail to {to_email}")
-                    return {"sent": True, "method": "azure_graph_send"}
+                    return {"sent": True, "method": "azure_graph_reply"}
                 else:
-                    logger.error(f"Graph API Error {response.status_code}: {response.text}")
-                    return {"sent": False, "error": response.text}
+                    logger.error(f"Graph Reply Failed ({response.status_code}): {response.text}")
+                    return {"sent": False, "status_code": response.status_code, "error": f"Reply failed: {response.text}"}
             except Exception as e:
-                logger.error(f"Graph API Exception: {e}")
+                logger.error(f"Graph Reply Exception: {e}")
                 return {"sent": False, "error": str(e)}
 
-    def _send_via_smtp(self, to_email, subject, html_body, in_reply_to, references):
+        url = f"{settings.GRAPH_API_BASE_URL}/users/{user_id}/sendMail"
+        email_msg = {
+            "message": {
+                "subject": subject,
+                "body": {"contentType": "HTML", "content": html_body},
+                "toRecipients": [{"emailAddress": {"address": to_email}}]
+            },
+            "saveToSentItems": "true"
+        }
+
+        try:
+            response = await client.post(url, json=email_msg, headers=headers)
+            if response.status_code == 202:
+                logger.info(f"Email sent via Azure sendMail to {to_email}")
+                return {"sent": True, "method": "azure_graph_send"}
+            else:
+                logger.error(f"Graph API Error {response.status_code}: {response.text}")
+                return {"sent": False, "status_code": response.status_code, "error": response.text}
+        except Exception as e:
+            logger.error(f"Graph API Exception: {e}")
+            return {"sent": False, "error": str(e)}
+
+    async def _send_via_smtp(self, to_email, subject, html_body, in_reply_to, references):
         try:
             msg = MIMEMultipart()
             msg['From'] = settings.EMAIL_USER
@@ -129,11 +120,15 @@ class EmailAdapter(BaseAdapter):
             if in_reply_to: msg['In-Reply-To'] = in_reply_to
             if references: msg['References'] = references
             msg.attach(MIMEText(html_body, 'html'))
-            with smtplib.SMTP(settings.EMAIL_HOST, settings.EMAIL_PORT) as server:
-                server.starttls()
-                server.login(settings.EMAIL_USER, settings.EMAIL_PASS)
-                server.send_message(msg)
+            await self.smtp.send(msg)
             return {"sent": True, "message_id": msg['Message-ID']}
+        except aiosmtplib.SMTPRecipientsRefused as e:
+            logger.error(f"SMTP Error: {e}")
+            return {"sent": False, "error": str(e), "retryable": False}
+        except aiosmtplib.SMTPResponseException as e:
+            # SMTP 4xx replies are transient, 5xx are permanent (bad recipient, auth, policy).
+            logger.error(f"SMTP Error: {e}")
+            return {"sent": False, "error": str(e), "retryable": 400 <= e.code < 500}
         except Exception as e:
             logger.error(f"SMTP Error: {e}")
             return {"sent": False, "error": str(e)}
\ No newline at end of file
@@ -0,0 +1,198 @@
+import asyncio
+import time
+import logging
+import aiosmtplib
+from collections import deque
+from contextlib import asynccontextmanager
+from email.message import Message
+from typing import Any, Deque, List, Optional, Tuple
+from app.core.config import settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger("adapters.email.smtp")
+
+# The server answered these, so the session that raised them is still usable.
+_REPLIED = (aiosmtplib.SMTPResponseException, aiosmtplib.SMTPRecipientsRefused)
+
+class _Session:
+    __slots__ = ("client", "last_used")
+
+    def __init__(self, client: aiosmtplib.SMTP):
+        self.client = client
+        self.last_used = time.monotonic()
+
+class SmtpSessionPool:
+    """Small pool of authenticated, reusable SMTP sessions with optional batched delivery."""
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        username: Optional[str],
+        password: Optional[str],
+        size: int = 2,
+        start_tls: Optional[bool] = None,
+        timeout: float = 30.0,
+        idle_timeout: float = 240.0,
+        health_check_after: float = 30.0,
+        batch_window: float = 0.0,
+        batch_max: int = 20
+    ):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.size = size
+        self.start_tls = start_tls
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.health_check_after = health_check_after
+        self.batch_window = batch_window
+        self.batch_max = batch_max
+
+        self._idle: Deque[_Session] = deque()
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Deque[Tuple[Message, asyncio.Future]] = deque()
+        self._flusher: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_settings(cls) -> "SmtpSessionPool":
+        return cls(
+            host=settings.EMAIL_HOST,
+            port=settings.EMAIL_PORT,
+            username=settings.EMAIL_USER,
+            password=settings.EMAIL_PASS,
+            size=settings.SMTP_POOL_SIZE,
+            start_tls=settings.SMTP_USE_STARTTLS,
+            timeout=settings.SMTP_TIMEOUT_SECONDS,
+            idle_timeout=settings.SMTP_IDLE_TIMEOUT_SECONDS,
+            batch_window=settings.SMTP_BATCH_WINDOW_MS / 1000,
+            batch_max=settings.SMTP_BATCH_MAX
+        )
+
+    def _bind(self) -> bool:
+        # Sessions belong to the loop that opened them; callers on another loop get a one-off session.
+        loop = asyncio.get_running_loop()
+        if self._loop is None:
+            self._loop = loop
+            self._slots = asyncio.Semaphore(self.size)
+        return self._loop is loop
+
+    async def _connect(self) -> _Session:
+        client = aiosmtplib.SMTP(
+            hostname=self.host,
+            port=self.port,
+            username=self.username,
+            password=self.password,
+            start_tls=self.start_tls,
+            timeout=self.timeout
+        )
+        await client.connect()
+        metrics.inc("smtp_sessions_opened")
+        logger.info(f"SMTP session opened to {self.host}:{self.port}")
+        return _Session(client)
+
+    async def _discard(self, session: _Session):
+        try:
+            await session.client.quit()
+        except Exception:
+            session.client.close()
+
+    async def _checkout(self) -> _Session:
+        while self._idle:
+            session = self._idle.pop()
+            idle_for = time.monotonic() - session.last_used
+            if not session.client.is_connected or idle_for >= self.idle_timeout:
+                await self._discard(session)
+                continue
+            if idle_for >= self.health_check_after:
+                try:
+                    await session.client.noop()
+                except Exception:
+                    await self._discard(session)
+                    continue
+            return session
+        return await self._connect()
+
+    @asynccontextmanager
+    async def session(self):
+        if not self._bind():
+            one_off = await self._connect()
+            try:
+                yield one_off.client
+            finally:
+                await self._discard(one_off)
+            return
+
+        async with self._slots:
+            session = await self._checkout()
+            reusable = False
+            try:
+                yield session.client
+                reusable = True
+            except _REPLIED:
+                reusable = True
+                raise
+            finally:
+                if reusable and session.client.is_connected:
+                    session.last_used = time.monotonic()
+                    self._idle.append(session)
+                else:
+                    await self._discard(session)
+
+    async def send(self, message: Message) -> Any:
+        if self.batch_window > 0 and self._bind():
+            return await self._enqueue(message)
+        async with self.session() as client:
+            return await client.send_message(message)
+
+    async def send_batch(self, messages: List[Message]) -> List[Any]:
+        """Sends queued messages over one session; each entry is a response or the exception raised.
+
+        If the session is lost mid-batch, messages the server already accepted keep their
+        responses and only the unsent remainder gets the connection error.
+        """
+        results: List[Any] = []
+        try:
+            async with self.session() as client:
+                for message in messages:
+                    try:
+                        results.append(await client.send_message(message))
+                    except _REPLIED as e:
+                        results.append(e)
+        except Exception as e:
+            results.extend([e] * (len(messages) - len(results)))
+        metrics.observe("smtp_batch_size", len(messages))
+        return results
+
+    async def _enqueue(self, message: Message) -> Any:
+        future = asyncio.get_running_loop().create_future()
+        self._queue.append((message, future))
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_loop())
+        return await future
+
+    async def _flush_loop(self):
+        while self._queue:
+            await asyncio.sleep(self.batch_window)
+            batch = [self._queue.popleft() for _ in range(min(self.batch_max, len(self._queue)))]
+            try:
+                results = await self.send_batch([message for message, _ in batch])
+            except Exception as e:
+                results = [e] * len(batch)
+            for (_, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    async def close(self):
+        if self._flusher and not self._flusher.done():
+            await asyncio.wait([self._flusher], timeout=self.timeout)
+        while self._idle:
+            await self._discard(self._idle.pop())
+
+smtp_pool = SmtpSessionPool.from_settings()
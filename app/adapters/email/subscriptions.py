@@ -0,0 +1,273 @@
+import asyncio
+import hashlib
+import hmac
+import time
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from app.core.config import settings
+from app.core.http import http_clients
+from app.core.metrics import metrics
+from app.adapters.email.auth import graph_tokens, GraphTokenProvider
+from app.repositories.sync_state import SyncStateRepository
+
+logger = logging.getLogger("adapters.email.subscriptions")
+
+def _graph_time(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.0000000Z")
+
+def _parse_graph_time(value: Optional[str]) -> float:
+    if not value:
+        return 0.0
+    # Graph uses 7 fractional digits, which fromisoformat rejects on older Pythons.
+    try:
+        return datetime.strptime(value[:19], "%Y-%m-%dT%H:%M:%S").replace(tzinfo=timezone.utc).timestamp()
+    except ValueError:
+        return 0.0
+
+class GraphSubscriptionManager:
+    """Keeps a Graph change-notification subscription on the inbox alive and wakes the listener.
+
+    The subscription id is stored in `bkpm.email_sync_state` so a restart renews the
+    existing subscription instead of stacking a new one. Notifications are only
+    trusted when their `clientState` matches EMAIL_WEBHOOK_CLIENT_STATE, which every
+    worker must share; a digest of it is stored with the subscription id so a rotated
+    secret recreates the subscription rather than renewing one carrying the old value.
+
+    A quiet inbox is not a fault: the manager stays healthy while the subscription is
+    live and nothing has shown push to be broken. A failed create/renew, a notification
+    with the wrong clientState, or a safety poll finding mail no notification announced
+    marks it failed and the listener polls until a trusted notification or a freshly
+    validated subscription clears it.
+    """
+
+    def __init__(
+        self,
+        user_id: Optional[str],
+        notification_url: Optional[str],
+        client_state: Optional[str],
+        tokens: GraphTokenProvider,
+        repo: SyncStateRepository,
+        lifetime_minutes: int = 4200,
+        renew_margin_seconds: int = 3600
+    ):
+        self.user_id = user_id
+        self.notification_url = notification_url
+        self.client_state = client_state
+        self.tokens = tokens
+        self.repo = repo
+        self.lifetime_minutes = lifetime_minutes
+        self.renew_margin_seconds = renew_margin_seconds
+
+        self.subscription_id: Optional[str] = None
+        self.expires_at = 0.0
+        self.failure: Optional[str] = None
+        self._wakeup = asyncio.Event()
+        self._resubscribe: Optional[asyncio.Event] = None
+
+    @classmethod
+    def from_settings(cls) -> "GraphSubscriptionManager":
+        return cls(
+            user_id=settings.AZURE_EMAIL_USER,
+            notification_url=settings.EMAIL_WEBHOOK_PUBLIC_URL,
+            client_state=settings.EMAIL_WEBHOOK_CLIENT_STATE,
+            tokens=graph_tokens,
+            repo=SyncStateRepository(),
+            lifetime_minutes=settings.GRAPH_SUBSCRIPTION_LIFETIME_MINUTES,
+            renew_margin_seconds=settings.GRAPH_SUBSCRIPTION_RENEW_MARGIN_SECONDS
+        )
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.user_id and self.notification_url and self.client_state and self.tokens.configured)
+
+    @property
+    def _state_key(self) -> str:
+        return f"graph:{self.user_id}:subscription"
+
+    @property
+    def _client_state_key(self) -> str:
+        return f"graph:{self.user_id}:subscription:client_state"
+
+    def _client_state_digest(self) -> str:
+        return hashlib.sha256(self.client_state.encode()).hexdigest()
+
+    def healthy(self) -> bool:
+        return self.subscription_id is not None and self.expires_at > time.time() and self.failure is None
+
+    def _fail(self, reason: str):
+        if self.failure is None:
+            logger.warning(f"Graph push looks broken ({reason}), falling back to polling")
+            metrics.inc("graph_push_failures", reason=reason)
+        self.failure = reason
+
+    def _recover(self):
+        if self.failure is not None:
+            logger.info(f"Graph push recovered after: {self.failure}")
+        self.failure = None
+
+    def report_unannounced(self, found: int):
+        """Called when a safety poll found mail that no notification announced."""
+        if found:
+            self._fail("unannounced mail")
+
+    def accepts(self, client_state: Optional[str]) -> bool:
+        if not client_state or not self.client_state:
+            return False
+        return hmac.compare_digest(client_state, self.client_state)
+
+    def notify(self, notifications: List[Dict[str, Any]]) -> int:
+        """Handles a webhook payload's `value` list; returns the number of trusted notifications."""
+        accepted = 0
+        for item in notifications:
+            if not self.accepts(item.get("clientState")):
+                metrics.inc("graph_notifications", kind="rejected")
+                continue
+            accepted += 1
+            lifecycle = item.get("lifecycleEvent")
+            if lifecycle:
+                metrics.inc("graph_notifications", kind=lifecycle)
+                logger.info(f"Graph lifecycle event: {lifecycle}")
+                if lifecycle in ("subscriptionRemoved", "reauthorizationRequired"):
+                    self._request_resubscribe(removed=lifecycle == "subscriptionRemoved")
+            else:
+                metrics.inc("graph_notifications", kind=item.get("changeType", "unknown"))
+
+        if accepted:
+            self._recover()
+            self._wakeup.set()
+        elif notifications:
+            self._fail("clientState mismatch")
+        return accepted
+
+    async def wait_for_mail(self, timeout: float) -> bool:
+        """Suspends the listener until a notification arrives or `timeout` elapses."""
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self._wakeup.clear()
+
+    def _request_resubscribe(self, removed: bool):
+        if removed:
+            self.subscription_id = None
+        else:
+            self.expires_at = 0.0
+        if self._resubscribe is not None:
+            self._resubscribe.set()
+
+    async def _request(self, method: str, path: str, payload: Optional[dict] = None):
+        token = await self.tokens.get_token()
+        if not token:
+            return None
+        url = f"{settings.GRAPH_API_BASE_URL}{path}"
+        return await http_clients.client_for(url).request(
+            method, url, json=payload, headers={"Authorization": f"Bearer {token}"}
+        )
+
+    def _expiry(self) -> float:
+        return time.time() + self.lifetime_minutes * 60
+
+    async def _create(self) -> bool:
+        expires = self._expiry()
+        resp = await self._request("POST", "/subscriptions", {
+            "changeType": "created",
+            "notificationUrl": self.notification_url,
+            "lifecycleNotificationUrl": self.notification_url,
+            "resource": f"users/{self.user_id}/mailFolders('inbox')/messages",
+            "expirationDateTime": _graph_time(expires),
+            "clientState": self.client_state
+        })
+        if resp is None or resp.status_code not in (200, 201):
+            logger.error(f"Graph subscription create failed: {resp.status_code if resp else 'no token'} {resp.text if resp else ''}")
+            return False
+
+        data = resp.json()
+        self.subscription_id = data.get("id")
+        self.expires_at = _parse_graph_time(data.get("expirationDateTime")) or expires
+        # Graph only creates a subscription after our endpoint answered its validation request.
+        self._recover()
+        await asyncio.to_thread(self.repo.set, self._state_key, self.subscription_id)
+        await asyncio.to_thread(self.repo.set, self._client_state_key, self._client_state_digest())
+        metrics.inc("graph_subscriptions", action="created")
+        logger.info(f"Graph subscription {self.subscription_id} created")
+        return True
+
+    async def _renew(self) -> bool:
+        expires = self._expiry()
+        resp = await self._request("PATCH", f"/subscriptions/{self.subscription_id}", {
+            "expirationDateTime": _graph_time(expires)
+        })
+        if resp is None:
+            return False
+        if resp.status_code == 404:
+            logger.warning(f"Graph subscription {self.subscription_id} no longer exists")
+            self.subscription_id = None
+            return False
+        if resp.status_code != 200:
+            logger.error(f"Graph subscription renew failed: {resp.status_code} {resp.text}")
+            return False
+
+        self.expires_at = _parse_graph_time(resp.json().get("expirationDateTime")) or expires
+        metrics.inc("graph_subscriptions", action="renewed")
+        logger.info(f"Graph subscription {self.subscription_id} renewed")
+        return True
+
+    async def _ensure(self) -> bool:
+        if self.subscription_id is None:
+            stored = await asyncio.to_thread(self.repo.get, self._state_key)
+            if stored:
+                self.subscription_id = stored
+                stored_digest = await asyncio.to_thread(self.repo.get, self._client_state_key)
+                if stored_digest != self._client_state_digest():
+                    # Renewing would keep the old clientState and every notification would be rejected.
+                    logger.warning(f"Graph subscription {stored} uses a different clientState; recreating it")
+                    await self.delete()
+                    self.subscription_id = None
+                elif await self._renew():
+                    return True
+            return await self._create()
+        if self.expires_at - time.time() <= self.renew_margin_seconds:
+            if await self._renew():
+                return True
+            return self.subscription_id is None and await self._create()
+        return True
+
+    async def delete(self):
+        if not self.subscription_id:
+            return
+        try:
+            await self._request("DELETE", f"/subscriptions/{self.subscription_id}")
+        except Exception as e:
+            logger.warning(f"Failed to delete Graph subscription: {e}")
+
+    async def run(self):
+        if not self.configured:
+            logger.warning(
+                "Email push mode needs EMAIL_WEBHOOK_PUBLIC_URL, EMAIL_WEBHOOK_CLIENT_STATE and Azure credentials; "
+                "staying on polling"
+            )
+            return
+        logger.info("Graph subscription manager started")
+        self._resubscribe = asyncio.Event()
+        while True:
+            try:
+                ok = await self._ensure()
+            except Exception as e:
+                logger.error(f"Graph subscription error: {e}")
+                ok = False
+            self._resubscribe.clear()
+
+            if ok:
+                delay = max(self.expires_at - time.time() - self.renew_margin_seconds, 30)
+            else:
+                self._fail("subscription not renewed")
+                delay = 60
+            try:
+                await asyncio.wait_for(self._resubscribe.wait(), timeout=min(delay, 3600))
+            except asyncio.TimeoutError:
+                pass
+
+graph_subscriptions = GraphSubscriptionManager.from_settings()
@@ -1,43 +1,95 @@
-import re
 from app.core.config import settings
 from app.adapters.base import BaseAdapter
-from app.adapters.utils import split_text_smartly, make_meta_request
+from app.adapters.utils import make_meta_request
+from app.adapters.rendering import render_chunks
+from app.core.http import HttpClientRegistry
+from app.adapters.ratelimit import MetaRateLimiter
+from app.services.retry import DeadLetterOutbox, is_success
+from app.adapters.effects import InboundEffects, READ, TYPING
 
 class InstagramAdapter(BaseAdapter):
-    def __init__(self):
+    platform = "instagram"
+
+    def __init__(self, http: HttpClientRegistry, limiter: MetaRateLimiter, outbox: DeadLetterOutbox):
+        self.http = http
+        self.limiter = limiter
+        self.outbox = outbox
         self.version = "v24.0"
         self.base_url = f"https://graph.instagram.com/{self.version}/{settings.INSTAGRAM_CHATBOT_ID}/messages"
         self.token = settings.INSTAGRAM_PAGE_ACCESS_TOKEN
 
+    async def _send(self, payload: dict, recipient_id: str = None) -> dict:
+        return await make_meta_request(
+            self.http.client_for(self.base_url), "POST", self.base_url, self.token, payload,
+            limiter=self.limiter, account_id=settings.INSTAGRAM_CHATBOT_ID, recipient_id=recipient_id
+        )
+
+    async def _post(self, payload: dict, recipient_id: str = None) -> dict:
+        # Messages addressed to a recipient are retried and dead-lettered; status actions are best effort.
+        if not recipient_id:
+            return await self._send(payload)
+        return await self.outbox.deliver(
+            lambda: self._send(payload, recipient_id),
+            kind="outbound", platform="instagram", recipient_id=recipient_id,
+            payload={"body": payload, "recipient_id": recipient_id}
+        )
+
+    async def redeliver(self, payload: dict) -> dict:
+        recipient_id = payload.get("recipient_id")
+        if "bodies" in payload:
+            return await self.outbox.replay_in_order(
+                lambda body: self._send(body, recipient_id), payload["bodies"],
+                kind="outbound", platform="instagram", recipient_id=recipient_id
+            )
+        return await self._send(payload["body"], recipient_id)
+
     def _clean_id(self, user_id: str) -> str:
         return user_id.replace('@instagram.com', '').strip()
 
     async def send_typing_on(self, recipient_id: str, message_id: str = None):
         if not self.token: return
         payload = {"recipient": {"id": self._clean_id(recipient_id)}, "sender_action": "typing_on"}
-        await make_meta_request("POST", self.base_url, self.token, payload)
+        await self._post(payload)
+
+    def _plan_effects(self, effects: InboundEffects):
+        if not self.token:
+            return []
+
+        # Messenger-style sender actions carry one action each, so only duplicates can be merged.
+        recipient = {"id": self._clean_id(effects.recipient_id)}
+        calls = []
+        if effects.wants(READ):
+            calls.append({"recipient": recipient, "sender_action": "mark_seen"})
+        if effects.wants(TYPING):
+            calls.append({"recipient": recipient, "sender_action": "typing_on"})
+        if effects.reaction and effects.message_id:
+            calls.append({
+                "recipient": recipient,
+                "sender_action": "react",
+                "payload": {"message_id": effects.message_id, "reaction": effects.reaction}
+            })
+        return calls
 
     async def send_typing_off(self, recipient_id: str):
         if not self.token: return
         payload = {"recipient": {"id": self._clean_id(recipient_id)}, "sender_action": "typing_off"}
-        await make_meta_request("POST", self.base_url, self.token, payload)
+        await self._post(payload)
 
     async def send_message(self, recipient_id: str, text: str, **kwargs):
         if not self.token: return {"success": False}
         
-        text = re.sub(r'\*\*(.*?)\*\*', r'*\1*', text)
-        chunks = split_text_smartly(text, 1000)
-        
-        results = []
-        for chunk in chunks:
-            payload = {
-                "recipient": {"id": self._clean_id(recipient_id)},
-                "message": {"text": chunk}
-            }
-            res = await make_meta_request("POST", self.base_url, self.token, payload)
-            results.append(res)
-            
-        return {"sent": True, "results": results}
+        clean_id = self._clean_id(recipient_id)
+        bodies = [
+            {"recipient": {"id": clean_id}, "message": {"text": chunk}}
+            for chunk in render_chunks(text, self.platform)
+        ]
+
+        # Chunks must arrive in order: a failed chunk is parked with the rest, never skipped.
+        results = await self.outbox.deliver_in_order(
+            lambda body: self._send(body, clean_id), bodies,
+            kind="outbound", platform="instagram", recipient_id=clean_id
+        )
+        return {"sent": len(results) == len(bodies) and all(is_success(r) for r in results), "results": results}
 
     async def send_feedback_request(self, recipient_id: str, answer_id: int):
         payload = {
@@ -50,4 +102,4 @@ class InstagramAdapter(BaseAdapter):
                 ]
             }
         }
-        return await make_meta_request("POST", self.base_url, self.token, payload)
\ No newline at end of file
+        return await self._post(payload, self._clean_id(recipient_id))
\ No newline at end of file
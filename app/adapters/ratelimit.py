@@ -0,0 +1,176 @@
+import asyncio
+import json
+import time
+import logging
+from collections import OrderedDict
+from typing import Dict, Mapping, Optional, Tuple
+from app.core.config import settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger("adapters.ratelimit")
+
+# Meta error codes that mean "slow down" rather than "this request is wrong".
+# 131056 is WhatsApp's business/consumer pair limit and only concerns one recipient.
+THROTTLE_ERROR_CODES = {4, 17, 32, 613, 80002, 80006, 130429, 131048, 131056}
+RECIPIENT_THROTTLE_ERROR_CODES = {131056}
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.scale = 1.0
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now: float):
+        elapsed = now - self.updated_at
+        self.updated_at = now
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate * self.scale)
+
+    def reserve(self) -> float:
+        """Takes one token and returns how long the caller must wait before using it."""
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens -= 1
+        wait = 0.0 if self.tokens >= 0 else -self.tokens / (self.rate * self.scale)
+        return max(wait, self.paused_until - now)
+
+    def refund(self):
+        """Gives back a token taken by reserve() that will not be used."""
+        self.tokens += 1
+
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def is_idle(self) -> bool:
+        self._refill(time.monotonic())
+        return self.tokens >= self.capacity and self.paused_until <= time.monotonic()
+
+class MetaRateLimiter:
+    """Token buckets per Meta sender account (WA phone-number ID, IG account ID) and per recipient."""
+
+    def __init__(self):
+        self._accounts: Dict[str, TokenBucket] = {}
+        self._recipients: "OrderedDict[Tuple[str, str], TokenBucket]" = OrderedDict()
+
+    def _account_bucket(self, account_id: str) -> TokenBucket:
+        bucket = self._accounts.get(account_id)
+        if bucket is None:
+            bucket = self._accounts[account_id] = TokenBucket(settings.META_RATE_PER_SECOND, settings.META_RATE_BURST)
+        return bucket
+
+    def _recipient_bucket(self, account_id: str, recipient_id: str) -> TokenBucket:
+        key = (account_id, recipient_id)
+        bucket = self._recipients.get(key)
+        if bucket is None:
+            bucket = TokenBucket(settings.META_RECIPIENT_RATE_PER_SECOND, settings.META_RECIPIENT_BURST)
+            self._recipients[key] = bucket
+            self._prune_recipients()
+        else:
+            self._recipients.move_to_end(key)
+        return bucket
+
+    def _prune_recipients(self):
+        while len(self._recipients) > settings.META_RECIPIENT_BUCKETS_MAX:
+            key, bucket = next(iter(self._recipients.items()))
+            if not bucket.is_idle():
+                break
+            del self._recipients[key]
+
+    async def acquire(self, account_id: str, recipient_id: Optional[str] = None) -> bool:
+        """Waits for a send slot; False, without waiting, if that would take over META_THROTTLE_MAX_WAIT_SECONDS.
+
+        The caller runs inside a dispatcher lane holding a global concurrency slot, so a
+        long pause is better handed to the dead-letter outbox than slept on.
+        """
+        buckets = [self._account_bucket(account_id)]
+        if recipient_id:
+            buckets.append(self._recipient_bucket(account_id, recipient_id))
+        wait = max([bucket.reserve() for bucket in buckets])
+        if wait > settings.META_THROTTLE_MAX_WAIT_SECONDS:
+            for bucket in buckets:
+                bucket.refund()
+            metrics.inc("meta_rate_limit_deferred", account=account_id)
+            return False
+        if wait > 0:
+            metrics.observe("meta_rate_limit_wait_seconds", wait, account=account_id)
+            await asyncio.sleep(wait)
+        return True
+
+    def throttle(self, account_id: str, seconds: float, recipient_id: Optional[str] = None):
+        if recipient_id:
+            self._recipient_bucket(account_id, recipient_id).pause(seconds)
+        else:
+            self._account_bucket(account_id).pause(seconds)
+        metrics.inc("meta_throttled", account=account_id, scope="recipient" if recipient_id else "account")
+        logger.warning(f"Meta throttling for {account_id}{f'/{recipient_id}' if recipient_id else ''}, pausing {seconds:.1f}s")
+
+    def observe_usage(self, account_id: str, headers: Mapping[str, str]):
+        """Adapts the account rate to Meta's X-Business-Use-Case-Usage / X-App-Usage headers."""
+        try:
+            usage = _parse_usage_headers(headers)
+        except (AttributeError, TypeError, ValueError) as e:
+            # Valid JSON in an unexpected shape must not turn a successful send into an error.
+            logger.warning(f"Unreadable Meta usage headers for {account_id}: {e}")
+            return
+        if usage is None:
+            return
+        percent, regain_minutes = usage
+        bucket = self._account_bucket(account_id)
+        if percent >= 95:
+            bucket.scale = 0.1
+        elif percent >= 80:
+            bucket.scale = 0.5
+        else:
+            bucket.scale = 1.0
+        if regain_minutes > 0:
+            bucket.pause(min(regain_minutes * 60, settings.META_THROTTLE_MAX_WAIT_SECONDS))
+        metrics.set_gauge("meta_usage_percent", percent, account=account_id)
+
+def _parse_usage_headers(headers: Mapping[str, str]) -> Optional[Tuple[float, float]]:
+    entries = []
+    for name in ("x-business-use-case-usage", "x-app-usage"):
+        raw = headers.get(name)
+        if not raw:
+            continue
+        try:
+            data = json.loads(raw)
+        except ValueError:
+            continue
+        if name == "x-app-usage":
+            entries.append(data)
+        else:
+            for items in data.values():
+                entries.extend(items)
+
+    if not entries:
+        return None
+    percent = max(
+        max(float(e.get("call_count", 0)), float(e.get("total_cputime", 0)), float(e.get("total_time", 0)))
+        for e in entries
+    )
+    regain = max(float(e.get("estimated_time_to_regain_access", 0) or 0) for e in entries)
+    return percent, regain
+
+def parse_retry_after(headers: Mapping[str, str]) -> Optional[float]:
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        return None
+
+def throttle_error_code(status_code: int, body) -> Optional[int]:
+    if isinstance(body, dict):
+        error = body.get("error")
+        # Some proxies answer with a bare string in place of Meta's error object.
+        code = error.get("code") if isinstance(error, dict) else None
+        if code in THROTTLE_ERROR_CODES:
+            return code
+    if status_code == 429:
+        return 429
+    return None
+
+meta_rate_limiter = MetaRateLimiter()
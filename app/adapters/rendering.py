@@ -0,0 +1,96 @@
+import re
+from typing import Dict, List, Optional, Tuple, Pattern
+
+_BOLD = re.compile(r'\*\*(.*?)\*\*')
+_STRIKE = re.compile(r'~~(.*?)~~')
+_ITALIC = re.compile(r'\*(.*?)\*')
+_ITALIC_ALT = re.compile(r'_(.*?)_')
+
+PLATFORM_LIMITS = {"whatsapp": 4096, "instagram": 1000}
+
+# Substitutions applied in order for each output platform. Template replacements
+# keep the whole pass inside the regex engine instead of a Python callback per match.
+_RULES: Dict[str, Tuple[Tuple[Pattern, str], ...]] = {
+    "whatsapp": ((_BOLD, r'*\1*'), (_STRIKE, r'~\1~')),
+    "instagram": ((_BOLD, r'*\1*'),),
+    "email": ((_BOLD, r'<b>\1</b>'), (_ITALIC, r'<i>\1</i>'), (_ITALIC_ALT, r'<i>\1</i>')),
+}
+
+# Single-character markers that open and close a formatted span in the rendered text.
+_SPAN_MARKERS = {"whatsapp": "*_~", "instagram": "*_~"}
+
+def render(text: str, platform: str) -> str:
+    for pattern, template in _RULES.get(platform, ()):
+        text = pattern.sub(template, text)
+    return text
+
+def _open_marker(text: str, cut: int, lo: int, markers: str, max_length: int) -> Optional[int]:
+    """Returns the opening marker of the span a cut at `cut` would split, if any.
+
+    Spans never cross a newline, so only the current line (and only the part inside
+    the current chunk) is inspected, which keeps every check bounded by max_length.
+    """
+    if not markers:
+        return None
+    line_start = max(text.rfind("\n", lo, cut) + 1, lo)
+    line_end = text.find("\n", cut, cut + max_length)
+    if line_end == -1:
+        line_end = min(len(text), cut + max_length)
+
+    opener = None
+    for marker in markers:
+        if text.count(marker, line_start, cut) % 2 and text.find(marker, cut, line_end) != -1:
+            pos = text.rfind(marker, line_start, cut)
+            opener = pos if opener is None else min(opener, pos)
+    return opener
+
+def chunk_text(text: str, max_length: int, markers: str = "") -> List[str]:
+    """Splits text into chunks of at most max_length in a single linear pass.
+
+    Prefers a newline, then a space, in the last 30% of each window. With `markers`
+    set, a space or hard cut inside a formatted span moves back to the span start.
+    """
+    if len(text) <= max_length:
+        return [text]
+
+    chunks = []
+    start, end = 0, len(text)
+    threshold = max_length * 0.7
+
+    while start < end:
+        if end - start <= max_length:
+            chunks.append(text[start:end])
+            break
+
+        window_end = start + max_length
+        split_at = window_end
+        last_newline = text.rfind("\n", start, window_end)
+        if last_newline - start > threshold:
+            split_at = last_newline + 1
+        else:
+            last_space = text.rfind(" ", start, window_end)
+            while last_space - start > threshold:
+                opener = _open_marker(text, last_space + 1, start, markers, max_length)
+                if opener is None:
+                    break
+                last_space = text.rfind(" ", start, opener)
+
+            if last_space - start > threshold:
+                split_at = last_space + 1
+            else:
+                opener = _open_marker(text, window_end, start, markers, max_length)
+                if opener is not None and opener > start:
+                    split_at = opener
+
+        chunks.append(text[start:split_at].strip())
+        start = split_at
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+
+    return chunks
+
+def render_chunks(text: str, platform: str, max_length: int = None) -> List[str]:
+    limit = max_length or PLATFORM_LIMITS.get(platform, 4096)
+    return chunk_text(render(text, platform), limit, _SPAN_MARKERS.get(platform, ""))
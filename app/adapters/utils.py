@@ -1,50 +1,67 @@
 import httpx
 import logging
+from app.core.config import settings
+from app.adapters.rendering import chunk_text
+from app.adapters.ratelimit import (
+    MetaRateLimiter,
+    RECIPIENT_THROTTLE_ERROR_CODES,
+    parse_retry_after,
+    throttle_error_code,
+)
 
 logger = logging.getLogger("adapters.utils")
 
 def split_text_smartly(text: str, max_length: int = 4096) -> list[str]:
-    if len(text) <= max_length:
-        return [text]
-
-    chunks = []
-    while text:
-        if len(text) <= max_length:
-            chunks.append(text)
-            break
-
-        split_at = max_length
-        last_newline = text[:max_length].rfind('\n')
-        
-        if last_newline > max_length * 0.7:
-            split_at = last_newline + 1
-        else:
-            last_space = text[:max_length].rfind(' ')
-            if last_space > max_length * 0.7:
-                split_at = last_space + 1
-
-        chunks.append(text[:split_at].strip())
-        text = text[split_at:].strip()
-    
-    return chunks
+    return chunk_text(text, max_length)
 
-async def make_meta_request(method: str, url: str, token: str, payload: dict = None) -> dict:
+async def make_meta_request(
+    client: httpx.AsyncClient,
+    method: str,
+    url: str,
+    token: str,
+    payload: dict = None,
+    limiter: MetaRateLimiter = None,
+    account_id: str = None,
+    recipient_id: str = None
+) -> dict:
     headers = {
         "Authorization": f"Bearer {token}",
         "Content-Type": "application/json"
     }
+    account_id = account_id or url
+    if limiter and not await limiter.acquire(account_id, recipient_id):
+        # Paused for longer than is worth holding a send slot: park it instead of retrying.
+        return {"success": False, "error": "Meta rate limit pause", "throttled": True, "defer": True}
     try:
-        async with httpx.AsyncClient(timeout=10) as client:
-            if method.upper() == "POST":
-                resp = await client.post(url, json=payload, headers=headers)
-            else:
-                resp = await client.get(url, headers=headers)
-            
-        return {
-            "success": resp.is_success,
-            "status_code": resp.status_code,
-            "data": resp.json() if resp.is_success else resp.text
-        }
+        if method.upper() == "POST":
+            resp = await client.post(url, json=payload, headers=headers)
+        else:
+            resp = await client.get(url, headers=headers)
     except Exception as e:
         logger.error(f"Meta API Request Error: {e}")
-        return {"success": False, "error": str(e)}
\ No newline at end of file
+        return {"success": False, "error": str(e)}
+
+    if limiter:
+        limiter.observe_usage(account_id, resp.headers)
+
+    try:
+        body = resp.json()
+    except ValueError:
+        body = None
+
+    if resp.is_success:
+        return {"success": True, "status_code": resp.status_code, "data": body if body is not None else resp.text}
+
+    code = throttle_error_code(resp.status_code, body)
+    if code is None:
+        return {"success": False, "status_code": resp.status_code, "data": resp.text}
+
+    # Throttled: pause the bucket and hand the result back; retry_async owns the retries,
+    # and the next attempt's acquire() waits until the bucket reopens.
+    if limiter:
+        delay = parse_retry_after(resp.headers)
+        if delay is None:
+            delay = settings.RETRY_THROTTLED_BASE_DELAY_SECONDS
+        scoped_recipient = recipient_id if code in RECIPIENT_THROTTLE_ERROR_CODES else None
+        limiter.throttle(account_id, min(delay, settings.META_THROTTLE_MAX_WAIT_SECONDS), scoped_recipient)
+    return {"success": False, "status_code": resp.status_code, "data": resp.text, "throttled": True}
@@ -1,27 +1,56 @@
-import re
 from app.core.config import settings
 from app.adapters.base import BaseAdapter
-from app.adapters.utils import split_text_smartly, make_meta_request
+from app.adapters.utils import make_meta_request
+from app.adapters.rendering import render, render_chunks
+from app.core.http import HttpClientRegistry
+from app.adapters.ratelimit import MetaRateLimiter
+from app.services.retry import DeadLetterOutbox, is_success
+from app.adapters.effects import InboundEffects, READ, TYPING
 
 class WhatsAppAdapter(BaseAdapter):
-    def __init__(self):
+    platform = "whatsapp"
+
+    def __init__(self, http: HttpClientRegistry, limiter: MetaRateLimiter, outbox: DeadLetterOutbox):
+        self.http = http
+        self.limiter = limiter
+        self.outbox = outbox
         self.version = "v24.0"
         self.base_url = f"https://graph.facebook.com/{self.version}/{settings.WHATSAPP_PHONE_NUMBER_ID}/messages"
         self.token = settings.WHATSAPP_ACCESS_TOKEN
 
+    async def _send(self, payload: dict, recipient_id: str = None) -> dict:
+        return await make_meta_request(
+            self.http.client_for(self.base_url), "POST", self.base_url, self.token, payload,
+            limiter=self.limiter, account_id=settings.WHATSAPP_PHONE_NUMBER_ID, recipient_id=recipient_id
+        )
+
+    async def _post(self, payload: dict, recipient_id: str = None) -> dict:
+        # Messages addressed to a recipient are retried and dead-lettered; status actions are best effort.
+        if not recipient_id:
+            return await self._send(payload)
+        return await self.outbox.deliver(
+            lambda: self._send(payload, recipient_id),
+            kind="outbound", platform="whatsapp", recipient_id=recipient_id,
+            payload={"body": payload, "recipient_id": recipient_id}
+        )
+
+    async def redeliver(self, payload: dict) -> dict:
+        recipient_id = payload.get("recipient_id")
+        if "bodies" in payload:
+            return await self.outbox.replay_in_order(
+                lambda body: self._send(body, recipient_id), payload["bodies"],
+                kind="outbound", platform="whatsapp", recipient_id=recipient_id
+            )
+        return await self._send(payload["body"], recipient_id)
+
     def _convert_markdown(self, text: str) -> str:
-        text = re.sub(r'\*\*(.*?)\*\*', r'*\1*', text)
-        text = re.sub(r'~~(.*?)~~', r'~\1~', text)
-        return text
+        return render(text, self.platform)
 
     async def send_message(self, recipient_id: str, text: str, **kwargs):
         if not self.token: return {"success": False, "error": "No token"}
 
-        text = self._convert_markdown(text)
-        chunks = split_text_smartly(text, 4096)
-        results = []
-
-        for chunk in chunks:
+        bodies = []
+        for chunk in render_chunks(text, self.platform):
             payload = {
                 "messaging_product": "whatsapp",
                 "to": recipient_id,
@@ -30,11 +59,14 @@ class WhatsAppAdapter(BaseAdapter):
             }
             if kwargs.get("message_id"):
                 payload["context"] = {"message_id": kwargs["message_id"]}
+            bodies.append(payload)
 
-            res = await make_meta_request("POST", self.base_url, self.token, payload)
-            results.append(res)
-        
-        return {"sent": True, "results": results}
+        # Chunks must arrive in order: a failed chunk is parked with the rest, never skipped.
+        results = await self.outbox.deliver_in_order(
+            lambda body: self._send(body, recipient_id), bodies,
+            kind="outbound", platform="whatsapp", recipient_id=recipient_id
+        )
+        return {"sent": len(results) == len(bodies) and all(is_success(r) for r in results), "results": results}
 
     async def send_typing_on(self, recipient_id: str, message_id: str = None):
         if not self.token: return
@@ -48,7 +80,32 @@ class WhatsAppAdapter(BaseAdapter):
                     "type":"text"
                 }
             }
-            await make_meta_request("POST", self.base_url, self.token, payload)
+            await self._post(payload)
+
+    def _plan_effects(self, effects: InboundEffects):
+        if not self.token or not effects.message_id:
+            return []
+
+        calls = []
+        # A typing indicator is sent as a read status, so read + typing is a single call.
+        if effects.wants(READ) or effects.wants(TYPING):
+            status = {
+                "messaging_product": "whatsapp",
+                "status": "read",
+                "message_id": effects.message_id
+            }
+            if effects.wants(TYPING):
+                status["typing_indicator"] = {"type": "text"}
+            calls.append(status)
+
+        if effects.reaction:
+            calls.append({
+                "messaging_product": "whatsapp",
+                "to": effects.recipient_id,
+                "type": "reaction",
+                "reaction": {"message_id": effects.message_id, "emoji": effects.reaction}
+            })
+        return calls
 
     async def mark_as_read(self, message_id: str):
         payload = {
@@ -56,7 +113,7 @@ class WhatsAppAdapter(BaseAdapter):
             "status": "read",
             "message_id": message_id
         }
-        await make_meta_request("POST", self.base_url, self.token, payload)
+        await self._post(payload)
 
     async def send_feedback_request(self, recipient_id: str, answer_id: int):
         payload = {
@@ -74,4 +131,4 @@ class WhatsAppAdapter(BaseAdapter):
                 }
             }
         }
-        return await make_meta_request("POST", self.base_url, self.token, payload)
\ No newline at end of file
+        return await self._post(payload, recipient_id)
\ No newline at end of file
@@ -1,27 +1,60 @@
-from app.repositories.conversation import ConversationRepository
-from app.repositories.message import MessageRepository
+from app.repositories.conversation import CachedConversationRepository
+from app.repositories.message import CachedMessageRepository
 from app.services.chatbot import ChatbotClient
 from app.services.orchestrator import MessageOrchestrator
 from app.adapters.whatsapp import WhatsAppAdapter
 from app.adapters.instagram import InstagramAdapter
 from app.adapters.email.sender import EmailAdapter
+from app.adapters.email.smtp_pool import smtp_pool
+from app.adapters.email.auth import graph_tokens
+from app.core.http import http_clients
+from app.adapters.ratelimit import meta_rate_limiter
+from app.services.dispatcher import outbound_dispatcher
+from app.services.coalescer import burst_coalescer
+from app.services.session_timeouts import session_timeouts
+from app.services.circuit_breaker import CircuitBreaker
+from app.services.retry import dead_letter_outbox
+from app.core.config import settings
 
-_wa_adapter = WhatsAppAdapter()
-_ig_adapter = InstagramAdapter()
-_email_adapter = EmailAdapter()
-_chatbot_client = ChatbotClient()
-_repo_conv = ConversationRepository()
-_repo_msg = MessageRepository()
+_wa_adapter = WhatsAppAdapter(http_clients, meta_rate_limiter, dead_letter_outbox)
+_ig_adapter = InstagramAdapter(http_clients, meta_rate_limiter, dead_letter_outbox)
+_email_adapter = EmailAdapter(http_clients, dead_letter_outbox, smtp_pool, graph_tokens)
+_backend_breaker = CircuitBreaker(
+    "backend_ask",
+    window_size=settings.BACKEND_BREAKER_WINDOW_SIZE,
+    min_calls=settings.BACKEND_BREAKER_MIN_CALLS,
+    error_rate_threshold=settings.BACKEND_BREAKER_ERROR_RATE,
+    p95_latency_threshold=settings.BACKEND_BREAKER_P95_LATENCY_SECONDS,
+    open_seconds=settings.BACKEND_BREAKER_OPEN_SECONDS,
+    half_open_max_calls=settings.BACKEND_BREAKER_HALF_OPEN_CALLS
+)
+_chatbot_client = ChatbotClient(http_clients, _backend_breaker, dead_letter_outbox)
+_repo_conv = CachedConversationRepository()
+_repo_msg = CachedMessageRepository()
 
-def get_orchestrator() -> MessageOrchestrator:
-    adapters = {
+def get_conversation_repo() -> CachedConversationRepository:
+    return _repo_conv
+
+def get_message_repo() -> CachedMessageRepository:
+    return _repo_msg
+
+def get_chatbot() -> ChatbotClient:
+    return _chatbot_client
+
+# The orchestrator holds no per-request state, so one instance serves every caller.
+_orchestrator = MessageOrchestrator(
+    repo_conv=_repo_conv,
+    repo_msg=_repo_msg,
+    chatbot=_chatbot_client,
+    adapters={
         "whatsapp": _wa_adapter,
         "instagram": _ig_adapter,
         "email": _email_adapter
-    }
-    return MessageOrchestrator(
-        repo_conv=_repo_conv,
-        repo_msg=_repo_msg,
-        chatbot=_chatbot_client,
-        adapters=adapters
-    )
\ No newline at end of file
+    },
+    dispatcher=outbound_dispatcher,
+    coalescer=burst_coalescer,
+    timeouts=session_timeouts
+)
+
+def get_orchestrator() -> MessageOrchestrator:
+    return _orchestrator
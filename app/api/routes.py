@@ -1,16 +1,25 @@
-from fastapi import APIRouter, Depends, BackgroundTasks, Request, Query, Response, HTTPException
+from functools import partial
+from typing import Dict, List
+from fastapi import APIRouter, Depends, Request, Query, Response, HTTPException
 from app.core.config import settings
 from app.schemas.models import IncomingMessage
-from app.api.dependencies import get_orchestrator
+from app.api.dependencies import get_orchestrator, get_chatbot, get_conversation_repo, get_message_repo
+from app.services.chatbot import ChatbotClient
 from app.services.orchestrator import MessageOrchestrator
 from app.services.parsers import parse_whatsapp_payload, parse_instagram_payload
-from app.repositories.message import MessageRepository
+from app.services.dispatcher import outbound_dispatcher
+from app.services.dedup import inbound_dedup
+from app.services.session_timeouts import session_timeouts
+from app.services.work_queue import Job, PRIORITY_HIGH, PRIORITY_NORMAL, inbound_queue
+from app.core.metrics import metrics
+from app.core.fastjson import dumps, loads
+from app.adapters.email.subscriptions import graph_subscriptions
 import logging
 
 logger = logging.getLogger("api.routes")
 router = APIRouter()
 
-_msg_repo = MessageRepository()
+_ACK_BODY = dumps({"status": "ok"})
 
 @router.get("/whatsapp/webhook")
 def verify_whatsapp(
@@ -32,67 +41,120 @@ def verify_instagram(
         return Response(content=challenge, media_type="text/plain")
     raise HTTPException(status_code=403, detail="Verification failed")
 
-@router.post("/whatsapp/webhook")
-async def whatsapp_webhook(
-    request: Request,
-    bg_tasks: BackgroundTasks,
-    orchestrator: MessageOrchestrator = Depends(get_orchestrator)
-):
-    data = await request.json()
-    msg = parse_whatsapp_payload(data)
-    
-    if msg:
+async def _run_inbound(orchestrator: MessageOrchestrator, messages: List[IncomingMessage]):
+    for msg in messages:
+        if await inbound_dedup.is_duplicate((msg.metadata or {}).get("message_id"), msg.platform):
+            continue
         if msg.metadata and msg.metadata.get("is_feedback"):
-            logger.info(f"Feedback Event Received (WA): {msg.metadata['payload']}")
-            bg_tasks.add_task(orchestrator.handle_feedback, msg)
+            logger.info(f"Feedback Event Received ({msg.platform}): {msg.metadata['payload']}")
+            await orchestrator.handle_feedback(msg)
         else:
-            bg_tasks.add_task(orchestrator.process_message, msg)
-            
-    return {"status": "ok"}
+            await orchestrator.process_message(msg)
+
+def _submit(jobs: List[Job], priority: int = PRIORITY_NORMAL):
+    """Queues `jobs` for the inbound workers, or answers 503 so the caller retries later."""
+    if not inbound_queue.try_submit(jobs, priority):
+        raise HTTPException(
+            status_code=503,
+            detail="Inbound queue is full, retry later",
+            headers={"Retry-After": str(settings.INBOUND_RETRY_AFTER_SECONDS)}
+        )
+
+def _enqueue_inbound(messages: List[IncomingMessage]):
+    """One job per sender, so a sender's messages stay in order while senders run in parallel."""
+    if not messages:
+        return
+    by_sender: Dict[str, List[IncomingMessage]] = {}
+    for msg in messages:
+        by_sender.setdefault(msg.platform_unique_id, []).append(msg)
+    orchestrator = get_orchestrator()
+    _submit([partial(_run_inbound, orchestrator, batch) for batch in by_sender.values()])
+    metrics.inc("webhook_messages", len(messages), platform=messages[0].platform)
+
+async def _read_json(request: Request):
+    try:
+        return loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON body")
+
+# Meta only needs a 200 back; the payload is handled after the response is sent.
+def _ack() -> Response:
+    return Response(content=_ACK_BODY, media_type="application/json")
+
+@router.post("/whatsapp/webhook")
+async def whatsapp_webhook(request: Request):
+    data = await _read_json(request)
+    _enqueue_inbound(list(parse_whatsapp_payload(data)))
+    return _ack()
 
 @router.post("/instagram/webhook")
-async def instagram_webhook(
-    request: Request,
-    bg_tasks: BackgroundTasks,
-    orchestrator: MessageOrchestrator = Depends(get_orchestrator)
-):
-    data = await request.json()
-    msg = parse_instagram_payload(data)
-    
-    if msg:
-        if msg.metadata and msg.metadata.get("is_feedback"):
-            logger.info(f"Feedback Event Received (IG): {msg.metadata['payload']}")
-            bg_tasks.add_task(orchestrator.handle_feedback, msg)
-        else:
-            bg_tasks.add_task(orchestrator.process_message, msg)
-            
-    return {"status": "ok"}
+async def instagram_webhook(request: Request):
+    data = await _read_json(request)
+    _enqueue_inbound(list(parse_instagram_payload(data)))
+    return _ack()
+
+@router.post("/email/webhook")
+async def email_webhook(request: Request, validation_token: str = Query(None, alias="validationToken")):
+    if validation_token is not None:
+        return Response(content=validation_token, media_type="text/plain")
+
+    data = await _read_json(request)
+    notifications = data.get("value", []) if isinstance(data, dict) else None
+    if not isinstance(notifications, list):
+        raise HTTPException(status_code=400, detail="Expected a notification collection")
+    accepted = graph_subscriptions.notify([item for item in notifications if isinstance(item, dict)])
+    if not accepted:
+        logger.warning("Email notification rejected: clientState mismatch")
+    return Response(status_code=202)
 
 @router.post("/api/send/reply")
-async def receive_backend_reply(
-    request: Request,
-    bg_tasks: BackgroundTasks,
-    orchestrator: MessageOrchestrator = Depends(get_orchestrator)
-):
-    data = await request.json()
+async def receive_backend_reply(request: Request):
+    data = await _read_json(request)
     logger.info(f"Received reply callback from Backend: {data}")
     
-    bg_tasks.add_task(orchestrator.send_manual_message, data)
+    _submit([partial(get_orchestrator().send_manual_message, data)], PRIORITY_HIGH)
     
     return {"status": "processed"}
 
 @router.post("/api/messages/process")
-async def process_message_internal(
-    msg: IncomingMessage,
-    bg_tasks: BackgroundTasks,
-    orchestrator: MessageOrchestrator = Depends(get_orchestrator)
-):
+async def process_message_internal(msg: IncomingMessage):
     if msg.platform == "email" and msg.metadata:
         unique_id = msg.metadata.get("graph_message_id") or msg.metadata.get("message_id")
         
-        if unique_id and _msg_repo.is_processed(unique_id, "email"):
-            logger.info(f"Duplicate email blocked: {unique_id}")
+        if await inbound_dedup.is_duplicate(unique_id, "email"):
             return {"status": "duplicate", "message": "Already processed"}
     
-    bg_tasks.add_task(orchestrator.process_message, msg)
-    return {"status": "queued"}
\ No newline at end of file
+    _submit([partial(get_orchestrator().process_message, msg)])
+    return {"status": "queued"}
+
+@router.get("/api/status/outbound")
+def outbound_status():
+    return outbound_dispatcher.stats()
+
+@router.get("/api/status/inbound")
+def inbound_status():
+    return inbound_queue.stats()
+
+@router.get("/api/status/dedup")
+def dedup_status():
+    return inbound_dedup.stats()
+
+@router.get("/api/status/sessions")
+def sessions_status():
+    return get_conversation_repo().stats()
+
+@router.get("/api/status/email-metadata")
+def email_metadata_status():
+    return get_message_repo().stats()
+
+@router.get("/api/status/timeouts")
+def timeouts_status():
+    return session_timeouts.stats()
+
+@router.get("/api/status/backend")
+def backend_status(chatbot: ChatbotClient = Depends(get_chatbot)):
+    return chatbot.breaker.snapshot()
+
+@router.get("/api/status/metrics")
+def metrics_status():
+    return metrics.snapshot()
@@ -13,10 +13,90 @@ class Settings(BaseSettings):
     BACKEND_API_BASE_URL: str
     BACKEND_API_KEY: Optional[str] = None
     BACKEND_API_TIMEOUT_SECONDS: int = 30
+
+    # Backend Circuit Breaker
+    BACKEND_BREAKER_WINDOW_SIZE: int = 50
+    BACKEND_BREAKER_MIN_CALLS: int = 10
+    BACKEND_BREAKER_ERROR_RATE: float = 0.5
+    BACKEND_BREAKER_P95_LATENCY_SECONDS: float = 10.0
+    BACKEND_BREAKER_OPEN_SECONDS: float = 30.0
+    BACKEND_BREAKER_HALF_OPEN_CALLS: int = 1
+    BACKEND_BUSY_REPLY_ENABLED: bool = False
+    BACKEND_BUSY_REPLY_TEXT: str = (
+        "Mohon maaf, layanan kami sedang sibuk. "
+        "Silakan coba kembali beberapa saat lagi."
+    )
     
     # Feature Flags
     EMAIL_POLL_INTERVAL_SECONDS: int = 15
+    EMAIL_POLL_MIN_INTERVAL_SECONDS: int = 2
+    EMAIL_SYNC_MODE: Literal["filter", "delta"] = "filter"
+    EMAIL_DELTA_RESYNC_LOOKBACK_HOURS: int = 24
+    EMAIL_INGEST_MODE: Literal["poll", "push"] = "poll"
+    # Safety poll interval while push is healthy
+    EMAIL_PUSH_SILENCE_SECONDS: int = 900
+    EMAIL_WORKER_CONCURRENCY: int = 4
     MAX_INPUT_CHARS: int = 6000
+    # Chat messages from one sender within the window are merged into one backend ask (0 disables)
+    CHAT_COALESCE_WINDOW_SECONDS: float = 0.0
+    CHAT_COALESCE_MAX_DELAY_SECONDS: float = 4.0
+    EMAIL_SANITIZE_PROCESS_WORKERS: int = 0
+    EMAIL_SANITIZE_OFFLOAD_CHARS: int = 200000
+
+    # Active Session Cache
+    SESSION_CACHE_SIZE: int = 50000
+    SESSION_CACHE_TTL_SECONDS: int = 900
+
+    # Session Timeouts
+    SESSION_TIMEOUT_MINUTES: int = 15
+    SESSION_TIMEOUT_RECONCILE_SECONDS: int = 600
+    SESSION_TIMEOUT_LOOKBACK_HOURS: int = 24
+    SESSION_TIMEOUT_CONCURRENCY: int = 4
+
+    # Email Thread Metadata Cache
+    EMAIL_METADATA_CACHE_SIZE: int = 20000
+    EMAIL_METADATA_CACHE_TTL_SECONDS: int = 3600
+
+    # Inbound Deduplication
+    DEDUP_CACHE_SIZE: int = 100000
+    DEDUP_CACHE_TTL_SECONDS: int = 86400
+    DEDUP_BATCH_SIZE: int = 100
+    DEDUP_BATCH_WINDOW_MS: int = 5
+
+    # Outbound HTTP Pools
+    HTTP2_ENABLED: bool = True
+    HTTP_TIMEOUT_SECONDS: float = 10.0
+    HTTP_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+
+    # Inbound Work Queue
+    INBOUND_WORKER_CONCURRENCY: int = 8
+    INBOUND_QUEUE_MAX_SIZE: int = 1000
+    INBOUND_QUEUE_DRAIN_SECONDS: float = 20.0
+    INBOUND_RETRY_AFTER_SECONDS: int = 5
+
+    # Outbound Dispatcher
+    OUTBOUND_MAX_CONCURRENCY: int = 50
+    OUTBOUND_SHUTDOWN_TIMEOUT_SECONDS: float = 10.0
+
+    # Meta Graph API Rate Limiting
+    META_RATE_PER_SECOND: float = 50.0
+    META_RATE_BURST: float = 50.0
+    META_RECIPIENT_RATE_PER_SECOND: float = 1.0
+    META_RECIPIENT_BURST: float = 5.0
+    META_RECIPIENT_BUCKETS_MAX: int = 10000
+    META_THROTTLE_MAX_WAIT_SECONDS: float = 60.0
+
+    # Retries & Dead Letters
+    RETRY_MAX_ATTEMPTS: int = 4
+    RETRY_BASE_DELAY_SECONDS: float = 0.5
+    RETRY_THROTTLED_BASE_DELAY_SECONDS: float = 2.0
+    RETRY_MAX_DELAY_SECONDS: float = 8.0
+    DEAD_LETTER_REDRIVE_INTERVAL_SECONDS: int = 60
+    DEAD_LETTER_REDRIVE_BATCH_SIZE: int = 100
+    DEAD_LETTER_MAX_REPLAYS: int = 20
 
     # Database
     DB_HOST: str
@@ -40,12 +120,34 @@ class Settings(BaseSettings):
     EMAIL_PORT: int = 587
     EMAIL_USER: Optional[str] = None
     EMAIL_PASS: Optional[str] = None
+    SMTP_USE_STARTTLS: Optional[bool] = None
+    SMTP_POOL_SIZE: int = 2
+    SMTP_TIMEOUT_SECONDS: float = 30.0
+    SMTP_IDLE_TIMEOUT_SECONDS: float = 240.0
+    SMTP_BATCH_WINDOW_MS: int = 0
+    SMTP_BATCH_MAX: int = 20
+    IMAP_HOST: str = "imap.gmail.com"
+    IMAP_PORT: int = 993
+    IMAP_USE_SSL: bool = True
+    IMAP_MAILBOX: str = "INBOX"
+    IMAP_IDLE_TIMEOUT_SECONDS: float = 1500.0
+    IMAP_FETCH_BATCH: int = 50
+    IMAP_BODY_PEEK_BYTES: int = 65536
+    IMAP_RECONNECT_MAX_SECONDS: float = 300.0
     
     # Azure OAuth2
     AZURE_CLIENT_ID: Optional[str] = None
     AZURE_CLIENT_SECRET: Optional[str] = None
     AZURE_TENANT_ID: Optional[str] = None
     AZURE_EMAIL_USER: Optional[str] = None
+    AZURE_TOKEN_REFRESH_MARGIN_SECONDS: int = 300
+    GRAPH_API_BASE_URL: str = "https://graph.microsoft.com/v1.0"
+    GRAPH_BATCH_TIMEOUT_SECONDS: float = 10.0
+    GRAPH_BATCH_MAX_ATTEMPTS: int = 5
+    EMAIL_WEBHOOK_PUBLIC_URL: Optional[str] = None
+    EMAIL_WEBHOOK_CLIENT_STATE: Optional[str] = None
+    GRAPH_SUBSCRIPTION_LIFETIME_MINUTES: int = 4200
+    GRAPH_SUBSCRIPTION_RENEW_MARGIN_SECONDS: int = 3600
 
     @property
     def BACKEND_ASK_URL(self) -> str:
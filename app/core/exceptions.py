@@ -12,4 +12,8 @@ class AdapterError(AppError):
 
 class DatabaseError(AppError):
     """Raised when database operation fails."""
+    pass
+
+class CircuitOpenError(AppError):
+    """Raised when a call is rejected because its circuit breaker is open."""
     pass
\ No newline at end of file
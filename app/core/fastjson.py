@@ -0,0 +1,22 @@
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+    _ORJSON_AVAILABLE = True
+except ImportError:
+    _ORJSON_AVAILABLE = False
+
+def loads(raw: Union[bytes, str]) -> Any:
+    """Parses a request body straight from bytes; orjson when installed, stdlib otherwise.
+
+    Raises ValueError on malformed input either way.
+    """
+    if _ORJSON_AVAILABLE:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+def dumps(obj: Any) -> bytes:
+    if _ORJSON_AVAILABLE:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":")).encode()
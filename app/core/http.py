@@ -0,0 +1,58 @@
+import httpx
+import logging
+from typing import Dict
+from urllib.parse import urlsplit
+from app.core.config import settings
+
+logger = logging.getLogger("core.http")
+
+try:
+    import h2  # noqa: F401
+    _HTTP2_AVAILABLE = True
+except ImportError:
+    _HTTP2_AVAILABLE = False
+
+class HttpClientRegistry:
+    """One keep-alive connection pool per upstream host, shared by adapters and services.
+
+    Everything runs on the application's single event loop, which the pools are bound to.
+    """
+
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+    def _build_client(self, host: str) -> httpx.AsyncClient:
+        http2 = settings.HTTP2_ENABLED and _HTTP2_AVAILABLE
+        if settings.HTTP2_ENABLED and not _HTTP2_AVAILABLE:
+            logger.warning("HTTP/2 requested but 'h2' is not installed, falling back to HTTP/1.1")
+        logger.info(f"Opening HTTP pool for {host} (http2={http2})")
+        return httpx.AsyncClient(
+            http2=http2,
+            timeout=httpx.Timeout(
+                settings.HTTP_TIMEOUT_SECONDS,
+                connect=settings.HTTP_CONNECT_TIMEOUT_SECONDS
+            ),
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SECONDS
+            )
+        )
+
+    def client_for(self, url: str) -> httpx.AsyncClient:
+        host = urlsplit(url).netloc.lower()
+        client = self._clients.get(host)
+        if client is None or client.is_closed:
+            client = self._build_client(host)
+            self._clients[host] = client
+        return client
+
+    async def close(self):
+        clients, self._clients = self._clients, {}
+        for host, client in clients.items():
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.warning(f"Failed to close HTTP pool for {host}: {e}")
+
+http_clients = HttpClientRegistry()
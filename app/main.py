@@ -1,54 +1,67 @@
-import threading
 import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
 from app.core.logging import setup_logging
-from app.repositories.base import Database
+from app.repositories.base import AsyncDatabase, Database
+from app.core.http import http_clients
+from app.services.dispatcher import outbound_dispatcher
+from app.services.work_queue import inbound_queue
+from app.services.coalescer import burst_coalescer
+from app.adapters.email.smtp_pool import smtp_pool
+from app.adapters.email.auth import graph_tokens
+from app.adapters.email.subscriptions import graph_subscriptions
+from app.adapters.email import sanitizer
 from app.api.routes import router as api_router
-from app.adapters.email.listener import start_email_listener
+from app.adapters.email.listener import run_email_listener
 from app.services.scheduler import run_scheduler
+from app.services.redriver import run_dead_letter_redriver
+from app.api.dependencies import get_orchestrator
+from app.repositories.dead_letter import DeadLetterRepository
+from app.repositories.sync_state import SyncStateRepository
 import logging
 
 setup_logging()
 logger = logging.getLogger("main")
 
-def _setup_email_listener():
-    is_listener_running = False
-    for t in threading.enumerate():
-        if t.name == "EmailListenerThread":
-            is_listener_running = True
-            break
-    
-    if not is_listener_running and settings.EMAIL_PROVIDER != "unknown":
-        email_thread = threading.Thread(
-            target=start_email_listener, 
-            name="EmailListenerThread", 
-            daemon=True
-        )
-        email_thread.start()
-        logger.info("Email Listener Thread Started")
-    elif is_listener_running:
-        logger.warning("⚠️ Email Listener already running, skipping start.")
-
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     Database.initialize()
+    DeadLetterRepository().ensure_schema()
+    SyncStateRepository().ensure_schema()
+    await AsyncDatabase.open()
     
-    scheduler_task = None
+    inbound_queue.start()
+    background_tasks = []
     
     if settings.ENABLE_BACKGROUND_WORKER:
-        _setup_email_listener()
-        scheduler_task = asyncio.create_task(run_scheduler())
+        if settings.EMAIL_PROVIDER != "unknown":
+            background_tasks.append(asyncio.create_task(run_email_listener()))
+        orchestrator = get_orchestrator()
+        background_tasks.append(asyncio.create_task(run_scheduler(orchestrator.timeout_session)))
+        background_tasks.append(asyncio.create_task(
+            run_dead_letter_redriver(orchestrator.adapters, orchestrator.chatbot, orchestrator.dispatcher)
+        ))
+        if settings.EMAIL_PROVIDER == "azure_oauth2":
+            background_tasks.append(asyncio.create_task(graph_tokens.run_refresher()))
+            if settings.EMAIL_INGEST_MODE == "push":
+                background_tasks.append(asyncio.create_task(graph_subscriptions.run()))
     
     yield
     
     try:
-        if scheduler_task:
-            scheduler_task.cancel()
-            await scheduler_task
+        for task in background_tasks:
+            task.cancel()
+        await asyncio.gather(*background_tasks, return_exceptions=True)
     finally:
+        await inbound_queue.stop()
+        await burst_coalescer.stop()
+        await outbound_dispatcher.stop()
+        await smtp_pool.close()
+        await http_clients.close()
+        sanitizer.shutdown_pool()
+        await AsyncDatabase.close()
         Database.close()
 
 app = FastAPI(
@@ -1,10 +1,26 @@
-from psycopg_pool import ConnectionPool
-from contextlib import contextmanager
+from psycopg_pool import AsyncConnectionPool, ConnectionPool
+from contextlib import asynccontextmanager, contextmanager
 from app.core.config import settings
 import logging
 
 logger = logging.getLogger("db")
 
+_CONN_ARGS = {
+    "keepalives": 1,
+    "keepalives_idle": 30,
+    "keepalives_interval": 10,
+    "keepalives_count": 5
+}
+
+def _conninfo() -> str:
+    return (
+        f"dbname={settings.DB_NAME} "
+        f"user={settings.DB_USER} "
+        f"password={settings.DB_PASS} "
+        f"host={settings.DB_HOST} "
+        f"port={settings.DB_PORT}"
+    )
+
 class Database:
     _pool: ConnectionPool = None
 
@@ -12,25 +28,12 @@ class Database:
     def initialize(cls):
         if cls._pool is None:
             logger.info("Initializing Database Connection Pool...")
-            conn_args = {
-                "keepalives": 1,
-                "keepalives_idle": 30,
-                "keepalives_interval": 10,
-                "keepalives_count": 5
-            }
-            
             cls._pool = ConnectionPool(
-                conninfo=(
-                    f"dbname={settings.DB_NAME} "
-                    f"user={settings.DB_USER} "
-                    f"password={settings.DB_PASS} "
-                    f"host={settings.DB_HOST} "
-                    f"port={settings.DB_PORT}"
-                ),
+                conninfo=_conninfo(),
                 min_size=1,
                 max_size=10,
                 timeout=30,
-                kwargs=conn_args, 
+                kwargs=_CONN_ARGS, 
                 check=ConnectionPool.check_connection 
             )
 
@@ -48,6 +51,44 @@ class Database:
         with cls._pool.connection() as conn:
             yield conn
 
+class AsyncDatabase:
+    """Async counterpart of Database for code running on the event loop.
+
+    Waiting for a free connection (up to `timeout`) suspends the caller instead
+    of blocking the loop. Opened and closed by the application lifespan.
+    """
+    _pool: AsyncConnectionPool = None
+
+    @classmethod
+    async def open(cls):
+        if cls._pool is None:
+            logger.info("Initializing Async Database Connection Pool...")
+            cls._pool = AsyncConnectionPool(
+                conninfo=_conninfo(),
+                min_size=1,
+                max_size=10,
+                timeout=30,
+                kwargs=_CONN_ARGS,
+                check=AsyncConnectionPool.check_connection,
+                open=False
+            )
+            await cls._pool.open()
+
+    @classmethod
+    async def close(cls):
+        if cls._pool:
+            await cls._pool.close()
+            cls._pool = None
+
+    @classmethod
+    @asynccontextmanager
+    async def get_connection(cls):
+        if cls._pool is None:
+            await cls.open()
+
+        async with cls._pool.connection() as conn:
+            yield conn
+
 def get_db_connection():
     with Database.get_connection() as conn:
         yield conn
\ No newline at end of file
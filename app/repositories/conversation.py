@@ -1,93 +1,193 @@
-from typing import Optional, List, Tuple
-from app.repositories.base import Database
+from typing import Any, Dict, Optional, List, Tuple
+from app.repositories.base import AsyncDatabase
+from app.core.cache import TTLCache
+from app.core.config import settings
 from app.core.exceptions import DatabaseError
+from app.core.metrics import metrics
 import logging
 
 logger = logging.getLogger("repo.conversation")
 
-class ConversationRepository:
-    def get_active_id(self, platform_id: str, platform: str) -> Optional[str]:
+_SELECT_LATEST = """
+    SELECT id, end_timestamp
+    FROM bkpm.conversations
+    WHERE platform_unique_id = %s AND platform = %s
+    ORDER BY start_timestamp DESC
+    LIMIT 1
+"""
+
+# Idle time is measured by the database clock so workers with skewed clocks agree.
+_SELECT_OPEN = """
+    SELECT c.id, c.platform, c.platform_unique_id,
+        EXTRACT(EPOCH FROM NOW() - GREATEST(c.start_timestamp, MAX(h.created_at)))
+    FROM bkpm.conversations c
+    LEFT JOIN bkpm.chat_history h ON h.session_id = c.id
+    WHERE c.end_timestamp IS NULL
+    AND c.platform = ANY(%s)
+    AND c.start_timestamp >= NOW() - %s * INTERVAL '1 hour'
+    GROUP BY c.id, c.platform, c.platform_unique_id, c.start_timestamp
+"""
+
+_SELECT_ACTIVITY = """
+    SELECT c.end_timestamp IS NULL,
+        EXTRACT(EPOCH FROM NOW() - COALESCE(
+            (SELECT MAX(created_at) FROM bkpm.chat_history WHERE session_id = c.id),
+            c.start_timestamp
+        ))
+    FROM bkpm.conversations c
+    WHERE c.id = %s
+"""
+
+_CLAIM_SESSION = """
+    UPDATE bkpm.conversations
+    SET end_timestamp = NOW()
+    WHERE id = %s AND end_timestamp IS NULL
+    RETURNING id
+"""
+
+def _active_id(row) -> Optional[str]:
+    if row:
+        conversation_id, end_timestamp = row
+        if end_timestamp is None:
+            return str(conversation_id)
+    return None
+
+class AsyncConversationRepository:
+    """Conversation queries on the async pool, for callers running on the event loop."""
+
+    def remember(self, platform_id: str, platform: str, conversation_id: str):
+        """Records a freshly minted conversation id; a no-op without a cache."""
+
+    def forget(self, conversation_id: str):
+        """Drops any cached state for `conversation_id`; a no-op without a cache."""
+
+    async def get_active_id(self, platform_id: str, platform: str) -> Optional[str]:
         try:
-            with Database.get_connection() as conn:
-                with conn.cursor() as cursor:
-                    cursor.execute(
-                        """
-                        SELECT id, end_timestamp
-                        FROM bkpm.conversations
-                        WHERE platform_unique_id = %s AND platform = %s
-                        ORDER BY start_timestamp DESC
-                        LIMIT 1
-                        """,
-                        (platform_id, platform)
-                    )
-                    row = cursor.fetchone()
-                    
-                    if row:
-                        conversation_id, end_timestamp = row
-                        if end_timestamp is None:
-                            return str(conversation_id)
-            return None
+            async with AsyncDatabase.get_connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(_SELECT_LATEST, (platform_id, platform))
+                    return _active_id(await cursor.fetchone())
         except Exception as e:
             logger.error(f"Error fetching active conversation: {e}")
             raise DatabaseError("Failed to fetch conversation")
 
-    def get_latest_id(self, platform_id: str, platform: str) -> Optional[str]:
+    async def get_latest_id(self, platform_id: str, platform: str) -> Optional[str]:
         try:
-            with Database.get_connection() as conn:
-                with conn.cursor() as cursor:
-                    cursor.execute(
-                        """
-                        SELECT id
-                        FROM bkpm.conversations
-                        WHERE platform_unique_id = %s AND platform = %s
-                        ORDER BY start_timestamp DESC
-                        LIMIT 1
-                        """,
-                        (platform_id, platform)
-                    )
-                    row = cursor.fetchone()
+            async with AsyncDatabase.get_connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(_SELECT_LATEST, (platform_id, platform))
+                    row = await cursor.fetchone()
                     return str(row[0]) if row else None
         except Exception as e:
             logger.error(f"Error fetching latest conversation: {e}")
             return None
 
-    def get_stale_sessions(self, minutes: int = 15) -> List[Tuple[str, str, str]]:
+    async def get_open_sessions(self, platforms: List[str], lookback_hours: int) -> List[Tuple[str, str, str, float]]:
+        """Open conversations started within `lookback_hours`, with seconds since their last activity.
+
+        Raises DatabaseError so a failed reconcile is not mistaken for "nothing open".
+        """
         try:
-            with Database.get_connection() as conn:
-                with conn.cursor() as cursor:
-                    cursor.execute(
-                        f"""
-                        SELECT c.id, c.platform, c.platform_unique_id
-                        FROM bkpm.conversations c
-                        WHERE c.end_timestamp IS NULL 
-                        AND c.platform IN ('whatsapp', 'instagram')
-                        AND c.start_timestamp >= CURRENT_DATE
-                        AND COALESCE(
-                            (SELECT MAX(created_at) FROM bkpm.chat_history WHERE session_id = c.id),
-                            c.start_timestamp
-                        ) < NOW() - INTERVAL '{minutes} minutes'
-                        LIMIT 50
-                        """
-                    )
-                    rows = cursor.fetchall()
-                    return [(str(row[0]), row[1], row[2]) for row in rows]
+            async with AsyncDatabase.get_connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(_SELECT_OPEN, (list(platforms), lookback_hours))
+                    rows = await cursor.fetchall()
+                    return [(str(row[0]), row[1], row[2], float(row[3])) for row in rows]
         except Exception as e:
-            logger.error(f"Error fetching stale sessions: {e}")
-            return []
+            logger.error(f"Error fetching open sessions: {e}")
+            raise DatabaseError("Failed to fetch open sessions")
 
-    def close_session(self, conversation_id: str):
+    async def get_session_activity(self, conversation_id: str) -> Optional[Tuple[bool, float]]:
+        """(is_open, seconds since last activity) for one conversation, None if it does not exist."""
         try:
-            with Database.get_connection() as conn:
-                with conn.cursor() as cursor:
-                    cursor.execute(
-                        """
-                        UPDATE bkpm.conversations
-                        SET end_timestamp = NOW()
-                        WHERE id = %s
-                        """,
-                        (conversation_id,)
-                    )
-                    conn.commit()
-                    logger.info(f"Session {conversation_id} closed successfully.")
+            async with AsyncDatabase.get_connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(_SELECT_ACTIVITY, (conversation_id,))
+                    row = await cursor.fetchone()
+                    return (bool(row[0]), float(row[1])) if row else None
         except Exception as e:
-            logger.error(f"Error closing session {conversation_id}: {e}")
\ No newline at end of file
+            logger.error(f"Error fetching activity for {conversation_id}: {e}")
+            raise DatabaseError("Failed to fetch session activity")
+
+    async def claim_session(self, conversation_id: str) -> bool:
+        """Closes the session only if it is still open; True if this call closed it."""
+        try:
+            async with AsyncDatabase.get_connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(_CLAIM_SESSION, (conversation_id,))
+                    claimed = await cursor.fetchone() is not None
+                    await conn.commit()
+                    if claimed:
+                        logger.info(f"Session {conversation_id} closed successfully.")
+                    return claimed
+        except Exception as e:
+            logger.error(f"Error claiming session {conversation_id}: {e}")
+            raise DatabaseError("Failed to claim session")
+
+class CachedConversationRepository(AsyncConversationRepository):
+    """AsyncConversationRepository with an in-process cache of active sessions.
+
+    Keyed by (platform, platform_unique_id). Entries are written when the
+    orchestrator mints a conversation id or the DB returns an active one, and
+    dropped by claim_session / forget. Entries expire `ttl` seconds after they
+    were written (hits do not extend them), which bounds staleness for sessions
+    closed outside this process.
+    """
+
+    def __init__(self, max_size: int = None, ttl: float = None):
+        max_size = max_size or settings.SESSION_CACHE_SIZE
+        ttl = settings.SESSION_CACHE_TTL_SECONDS if ttl is None else ttl
+        self._active: TTLCache[str] = TTLCache(max_size, ttl)
+        self._keys: TTLCache[Tuple[str, str]] = TTLCache(max_size, ttl)
+
+    def _lookup(self, platform_id: str, platform: str) -> Optional[str]:
+        metrics.inc("session_cache_lookups", platform=platform)
+        conversation_id = self._active.get((platform, platform_id))
+        if conversation_id:
+            metrics.inc("session_cache_hits", platform=platform)
+        return conversation_id
+
+    def remember(self, platform_id: str, platform: str, conversation_id: str):
+        key = (platform, platform_id)
+        previous = self._active.get(key)
+        if previous and previous != conversation_id:
+            self._keys.pop(previous)
+        self._active.set(key, conversation_id)
+        self._keys.set(conversation_id, key)
+
+    def forget(self, conversation_id: str):
+        key = self._keys.pop(conversation_id)
+        if key and self._active.get(key) == conversation_id:
+            self._active.pop(key)
+
+    async def get_active_id(self, platform_id: str, platform: str) -> Optional[str]:
+        conversation_id = self._lookup(platform_id, platform)
+        if conversation_id:
+            return conversation_id
+        conversation_id = await super().get_active_id(platform_id, platform)
+        if conversation_id:
+            self.remember(platform_id, platform, conversation_id)
+        return conversation_id
+
+    async def get_latest_id(self, platform_id: str, platform: str) -> Optional[str]:
+        # The active session is always the latest one.
+        return self._lookup(platform_id, platform) or await super().get_latest_id(platform_id, platform)
+
+    async def claim_session(self, conversation_id: str) -> bool:
+        self.forget(conversation_id)
+        return await super().claim_session(conversation_id)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = hits = 0
+        for row in metrics.snapshot()["counters"]:
+            if row["name"] == "session_cache_lookups":
+                lookups += row["value"]
+            elif row["name"] == "session_cache_hits":
+                hits += row["value"]
+        metrics.set_gauge("session_cache_entries", len(self._active))
+        return {
+            "entries": len(self._active),
+            "lookups": lookups,
+            "hits": hits,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0
+        }
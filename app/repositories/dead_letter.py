@@ -0,0 +1,145 @@
+import json
+from typing import Any, Dict, List
+from app.repositories.base import Database
+import logging
+
+logger = logging.getLogger("repo.dead_letter")
+
+class DeadLetterRepository:
+    def ensure_schema(self):
+        try:
+            with Database.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        """
+                        CREATE TABLE IF NOT EXISTS bkpm.dead_letters (
+                            id BIGSERIAL PRIMARY KEY,
+                            kind TEXT NOT NULL,
+                            platform TEXT,
+                            recipient_id TEXT,
+                            payload JSONB NOT NULL,
+                            error TEXT,
+                            attempts INT NOT NULL DEFAULT 0,
+                            replay_count INT NOT NULL DEFAULT 0,
+                            status TEXT NOT NULL DEFAULT 'pending',
+                            created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                            updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+                        )
+                        """
+                    )
+                    cursor.execute(
+                        """
+                        CREATE INDEX IF NOT EXISTS dead_letters_pending_idx
+                        ON bkpm.dead_letters (created_at)
+                        WHERE status = 'pending'
+                        """
+                    )
+                    conn.commit()
+        except Exception as e:
+            logger.error(f"Failed to ensure dead letter table: {e}")
+
+    def save(self, kind: str, platform: str, recipient_id: str, payload: Dict[str, Any], error: str, attempts: int):
+        try:
+            with Database.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        """
+                        INSERT INTO bkpm.dead_letters (kind, platform, recipient_id, payload, error, attempts)
+                        VALUES (%s, %s, %s, %s, %s, %s)
+                        """,
+                        (kind, platform, recipient_id, json.dumps(payload), error, attempts)
+                    )
+                    conn.commit()
+                    logger.warning(f"Dead-lettered {kind} for {platform}:{recipient_id} after {attempts} attempts")
+        except Exception as e:
+            logger.error(f"Failed to dead-letter {kind} for {platform}:{recipient_id}: {e} | payload={payload}")
+
+    def claim_pending(self, limit: int) -> List[Dict[str, Any]]:
+        try:
+            with Database.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        """
+                        UPDATE bkpm.dead_letters
+                        SET status = 'replaying', updated_at = NOW()
+                        WHERE id IN (
+                            SELECT id FROM bkpm.dead_letters
+                            WHERE status = 'pending'
+                            ORDER BY created_at
+                            LIMIT %s
+                            FOR UPDATE SKIP LOCKED
+                        )
+                        RETURNING id, kind, platform, recipient_id, payload, replay_count
+                        """,
+                        (limit,)
+                    )
+                    rows = cursor.fetchall()
+                    conn.commit()
+                    return [
+                        {
+                            "id": row[0],
+                            "kind": row[1],
+                            "platform": row[2],
+                            "recipient_id": row[3],
+                            "payload": row[4],
+                            "replay_count": row[5]
+                        }
+                        for row in sorted(rows, key=lambda r: r[0])
+                    ]
+        except Exception as e:
+            logger.error(f"Failed to claim dead letters: {e}")
+            return []
+
+    def mark_replayed(self, ids: List[int]):
+        if not ids: return
+        try:
+            with Database.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        """
+                        UPDATE bkpm.dead_letters
+                        SET status = 'replayed', replay_count = replay_count + 1, updated_at = NOW()
+                        WHERE id = ANY(%s)
+                        """,
+                        (ids,)
+                    )
+                    conn.commit()
+        except Exception as e:
+            logger.error(f"Failed to mark dead letters replayed: {e}")
+
+    def release(self, ids: List[int], error: str, max_replays: int, count_attempt: bool = True):
+        if not ids: return
+        try:
+            with Database.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        """
+                        UPDATE bkpm.dead_letters
+                        SET replay_count = replay_count + %s,
+                            status = CASE WHEN replay_count + %s >= %s THEN 'abandoned' ELSE 'pending' END,
+                            error = COALESCE(%s, error),
+                            updated_at = NOW()
+                        WHERE id = ANY(%s)
+                        """,
+                        (int(count_attempt), int(count_attempt), max_replays, error, ids)
+                    )
+                    conn.commit()
+        except Exception as e:
+            logger.error(f"Failed to release dead letters: {e}")
+
+    def reset_stuck(self, older_than_minutes: int = 10):
+        try:
+            with Database.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        """
+                        UPDATE bkpm.dead_letters
+                        SET status = 'pending', updated_at = NOW()
+                        WHERE status = 'replaying'
+                        AND updated_at < NOW() - make_interval(mins => %s)
+                        """,
+                        (older_than_minutes,)
+                    )
+                    conn.commit()
+        except Exception as e:
+            logger.error(f"Failed to reset stuck dead letters: {e}")
@@ -1,115 +1,204 @@
-from typing import Optional, Dict
-from psycopg import errors # Pastikan library psycopg sudah terinstall
-from app.repositories.base import Database
+from typing import Any, Optional, Dict, List, Tuple
+from app.repositories.base import AsyncDatabase
+from app.core.cache import TTLCache
+from app.core.config import settings
 from app.core.exceptions import DatabaseError
+from app.core.metrics import metrics
 import logging
 
 logger = logging.getLogger("repo.message")
 
-class MessageRepository:
-    def is_processed(self, message_id: str, platform: str) -> bool:
+_CLAIM_IDS = """
+    INSERT INTO bkpm.processed_messages (message_id, platform)
+    SELECT * FROM unnest(%s::text[], %s::text[])
+    ON CONFLICT DO NOTHING
+    RETURNING message_id, platform
+"""
+
+_SELECT_BY_THREAD = """
+    SELECT conversation_id
+    FROM bkpm.email_metadata
+    WHERE thread_key = %s
+    LIMIT 1
+"""
+
+_UPSERT_EMAIL_METADATA = """
+    INSERT INTO bkpm.email_metadata (conversation_id, subject, in_reply_to, "references", thread_key)
+    VALUES (%s, %s, %s, %s, %s)
+    ON CONFLICT (conversation_id)
+    DO UPDATE SET
+        subject = EXCLUDED.subject,
+        in_reply_to = EXCLUDED.in_reply_to,
+        "references" = EXCLUDED."references",
+        thread_key = EXCLUDED.thread_key,
+        updated_at = NOW()
+"""
+
+_SELECT_EMAIL_METADATA = """
+    SELECT subject, in_reply_to, "references", thread_key
+    FROM bkpm.email_metadata
+    WHERE conversation_id = %s
+    LIMIT 1
+"""
+
+_SELECT_LATEST_ANSWER = "SELECT id FROM bkpm.chat_history WHERE session_id = %s ORDER BY created_at DESC LIMIT 1"
+
+def _claim_params(items: List[Tuple[str, str]]):
+    return ([mid for mid, _ in items], [platform for _, platform in items])
+
+def _email_metadata(row) -> Optional[Dict[str, str]]:
+    if not row:
+        return None
+    return {
+        "subject": row[0],
+        "in_reply_to": row[1],
+        "graph_message_id": row[1], # Alias untuk Azure
+        "references": row[2],
+        "thread_key": row[3]
+    }
+
+class AsyncMessageRepository:
+    """Message and email-thread queries on the async pool, for callers running on the event loop."""
+
+    async def claim_message_ids(self, items: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+        """Inserts (message_id, platform) pairs in one statement; returns only the newly inserted ones.
+
+        Raises DatabaseError so callers can decide how to treat an unknown outcome.
+        """
+        if not items: return []
         try:
-            with Database.get_connection() as conn:
-                with conn.cursor() as cursor:
-                    try:
-                        cursor.execute(
-                            """
-                            INSERT INTO bkpm.processed_messages (message_id, platform)
-                            VALUES (%s, %s)
-                            """,
-                            (message_id, platform)
-                        )
-                        conn.commit()
-                        return False 
-                        
-                    except errors.UniqueViolation:
-                        conn.rollback()
-                        return True 
-                        
+            async with AsyncDatabase.get_connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(_CLAIM_IDS, _claim_params(items))
+                    inserted = [(row[0], row[1]) for row in await cursor.fetchall()]
+                    await conn.commit()
+                    return inserted
         except Exception as e:
-            if "duplicate key" in str(e).lower():
-                return True
-            logger.error(f"DB Check Error: {e}")
-            return True 
+            raise DatabaseError(f"Failed to claim message ids: {e}") from e
 
-    def get_conversation_by_azure_thread(self, azure_conversation_id: str) -> Optional[str]:
+    async def get_conversation_by_azure_thread(self, azure_conversation_id: str) -> Optional[str]:
         if not azure_conversation_id: return None
         try:
-            with Database.get_connection() as conn:
-                with conn.cursor() as cursor:
-                    cursor.execute(
-                        """
-                        SELECT conversation_id 
-                        FROM bkpm.email_metadata 
-                        WHERE thread_key = %s 
-                        LIMIT 1
-                        """, 
-                        (azure_conversation_id,)
-                    )
-                    row = cursor.fetchone()
+            async with AsyncDatabase.get_connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(_SELECT_BY_THREAD, (azure_conversation_id,))
+                    row = await cursor.fetchone()
                     return str(row[0]) if row else None
         except Exception as e:
             logger.error(f"Failed to find Azure thread: {e}")
             return None
 
-    def get_conversation_by_thread(self, thread_key: str) -> Optional[str]:
-        return self.get_conversation_by_azure_thread(thread_key)
+    async def get_conversation_by_thread(self, thread_key: str) -> Optional[str]:
+        return await self.get_conversation_by_azure_thread(thread_key)
 
-    def save_email_metadata(self, conversation_id: str, subject: str, in_reply_to: str, references: str, thread_key: str):
+    async def save_email_metadata(self, conversation_id: str, subject: str, in_reply_to: str, references: str, thread_key: str) -> bool:
         try:
-            with Database.get_connection() as conn:
-                with conn.cursor() as cursor:
-                    cursor.execute(
-                        """
-                        INSERT INTO bkpm.email_metadata (conversation_id, subject, in_reply_to, "references", thread_key)
-                        VALUES (%s, %s, %s, %s, %s)
-                        ON CONFLICT (conversation_id) 
-                        DO UPDATE SET
-                            subject = EXCLUDED.subject,
-                            in_reply_to = EXCLUDED.in_reply_to,
-                            "references" = EXCLUDED."references",
-                            thread_key = EXCLUDED.thread_key,
-                            updated_at = NOW()
-                        """,
+            async with AsyncDatabase.get_connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(
+                        _UPSERT_EMAIL_METADATA,
                         (conversation_id, subject, in_reply_to, references, thread_key)
                     )
-                    conn.commit()
+                    await conn.commit()
+                    return True
         except Exception as e:
             logger.error(f"Failed to save email metadata: {e}")
+            return False
 
-    def get_email_metadata(self, conversation_id: str) -> Optional[Dict[str, str]]:
+    async def get_email_metadata(self, conversation_id: str) -> Optional[Dict[str, str]]:
         try:
-            with Database.get_connection() as conn:
-                with conn.cursor() as cursor:
-                    cursor.execute(
-                        """
-                        SELECT subject, in_reply_to, "references", thread_key 
-                        FROM bkpm.email_metadata 
-                        WHERE conversation_id = %s 
-                        LIMIT 1
-                        """, 
-                        (conversation_id,)
-                    )
-                    row = cursor.fetchone()
-                    if row:
-                        return {
-                            "subject": row[0], 
-                            "in_reply_to": row[1],  
-                            "graph_message_id": row[1], # Alias untuk Azure
-                            "references": row[2], 
-                            "thread_key": row[3]  
-                        }
-            return None
+            async with AsyncDatabase.get_connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(_SELECT_EMAIL_METADATA, (conversation_id,))
+                    return _email_metadata(await cursor.fetchone())
         except Exception as e:
             logger.error(f"Failed to get email metadata: {e}")
             return None
 
-    def get_latest_answer_id(self, conversation_id: str) -> Optional[int]:
+    async def get_latest_answer_id(self, conversation_id: str) -> Optional[int]:
         try:
-            with Database.get_connection() as conn:
-                with conn.cursor() as cursor:
-                    cursor.execute("SELECT id FROM bkpm.chat_history WHERE session_id = %s ORDER BY created_at DESC LIMIT 1", (conversation_id,))
-                    row = cursor.fetchone()
+            async with AsyncDatabase.get_connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(_SELECT_LATEST_ANSWER, (conversation_id,))
+                    row = await cursor.fetchone()
                     return int(row[0]) if row else None
         except Exception:
-            return None
\ No newline at end of file
+            return None
+
+class CachedMessageRepository(AsyncMessageRepository):
+    """AsyncMessageRepository with an in-process cache of email thread metadata.
+
+    Metadata is cached by conversation id and the conversation id by thread key;
+    both are filled by reads and by successful upserts, and an upsert that would
+    not change the stored row is skipped. Entries expire `ttl` seconds after they
+    were written, bounding staleness when another worker updates the same thread.
+    """
+
+    def __init__(self, max_size: int = None, ttl: float = None):
+        max_size = max_size or settings.EMAIL_METADATA_CACHE_SIZE
+        ttl = settings.EMAIL_METADATA_CACHE_TTL_SECONDS if ttl is None else ttl
+        self._metadata: TTLCache[Dict[str, str]] = TTLCache(max_size, ttl)
+        self._threads: TTLCache[str] = TTLCache(max_size, ttl)
+
+    def _cached(self, cache: TTLCache, key: str, kind: str):
+        metrics.inc("email_metadata_cache_lookups", kind=kind)
+        value = cache.get(key)
+        if value is not None:
+            metrics.inc("email_metadata_cache_hits", kind=kind)
+        return value
+
+    def _store(self, conversation_id: str, metadata: Dict[str, str]):
+        self._metadata.set(conversation_id, metadata)
+        if metadata.get("thread_key"):
+            self._threads.set(metadata["thread_key"], conversation_id)
+
+    async def get_conversation_by_azure_thread(self, azure_conversation_id: str) -> Optional[str]:
+        if not azure_conversation_id: return None
+        conversation_id = self._cached(self._threads, azure_conversation_id, "thread")
+        if conversation_id:
+            return conversation_id
+        conversation_id = await super().get_conversation_by_azure_thread(azure_conversation_id)
+        if conversation_id:
+            self._threads.set(azure_conversation_id, conversation_id)
+        return conversation_id
+
+    async def get_email_metadata(self, conversation_id: str) -> Optional[Dict[str, str]]:
+        metadata = self._cached(self._metadata, conversation_id, "conversation")
+        if metadata is None:
+            metadata = await super().get_email_metadata(conversation_id)
+            if metadata is None:
+                return None
+            self._store(conversation_id, metadata)
+        # Callers may mutate what they get back (send kwargs), so hand out a copy.
+        return dict(metadata)
+
+    async def save_email_metadata(self, conversation_id: str, subject: str, in_reply_to: str, references: str, thread_key: str) -> bool:
+        cached = self._metadata.get(conversation_id)
+        if cached and (cached["subject"], cached["in_reply_to"], cached["references"], cached["thread_key"]) == (
+            subject, in_reply_to, references, thread_key
+        ):
+            metrics.inc("email_metadata_upserts_skipped")
+            return True
+        saved = await super().save_email_metadata(conversation_id, subject, in_reply_to, references, thread_key)
+        if saved:
+            self._store(conversation_id, _email_metadata((subject, in_reply_to, references, thread_key)))
+        return saved
+
+    def stats(self) -> Dict[str, Any]:
+        kinds = {}
+        skipped = 0
+        for row in metrics.snapshot()["counters"]:
+            if row["name"] in ("email_metadata_cache_lookups", "email_metadata_cache_hits"):
+                kind = kinds.setdefault(row["labels"]["kind"], {"lookups": 0, "hits": 0})
+                kind["lookups" if row["name"] == "email_metadata_cache_lookups" else "hits"] += row["value"]
+            elif row["name"] == "email_metadata_upserts_skipped":
+                skipped += row["value"]
+        for kind in kinds.values():
+            kind["hit_ratio"] = round(kind["hits"] / kind["lookups"], 4) if kind["lookups"] else 0.0
+        metrics.set_gauge("email_metadata_cache_entries", len(self._metadata))
+        return {
+            "entries": len(self._metadata),
+            "threads": len(self._threads),
+            "upserts_skipped": skipped,
+            "lookups": kinds
+        }
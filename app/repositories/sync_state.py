@@ -0,0 +1,65 @@
+from typing import Optional
+from app.repositories.base import Database
+import logging
+
+logger = logging.getLogger("repo.sync_state")
+
+class SyncStateRepository:
+    """Key/value cursor store for mailbox sync (Graph delta links, IMAP UIDs)."""
+
+    def ensure_schema(self):
+        try:
+            with Database.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        """
+                        CREATE TABLE IF NOT EXISTS bkpm.email_sync_state (
+                            sync_key TEXT PRIMARY KEY,
+                            state TEXT NOT NULL,
+                            updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+                        )
+                        """
+                    )
+                    conn.commit()
+        except Exception as e:
+            logger.error(f"Failed to ensure sync state table: {e}")
+
+    def get(self, sync_key: str) -> Optional[str]:
+        try:
+            with Database.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        "SELECT state FROM bkpm.email_sync_state WHERE sync_key = %s",
+                        (sync_key,)
+                    )
+                    row = cursor.fetchone()
+                    return row[0] if row else None
+        except Exception as e:
+            logger.error(f"Failed to read sync state {sync_key}: {e}")
+            return None
+
+    def set(self, sync_key: str, state: str):
+        try:
+            with Database.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        """
+                        INSERT INTO bkpm.email_sync_state (sync_key, state)
+                        VALUES (%s, %s)
+                        ON CONFLICT (sync_key)
+                        DO UPDATE SET state = EXCLUDED.state, updated_at = NOW()
+                        """,
+                        (sync_key, state)
+                    )
+                    conn.commit()
+        except Exception as e:
+            logger.error(f"Failed to save sync state {sync_key}: {e}")
+
+    def clear(self, sync_key: str):
+        try:
+            with Database.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("DELETE FROM bkpm.email_sync_state WHERE sync_key = %s", (sync_key,))
+                    conn.commit()
+        except Exception as e:
+            logger.error(f"Failed to clear sync state {sync_key}: {e}")
@@ -1,12 +1,24 @@
-import httpx
+import time
 from datetime import datetime, timezone
 from app.core.config import settings
+from app.core.http import HttpClientRegistry
+from app.core.exceptions import CircuitOpenError
+from app.services.circuit_breaker import CircuitBreaker
+from app.services.retry import DeadLetterOutbox, is_success
 from app.schemas.models import ChatbotResponse
 import logging
 
 logger = logging.getLogger("service.chatbot")
 
 class ChatbotClient:
+    def __init__(self, http: HttpClientRegistry, breaker: CircuitBreaker, outbox: DeadLetterOutbox):
+        self.http = http
+        self.breaker = breaker
+        self.outbox = outbox
+
+    def is_available(self) -> bool:
+        return self.breaker.is_available()
+
     async def ask(self, query: str, conversation_id: str, platform: str, user_id: str) -> bool:
         start_timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
         safe_conv_id = conversation_id or ""
@@ -19,24 +31,42 @@ class ChatbotClient:
             "start_timestamp": start_timestamp 
         }
         
+        result = await self.outbox.deliver(
+            lambda: self._push(payload),
+            kind="backend_ask", platform=platform, recipient_id=user_id, payload=payload
+        )
+        return is_success(result)
+
+    async def redeliver(self, payload: dict) -> dict:
+        return await self._push(payload)
+
+    async def _push(self, payload: dict) -> dict:
         headers = {"Content-Type": "application/json"}
         if settings.BACKEND_API_KEY:
             headers["X-API-Key"] = settings.BACKEND_API_KEY
 
         url = settings.BACKEND_ASK_URL
-        
-        logger.info(f"PUSH TO BACKEND: {url} | ConvID: {safe_conv_id}")
-        
+
+        if not self.breaker.allow_request():
+            raise CircuitOpenError(f"Backend circuit is {self.breaker.state}, ask rejected")
+
+        logger.info(f"PUSH TO BACKEND: {url} | ConvID: {payload['conversation_id']}")
+
+        started = time.monotonic()
+        reachable = False
         try:
-            async with httpx.AsyncClient(timeout=settings.BACKEND_API_TIMEOUT_SECONDS) as client:
-                resp = await client.post(url, json=payload, headers=headers)
-                
+            client = self.http.client_for(url)
+            resp = await client.post(url, json=payload, headers=headers, timeout=settings.BACKEND_API_TIMEOUT_SECONDS)
+            reachable = resp.status_code < 500
+
             if resp.status_code == 200:
-                return True
+                return {"success": True, "status_code": resp.status_code}
             else:
                 logger.warning(f"Backend API Error {resp.status_code}: {resp.text}")
-                return False
+                return {"success": False, "status_code": resp.status_code, "error": resp.text}
 
         except Exception as e:
             logger.error(f"Failed to push to Backend API: {e}")
-            return False
\ No newline at end of file
+            return {"success": False, "error": str(e)}
+        finally:
+            self.breaker.record(reachable, time.monotonic() - started)
@@ -0,0 +1,125 @@
+import threading
+import time
+import logging
+from collections import deque
+from typing import Any, Deque, Dict, Tuple
+
+logger = logging.getLogger("service.circuit_breaker")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker tripped by error rate or p95 latency over a rolling window."""
+
+    def __init__(
+        self,
+        name: str,
+        window_size: int,
+        min_calls: int,
+        error_rate_threshold: float,
+        p95_latency_threshold: float,
+        open_seconds: float,
+        half_open_max_calls: int = 1
+    ):
+        self.name = name
+        self.min_calls = min_calls
+        self.error_rate_threshold = error_rate_threshold
+        self.p95_latency_threshold = p95_latency_threshold
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+
+        self._lock = threading.Lock()
+        self._window: Deque[Tuple[bool, float]] = deque(maxlen=window_size)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._half_open_in_flight = 0
+        self._trip_reason = None
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._half_open_in_flight = 0
+            logger.info(f"Circuit '{self.name}' half-open, allowing probe requests")
+        return self._state
+
+    def is_available(self) -> bool:
+        with self._lock:
+            state = self._current_state()
+            return state == CLOSED or (state == HALF_OPEN and self._half_open_in_flight < self.half_open_max_calls)
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and self._half_open_in_flight < self.half_open_max_calls:
+                self._half_open_in_flight += 1
+                return True
+            return False
+
+    def record(self, success: bool, latency: float):
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._half_open_in_flight = max(self._half_open_in_flight - 1, 0)
+                if success:
+                    self._close()
+                else:
+                    self._open("half-open probe failed")
+                return
+            if self._state == OPEN:
+                return
+
+            self._window.append((success, latency))
+            if len(self._window) < self.min_calls:
+                return
+
+            error_rate = self._error_rate()
+            if error_rate >= self.error_rate_threshold:
+                self._open(f"error rate {error_rate:.0%}")
+                return
+            p95 = self._p95_latency()
+            if p95 >= self.p95_latency_threshold:
+                self._open(f"p95 latency {p95:.1f}s")
+
+    def _error_rate(self) -> float:
+        failures = sum(1 for ok, _ in self._window if not ok)
+        return failures / len(self._window) if self._window else 0.0
+
+    def _p95_latency(self) -> float:
+        if not self._window:
+            return 0.0
+        latencies = sorted(latency for _, latency in self._window)
+        return latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)]
+
+    def _open(self, reason: str):
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._trip_reason = reason
+        logger.warning(f"Circuit '{self.name}' OPEN: {reason}")
+
+    def _close(self):
+        self._state = CLOSED
+        self._window.clear()
+        self._trip_reason = None
+        logger.info(f"Circuit '{self.name}' closed")
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            state = self._current_state()
+            retry_in = self.open_seconds - (time.monotonic() - self._opened_at) if state == OPEN else 0.0
+            return {
+                "name": self.name,
+                "state": state,
+                "reason": self._trip_reason,
+                "retry_in_seconds": round(max(retry_in, 0.0), 1),
+                "window_calls": len(self._window),
+                "error_rate": round(self._error_rate(), 3),
+                "p95_latency_seconds": round(self._p95_latency(), 3)
+            }
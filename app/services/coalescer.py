@@ -0,0 +1,134 @@
+import asyncio
+import time
+import logging
+from functools import partial
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.schemas.models import IncomingMessage
+from app.services.work_queue import InboundWorkQueue, inbound_queue
+
+logger = logging.getLogger("service.coalescer")
+
+Flush = Callable[[IncomingMessage], Awaitable[None]]
+BurstKey = Tuple[str, str]
+
+class _Burst:
+    __slots__ = ("messages", "chars", "first_at", "deadline", "flush", "task")
+
+    def __init__(self, msg: IncomingMessage, flush: Flush, now: float):
+        self.messages: List[IncomingMessage] = [msg]
+        self.chars = len(msg.query)
+        self.first_at = now
+        self.deadline = now
+        self.flush = flush
+        self.task: Optional[asyncio.Task] = None
+
+def _merge(messages: List[IncomingMessage]) -> IncomingMessage:
+    if len(messages) == 1:
+        return messages[0]
+    # The last message carries the freshest metadata (e.g. the message id to mark read).
+    return messages[-1].model_copy(update={
+        "query": "\n".join(m.query for m in messages),
+        "conversation_id": messages[0].conversation_id or messages[-1].conversation_id
+    })
+
+class BurstCoalescer:
+    """Merges rapid consecutive messages from one sender into a single backend ask.
+
+    Each message pushes the burst's flush time out by `window` seconds, but never
+    past `max_delay` after its first message. A message that would take the merged
+    text over `max_chars` flushes the current burst first and starts a new one.
+
+    A due burst runs as a job on the inbound work queue, so backend asks stay
+    bounded by its worker pool; when the queue is full the burst is shed, like a
+    webhook that gets a 503. Once the queue stops at shutdown, due bursts run
+    inline and `stop` waits for them.
+    """
+
+    def __init__(self, window: float = None, max_delay: float = None, max_chars: int = None,
+                 queue: InboundWorkQueue = None):
+        self.window = settings.CHAT_COALESCE_WINDOW_SECONDS if window is None else window
+        self.max_delay = settings.CHAT_COALESCE_MAX_DELAY_SECONDS if max_delay is None else max_delay
+        self.max_chars = max_chars or settings.MAX_INPUT_CHARS
+        self.queue = queue or inbound_queue
+        self._bursts: Dict[BurstKey, _Burst] = {}
+        self._flushing: Set[asyncio.Task] = set()
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0
+
+    def add(self, msg: IncomingMessage, flush: Flush):
+        """Buffers `msg`; `flush` is later awaited once with the merged message."""
+        key = (msg.platform, msg.platform_unique_id)
+        now = time.monotonic()
+        burst = self._bursts.get(key)
+
+        if burst is not None and burst.chars + 1 + len(msg.query) > self.max_chars:
+            self._release(key, burst)
+            burst = None
+
+        if burst is None:
+            burst = self._bursts[key] = _Burst(msg, flush, now)
+            burst.task = asyncio.create_task(self._wait_and_flush(key, burst))
+        else:
+            burst.messages.append(msg)
+            burst.chars += 1 + len(msg.query)
+            burst.flush = flush
+            metrics.inc("chat_messages_coalesced", platform=msg.platform)
+        burst.deadline = min(now + self.window, burst.first_at + self.max_delay)
+
+    async def _wait_and_flush(self, key: BurstKey, burst: _Burst):
+        # The deadline moves while messages keep arriving, so re-check after each sleep.
+        while True:
+            delay = burst.deadline - time.monotonic()
+            if delay <= 0:
+                break
+            await asyncio.sleep(delay)
+        if self._bursts.get(key) is burst:
+            del self._bursts[key]
+        self._dispatch(key, burst)
+
+    def _release(self, key: BurstKey, burst: _Burst):
+        del self._bursts[key]
+        burst.task.cancel()
+        self._dispatch(key, burst)
+
+    def _dispatch(self, key: BurstKey, burst: _Burst):
+        if self.queue.try_submit([partial(self._run, key, burst)]):
+            return
+        if self.queue.accepting:
+            logger.warning(f"Inbound queue full, dropping a burst of {len(burst.messages)} messages from {key[0]}:{key[1]}")
+            metrics.inc("chat_bursts_shed", platform=key[0])
+            return
+        self._track(asyncio.create_task(self._run(key, burst)))
+
+    def _track(self, task: asyncio.Task):
+        self._flushing.add(task)
+        task.add_done_callback(self._flushing.discard)
+
+    async def _run(self, key: BurstKey, burst: _Burst):
+        metrics.observe("chat_burst_size", len(burst.messages), platform=key[0])
+        metrics.observe("chat_burst_delay_seconds", time.monotonic() - burst.first_at, platform=key[0])
+        try:
+            await burst.flush(_merge(burst.messages))
+        except Exception as e:
+            logger.error(f"Burst flush failed for {key[0]}:{key[1]}: {e}")
+
+    def pending(self) -> int:
+        return sum(len(burst.messages) for burst in self._bursts.values())
+
+    async def stop(self):
+        """Flushes every open burst now instead of waiting out its window."""
+        bursts = list(self._bursts.items())
+        self._bursts.clear()
+        for _, burst in bursts:
+            burst.task.cancel()
+        await asyncio.gather(
+            *(self._run(key, burst) for key, burst in bursts),
+            *list(self._flushing),
+            return_exceptions=True
+        )
+
+burst_coalescer = BurstCoalescer()
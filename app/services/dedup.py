@@ -0,0 +1,101 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Tuple
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.repositories.message import AsyncMessageRepository
+
+logger = logging.getLogger("service.dedup")
+
+DedupKey = Tuple[str, str]
+
+class InboundDeduplicator:
+    """Two-tier duplicate check for inbound message ids (wamid, mid, Graph/Message-ID).
+
+    Tier one is an in-process TTL'd LRU of ids this worker has already seen, which
+    answers platform redeliveries without touching Postgres. Ids it has not seen are
+    claimed in `bkpm.processed_messages` in micro-batches (one
+    INSERT ... ON CONFLICT DO NOTHING RETURNING per batch); an id the insert did not
+    return was already claimed by another worker or before a restart.
+    """
+
+    def __init__(self, repo: AsyncMessageRepository = None, cache_size: int = None, ttl: float = None,
+                 batch_size: int = None, batch_window: float = None):
+        self.repo = repo or AsyncMessageRepository()
+        self.batch_size = batch_size or settings.DEDUP_BATCH_SIZE
+        self.batch_window = settings.DEDUP_BATCH_WINDOW_MS / 1000 if batch_window is None else batch_window
+        self._seen: TTLCache[bool] = TTLCache(
+            cache_size or settings.DEDUP_CACHE_SIZE,
+            settings.DEDUP_CACHE_TTL_SECONDS if ttl is None else ttl
+        )
+        self._pending: List[Tuple[DedupKey, asyncio.Future]] = []
+        self._flusher: asyncio.Task = None
+        self._full = asyncio.Event()
+
+    async def is_duplicate(self, message_id: str, platform: str) -> bool:
+        if not message_id:
+            return False
+        key = (platform, str(message_id))
+
+        metrics.inc("dedup_lookups", tier="memory", platform=platform)
+        if key in self._seen:
+            metrics.inc("dedup_hits", tier="memory", platform=platform)
+            logger.warning(f"DUPLIKASI DITOLAK: {message_id}.")
+            return True
+        # Claim it locally right away so concurrent redeliveries stop at tier one.
+        self._seen.set(key, True)
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((key, future))
+        if len(self._pending) >= self.batch_size:
+            self._full.set()
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+        duplicate = await future
+        metrics.inc("dedup_lookups", tier="db", platform=platform)
+        if duplicate:
+            metrics.inc("dedup_hits", tier="db", platform=platform)
+            logger.warning(f"DUPLIKASI DITOLAK: {message_id}.")
+        return duplicate
+
+    async def _flush_loop(self):
+        while self._pending:
+            try:
+                await asyncio.wait_for(self._full.wait(), self.batch_window)
+            except asyncio.TimeoutError:
+                pass
+            self._full.clear()
+            batch, self._pending = self._pending[:self.batch_size], self._pending[self.batch_size:]
+            if len(self._pending) >= self.batch_size:
+                self._full.set()
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[Tuple[DedupKey, asyncio.Future]]):
+        keys = list(dict.fromkeys(key for key, _ in batch))
+        metrics.observe("dedup_batch_size", len(keys))
+        try:
+            inserted = await self.repo.claim_message_ids([(mid, platform) for platform, mid in keys])
+            claimed = {(platform, mid) for mid, platform in inserted}
+        except Exception as e:
+            # Fail open: a duplicate reply is recoverable, a dropped message is not.
+            logger.error(f"Dedup claim failed, treating {len(keys)} ids as new: {e}")
+            metrics.inc("dedup_errors")
+            claimed = set(keys)
+        for key, future in batch:
+            if not future.done():
+                future.set_result(key not in claimed)
+
+    def stats(self) -> Dict[str, Any]:
+        tiers = {}
+        for row in metrics.snapshot()["counters"]:
+            if row["name"] in ("dedup_lookups", "dedup_hits"):
+                tier = tiers.setdefault(row["labels"]["tier"], {"lookups": 0, "hits": 0})
+                tier["lookups" if row["name"] == "dedup_lookups" else "hits"] += row["value"]
+        for tier in tiers.values():
+            tier["hit_rate"] = round(tier["hits"] / tier["lookups"], 4) if tier["lookups"] else 0.0
+        metrics.set_gauge("dedup_cache_entries", len(self._seen))
+        return {"cache_entries": len(self._seen), "pending": len(self._pending), "tiers": tiers}
+
+inbound_dedup = InboundDeduplicator()
@@ -0,0 +1,151 @@
+import asyncio
+import time
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+from app.core.config import settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger("service.dispatcher")
+
+Job = Callable[[], Awaitable[Any]]
+LaneKey = Tuple[str, str]
+
+class _PendingJob:
+    __slots__ = ("job", "future", "enqueued_at")
+
+    def __init__(self, job: Job, future: asyncio.Future):
+        self.job = job
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+class _Lane:
+    __slots__ = ("jobs", "task", "running_since")
+
+    def __init__(self):
+        self.jobs: Deque[_PendingJob] = deque()
+        self.task: Optional[asyncio.Task] = None
+        self.running_since: Optional[float] = None
+
+def _consume_exception(future: asyncio.Future):
+    # Callers may fire-and-forget; failures are already logged by the lane.
+    if not future.cancelled():
+        future.exception()
+
+class OutboundDispatcher:
+    """Runs outbound sends in one ordered lane per (platform, recipient).
+
+    Jobs for the same recipient run strictly one after another, while lanes for
+    different recipients run in parallel up to a global concurrency cap.
+    """
+
+    def __init__(self, max_concurrency: int = None):
+        self.max_concurrency = max_concurrency or settings.OUTBOUND_MAX_CONCURRENCY
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._lanes: Dict[LaneKey, _Lane] = {}
+        self._in_flight = 0
+
+    def submit(self, platform: str, recipient_id: str, job: Job) -> asyncio.Future:
+        """Queues `job` on the recipient's lane without waiting for it to run.
+
+        The returned future resolves with the job's result; callers only await it
+        when they need the outcome, failures are logged by the lane either way.
+        """
+        key = (platform, str(recipient_id))
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(_consume_exception)
+
+        lane = self._lanes.get(key)
+        if lane is None:
+            lane = self._lanes[key] = _Lane()
+        lane.jobs.append(_PendingJob(job, future))
+
+        if lane.task is None:
+            lane.task = asyncio.create_task(self._drain(key, lane))
+        return future
+
+    async def _drain(self, key: LaneKey, lane: _Lane):
+        try:
+            while lane.jobs:
+                pending = lane.jobs[0]
+                async with self._semaphore:
+                    lane.jobs.popleft()
+                    await self._run(key, lane, pending)
+        finally:
+            lane.task = None
+            if not lane.jobs:
+                self._lanes.pop(key, None)
+
+    async def _run(self, key: LaneKey, lane: _Lane, pending: _PendingJob):
+        started = time.monotonic()
+        metrics.observe("outbound_lane_wait_seconds", started - pending.enqueued_at, platform=key[0])
+        lane.running_since = started
+        self._in_flight += 1
+        try:
+            result = await pending.job()
+            if not pending.future.done():
+                pending.future.set_result(result)
+        except asyncio.CancelledError:
+            pending.future.cancel()
+            raise
+        except Exception as e:
+            logger.error(f"Outbound job failed for {key[0]}:{key[1]}: {e}")
+            metrics.inc("outbound_jobs_failed", platform=key[0])
+            if not pending.future.done():
+                pending.future.set_exception(e)
+        finally:
+            self._in_flight -= 1
+            lane.running_since = None
+            metrics.observe("outbound_job_seconds", time.monotonic() - started, platform=key[0])
+
+    async def stop(self, timeout: float = None):
+        timeout = settings.OUTBOUND_SHUTDOWN_TIMEOUT_SECONDS if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        while self._lanes and time.monotonic() < deadline:
+            tasks = [lane.task for lane in self._lanes.values() if lane.task]
+            if not tasks:
+                break
+            await asyncio.wait(tasks, timeout=max(deadline - time.monotonic(), 0))
+
+        if self._lanes:
+            logger.warning(f"Dropping {self.queue_depth()} outbound jobs still queued at shutdown")
+        tasks = []
+        for lane in list(self._lanes.values()):
+            if lane.task:
+                lane.task.cancel()
+                tasks.append(lane.task)
+            for pending in lane.jobs:
+                pending.future.cancel()
+        self._lanes.clear()
+        # Let cancelled sends unwind before the pools they use are closed.
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def queue_depth(self) -> int:
+        return sum(len(lane.jobs) for lane in self._lanes.values())
+
+    def stats(self, top: int = 20) -> Dict[str, Any]:
+        now = time.monotonic()
+        lanes = []
+        for (platform, recipient_id), lane in self._lanes.items():
+            oldest = lane.jobs[0].enqueued_at if lane.jobs else lane.running_since
+            lanes.append({
+                "platform": platform,
+                "recipient_id": recipient_id,
+                "depth": len(lane.jobs),
+                "running": lane.running_since is not None,
+                "lag_seconds": round(now - oldest, 3) if oldest else 0.0
+            })
+        lanes.sort(key=lambda item: item["lag_seconds"], reverse=True)
+
+        depth = self.queue_depth()
+        metrics.set_gauge("outbound_queue_depth", depth)
+        return {
+            "queue_depth": depth,
+            "in_flight": self._in_flight,
+            "max_concurrency": self.max_concurrency,
+            "active_lanes": len(self._lanes),
+            "max_lag_seconds": lanes[0]["lag_seconds"] if lanes else 0.0,
+            "lanes": lanes[:top]
+        }
+
+outbound_dispatcher = OutboundDispatcher()
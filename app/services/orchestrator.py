@@ -1,14 +1,18 @@
 import asyncio
-import httpx
 import uuid
 import re
-from typing import Dict
+from typing import Dict, Optional
 from app.schemas.models import IncomingMessage
-from app.repositories.conversation import ConversationRepository
-from app.repositories.message import MessageRepository
+from app.repositories.conversation import AsyncConversationRepository
+from app.repositories.message import AsyncMessageRepository
 from app.services.chatbot import ChatbotClient
+from app.services.dispatcher import OutboundDispatcher
+from app.services.coalescer import BurstCoalescer
+from app.services.session_timeouts import SessionTimeoutEngine
 from app.adapters.base import BaseAdapter
+from app.adapters.effects import InboundEffects
 from app.core.config import settings
+from app.core.exceptions import CircuitOpenError
 import logging
 
 logger = logging.getLogger("service.orchestrator")
@@ -16,20 +20,32 @@ logger = logging.getLogger("service.orchestrator")
 class MessageOrchestrator:
     def __init__(
         self, 
-        repo_conv: ConversationRepository,
-        repo_msg: MessageRepository,
+        repo_conv: AsyncConversationRepository,
+        repo_msg: AsyncMessageRepository,
         chatbot: ChatbotClient,
-        adapters: Dict[str, BaseAdapter]
+        adapters: Dict[str, BaseAdapter],
+        dispatcher: OutboundDispatcher,
+        coalescer: Optional[BurstCoalescer] = None,
+        timeouts: Optional[SessionTimeoutEngine] = None
     ):
         self.repo_conv = repo_conv
         self.repo_msg = repo_msg
         self.chatbot = chatbot
         self.adapters = adapters
+        self.dispatcher = dispatcher
+        self.coalescer = coalescer
+        self.timeouts = timeouts
+
+    def _touch(self, conversation_id: Optional[str], platform: str, user_id: str):
+        if self.timeouts:
+            self.timeouts.touch(conversation_id, platform, user_id)
 
     async def timeout_session(self, conversation_id: str, platform: str, user_id: str):
         adapter = self.adapters.get(platform)
         if not adapter: return
         logger.info(f"TIMEOUT: Auto-closing session {conversation_id} for {platform} user {user_id}")
+        # New messages from here on start a fresh session rather than reuse the closing one.
+        self.repo_conv.forget(conversation_id)
         
         try:
             await self.chatbot.ask(query="Terima Kasih", conversation_id=conversation_id, platform=platform, user_id=user_id)
@@ -44,15 +60,18 @@ class MessageOrchestrator:
         send_kwargs = {}
         if platform == "email":
             send_kwargs = {"subject": "Session Ended"}
-            meta = self.repo_msg.get_email_metadata(conversation_id)
+            meta = await self.repo_msg.get_email_metadata(conversation_id)
             if meta:
                 if settings.EMAIL_PROVIDER == "azure_oauth2":
                     send_kwargs["graph_message_id"] = meta.get("graph_message_id")
                 else:
                     send_kwargs.update(meta)
 
-        await adapter.send_message(user_id, closing_text, **send_kwargs)
-        self.repo_conv.close_session(conversation_id)
+        # The row itself was closed when the timeout engine claimed the session.
+        async def _close():
+            await adapter.send_message(user_id, closing_text, **send_kwargs)
+
+        self.dispatcher.submit(platform, user_id, _close)
 
     async def handle_feedback(self, msg: IncomingMessage):
         payload_str = msg.metadata.get("payload", "")
@@ -61,7 +80,7 @@ class MessageOrchestrator:
             feedback_type_raw, answer_id_raw = payload_str.split("-", 1)
         except ValueError: return
         is_good = "good" in feedback_type_raw.lower()
-        session_id = msg.conversation_id or self.repo_conv.get_latest_id(msg.platform_unique_id, msg.platform)
+        session_id = msg.conversation_id or await self.repo_conv.get_latest_id(msg.platform_unique_id, msg.platform)
         if not session_id: return
         backend_payload = {
             "session_id": session_id,
@@ -73,16 +92,16 @@ class MessageOrchestrator:
         if settings.BACKEND_API_KEY: 
             headers["X-API-Key"] = settings.BACKEND_API_KEY
         try:
-            async with httpx.AsyncClient(timeout=10) as client:
-                await client.post(url, json=backend_payload, headers=headers)
+            client = self.chatbot.http.client_for(url)
+            await client.post(url, json=backend_payload, headers=headers)
         except Exception as e:
             logger.error(f"Gagal kirim feedback: {e}")
 
-    def _get_email_send_kwargs(self, conversation_id: str) -> Dict:
+    async def _get_email_send_kwargs(self, conversation_id: str) -> Dict:
         if not conversation_id:
             return {"subject": "Re: Your Inquiry"}
             
-        meta = self.repo_msg.get_email_metadata(conversation_id)
+        meta = await self.repo_msg.get_email_metadata(conversation_id)
         if meta: 
             if settings.EMAIL_PROVIDER == "azure_oauth2":
                 return {
@@ -115,44 +134,50 @@ class MessageOrchestrator:
         
         send_kwargs = {}
         if platform == "email":
-            send_kwargs = self._get_email_send_kwargs(conversation_id)
-        
-        await adapter.send_message(user_id, answer, **send_kwargs)
-        
-        try: 
-            await adapter.send_typing_off(user_id)
-        except Exception: 
-            pass
-        
-        if answer_id and not is_helpdesk: 
-            await adapter.send_feedback_request(user_id, answer_id)
+            send_kwargs = await self._get_email_send_kwargs(conversation_id)
+
+        self._touch(conversation_id, platform, user_id)
+
+        async def _deliver():
+            await adapter.send_message(user_id, answer, **send_kwargs)
+
+            try:
+                await adapter.send_typing_off(user_id)
+            except Exception:
+                pass
 
-    def _ensure_conversation_id(self, msg: IncomingMessage):
+            if answer_id and not is_helpdesk:
+                await adapter.send_feedback_request(user_id, answer_id)
+
+        self.dispatcher.submit(platform, user_id, _deliver)
+
+    async def _ensure_conversation_id(self, msg: IncomingMessage):
         if msg.platform == "email":
-            self._handle_email_conversation_id(msg)
+            await self._handle_email_conversation_id(msg)
             return
 
         if not msg.conversation_id:
-            msg.conversation_id = self.repo_conv.get_active_id(msg.platform_unique_id, msg.platform)
+            msg.conversation_id = await self.repo_conv.get_active_id(msg.platform_unique_id, msg.platform)
 
         if not msg.conversation_id:
             msg.conversation_id = str(uuid.uuid4())
+            self.repo_conv.remember(msg.platform_unique_id, msg.platform, msg.conversation_id)
 
-    def _handle_email_conversation_id(self, msg: IncomingMessage):
+    async def _handle_email_conversation_id(self, msg: IncomingMessage):
         if not msg.metadata:
             msg.conversation_id = str(uuid.uuid4())
             return
 
         if settings.EMAIL_PROVIDER == "azure_oauth2":
-            self._handle_azure_email_thread(msg)
+            await self._handle_azure_email_thread(msg)
         else:
-            self._handle_standard_email_thread(msg)
+            await self._handle_standard_email_thread(msg)
 
-    def _handle_azure_email_thread(self, msg: IncomingMessage):
+    async def _handle_azure_email_thread(self, msg: IncomingMessage):
         azure_conv_id = msg.metadata.get("conversation_id")
         
         if azure_conv_id:
-            existing_id = self.repo_msg.get_conversation_by_azure_thread(azure_conv_id)
+            existing_id = await self.repo_msg.get_conversation_by_azure_thread(azure_conv_id)
             
             if existing_id:
                 msg.conversation_id = existing_id
@@ -161,10 +186,10 @@ class MessageOrchestrator:
         else:
             msg.conversation_id = str(uuid.uuid4())
 
-    def _handle_standard_email_thread(self, msg: IncomingMessage):
+    async def _handle_standard_email_thread(self, msg: IncomingMessage):
         thread_key = msg.metadata.get("thread_key")
         if thread_key:
-            existing_id = self.repo_msg.get_conversation_by_thread(thread_key)
+            existing_id = await self.repo_msg.get_conversation_by_thread(thread_key)
             if existing_id:
                 msg.conversation_id = existing_id
                 return
@@ -181,35 +206,70 @@ class MessageOrchestrator:
         if not adapter: return
 
         if not msg.conversation_id:
-            self._ensure_conversation_id(msg)
+            await self._ensure_conversation_id(msg)
 
-        self._save_email_metadata(msg)
+        self._touch(msg.conversation_id, msg.platform, msg.platform_unique_id)
+        await self._save_email_metadata(msg)
+
+        if not self.chatbot.is_available():
+            await self._fail_fast(adapter, msg)
+            return
 
         try:
             msg_id = msg.metadata.get("message_id") if msg.metadata else None
-            await adapter.send_typing_on(msg.platform_unique_id, message_id=msg_id)
-            if msg.platform == "whatsapp" and msg_id and hasattr(adapter, 'mark_as_read'):
-                await adapter.mark_as_read(msg_id)
+            effects = InboundEffects(msg.platform_unique_id, msg_id).typing()
+            if msg.platform == "whatsapp" and msg_id:
+                effects.mark_read()
+            await adapter.apply_inbound_effects(effects)
         except Exception: pass
 
-        success = await self.chatbot.ask(
-            msg.query, 
-            msg.conversation_id, 
-            msg.platform, 
-            msg.platform_unique_id
-        )
-        
+        if msg.platform != "email" and self.coalescer and self.coalescer.enabled:
+            self.coalescer.add(msg, lambda merged: self._ask(adapter, merged))
+            return
+
+        await self._ask(adapter, msg)
+
+    async def _ask(self, adapter: BaseAdapter, msg: IncomingMessage):
+        try:
+            success = await self.chatbot.ask(
+                msg.query,
+                msg.conversation_id,
+                msg.platform,
+                msg.platform_unique_id
+            )
+        except CircuitOpenError:
+            await self._fail_fast(adapter, msg)
+            return
+
         if not success:
             logger.error(f"Gagal push ke backend AI for conversation {msg.conversation_id}")
             try: await adapter.send_typing_off(msg.platform_unique_id)
             except Exception: pass
 
-    def _save_email_metadata(self, msg: IncomingMessage):
+    async def _fail_fast(self, adapter: BaseAdapter, msg: IncomingMessage):
+        logger.warning(f"Backend circuit open, fast-failing conversation {msg.conversation_id}")
+        try: await adapter.send_typing_off(msg.platform_unique_id)
+        except Exception: pass
+
+        if not settings.BACKEND_BUSY_REPLY_ENABLED:
+            return
+
+        send_kwargs = {}
+        if msg.platform == "email":
+            send_kwargs = await self._get_email_send_kwargs(msg.conversation_id)
+
+        async def _busy_reply():
+            await adapter.send_message(msg.platform_unique_id, settings.BACKEND_BUSY_REPLY_TEXT, **send_kwargs)
+
+        # Same lane as every other reply, so it cannot overtake answers still queued for this user.
+        self.dispatcher.submit(msg.platform, msg.platform_unique_id, _busy_reply)
+
+    async def _save_email_metadata(self, msg: IncomingMessage):
         if msg.platform != "email" or not msg.conversation_id or not msg.metadata:
             return
             
         if settings.EMAIL_PROVIDER == "azure_oauth2":
-            self.repo_msg.save_email_metadata(
+            await self.repo_msg.save_email_metadata(
                 conversation_id=msg.conversation_id,
                 subject=msg.metadata.get("subject", ""),
                 in_reply_to=msg.metadata.get("graph_message_id", ""), 
@@ -217,7 +277,7 @@ class MessageOrchestrator:
                 thread_key=msg.metadata.get("conversation_id", "") 
             )
         else:
-            self.repo_msg.save_email_metadata(
+            await self.repo_msg.save_email_metadata(
                 conversation_id=msg.conversation_id,
                 subject=msg.metadata.get("subject", ""),
                 in_reply_to=msg.metadata.get("message_id", ""),
@@ -1,79 +1,118 @@
-from typing import Dict, Any, Optional, Tuple
+import logging
+from typing import Dict, Any, Iterator, Optional
 from app.schemas.models import IncomingMessage
 from app.core.config import settings
+from app.core.metrics import metrics
 
-def parse_whatsapp_payload(data: Dict[str, Any]) -> Optional[IncomingMessage]:
-    try:
-        entry = data.get("entry", [])[0]
-        changes = entry.get("changes", [])[0]
-        value = changes.get("value", {})
-        
-        if "messages" not in value:
-            return None
-            
-        message = value["messages"][0]
-        sender_id = message.get("from")
-        msg_id = message.get("id") 
-
-        if str(sender_id) == str(settings.WHATSAPP_PHONE_NUMBER_ID):
-            return None
-
-        msg_type = message.get("type")
-        
-        if msg_type == "text":
+logger = logging.getLogger("service.parsers")
+
+def _unsupported(platform: str, kind: str):
+    metrics.inc("webhook_unsupported_messages", platform=platform, type=kind)
+
+def _children(container: Any, key: str) -> Iterator[Dict[str, Any]]:
+    # Webhook bodies are untrusted JSON: anything not shaped like Meta's objects is skipped.
+    if not isinstance(container, dict):
+        return
+    items = container.get(key)
+    if not isinstance(items, list):
+        return
+    for item in items:
+        if isinstance(item, dict):
+            yield item
+
+def _whatsapp_message(message: Dict[str, Any]) -> Optional[IncomingMessage]:
+    sender_id = message.get("from")
+    msg_id = message.get("id")
+
+    if str(sender_id) == str(settings.WHATSAPP_PHONE_NUMBER_ID):
+        return None
+
+    msg_type = message.get("type")
+
+    if msg_type == "text":
+        return IncomingMessage(
+            platform_unique_id=sender_id,
+            query=message["text"]["body"],
+            platform="whatsapp",
+            metadata={"phone": sender_id, "message_id": msg_id}
+        )
+
+    if msg_type == "interactive":
+        interactive = message.get("interactive", {})
+        if interactive.get("type") == "button_reply":
+            btn_id = interactive["button_reply"]["id"]
             return IncomingMessage(
                 platform_unique_id=sender_id,
-                query=message["text"]["body"],
+                query=f"FEEDBACK_EVENT:{btn_id}",
                 platform="whatsapp",
-                metadata={"phone": sender_id, "message_id": msg_id}
+                metadata={"is_feedback": True, "payload": btn_id, "message_id": msg_id}
             )
-            
-        elif msg_type == "interactive":
-            interactive = message.get("interactive", {})
-            if interactive.get("type") == "button_reply":
-                btn_id = interactive["button_reply"]["id"]
-                return IncomingMessage(
-                    platform_unique_id=sender_id,
-                    query=f"FEEDBACK_EVENT:{btn_id}",
-                    platform="whatsapp",
-                    metadata={"is_feedback": True, "payload": btn_id, "message_id": msg_id}
-                )
-                
-    except (IndexError, KeyError, AttributeError):
-        pass
+        msg_type = f"interactive:{interactive.get('type')}"
+
+    _unsupported("whatsapp", str(msg_type))
     return None
 
-def parse_instagram_payload(data: Dict[str, Any]) -> Optional[IncomingMessage]:
-    try:
-        entry = data.get("entry", [])[0]
-        messaging = entry.get("messaging", [])[0]
-        
-        sender_id = messaging.get("sender", {}).get("id")
-        
-        if str(sender_id) == str(settings.INSTAGRAM_CHATBOT_ID):
-            return None
-
-        message = messaging.get("message", {})
-        msg_id = message.get("mid") 
-        
-        if "quick_reply" in message:
-            payload = message["quick_reply"].get("payload")
-            return IncomingMessage(
-                platform_unique_id=sender_id,
-                query=f"FEEDBACK_EVENT:{payload}",
-                platform="instagram",
-                metadata={"is_feedback": True, "payload": payload, "message_id": msg_id}
-            )
+def parse_whatsapp_payload(data: Dict[str, Any]) -> Iterator[IncomingMessage]:
+    """Yields every inbound message of a (possibly batched) WhatsApp delivery, in order."""
+    for entry in _children(data, "entry"):
+        for change in _children(entry, "changes"):
+            # Status-only changes (sent/delivered/read receipts) carry no messages.
+            for message in _children(change.get("value"), "messages"):
+                try:
+                    msg = _whatsapp_message(message)
+                except (KeyError, TypeError, AttributeError, ValueError) as e:
+                    logger.warning(f"Malformed WhatsApp message skipped: {e}")
+                    _unsupported("whatsapp", "malformed")
+                    continue
+                if msg:
+                    yield msg
 
-        if "text" in message:
-            if message.get("is_echo"): return None
-            return IncomingMessage(
-                platform_unique_id=sender_id,
-                query=message["text"],
-                platform="instagram",
-                metadata={"message_id": msg_id}
-            )
-            
-    except (IndexError, KeyError, AttributeError):
-        pass
-    return None
\ No newline at end of file
+def _instagram_message(messaging: Dict[str, Any]) -> Optional[IncomingMessage]:
+    sender_id = messaging.get("sender", {}).get("id")
+
+    if str(sender_id) == str(settings.INSTAGRAM_CHATBOT_ID):
+        return None
+
+    message = messaging.get("message")
+    if message is None:
+        # read, reaction, postback, ... events without a message body.
+        kind = next((k for k in messaging if k not in ("sender", "recipient", "timestamp")), "unknown")
+        _unsupported("instagram", kind)
+        return None
+
+    msg_id = message.get("mid")
+
+    if "quick_reply" in message:
+        payload = message["quick_reply"].get("payload")
+        return IncomingMessage(
+            platform_unique_id=sender_id,
+            query=f"FEEDBACK_EVENT:{payload}",
+            platform="instagram",
+            metadata={"is_feedback": True, "payload": payload, "message_id": msg_id}
+        )
+
+    if message.get("is_echo"): return None
+
+    if "text" in message:
+        return IncomingMessage(
+            platform_unique_id=sender_id,
+            query=message["text"],
+            platform="instagram",
+            metadata={"message_id": msg_id}
+        )
+
+    _unsupported("instagram", "attachments" if "attachments" in message else "unknown")
+    return None
+
+def parse_instagram_payload(data: Dict[str, Any]) -> Iterator[IncomingMessage]:
+    """Yields every inbound message of a (possibly batched) Instagram delivery, in order."""
+    for entry in _children(data, "entry"):
+        for messaging in _children(entry, "messaging"):
+            try:
+                msg = _instagram_message(messaging)
+            except (KeyError, TypeError, AttributeError, ValueError) as e:
+                logger.warning(f"Malformed Instagram message skipped: {e}")
+                _unsupported("instagram", "malformed")
+                continue
+            if msg:
+                yield msg
@@ -0,0 +1,95 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+from app.adapters.base import BaseAdapter
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.repositories.dead_letter import DeadLetterRepository
+from app.services.chatbot import ChatbotClient
+from app.services.dispatcher import OutboundDispatcher
+from app.services.retry import is_success
+
+logger = logging.getLogger("service.redriver")
+
+async def _replay(target, letter: Dict[str, Any]) -> Tuple[bool, str]:
+    try:
+        result = await target.redeliver(letter["payload"])
+    except Exception as e:
+        return False, str(e)
+    if is_success(result):
+        return True, ""
+    return False, str(result.get("error") or result.get("data") or "replay failed")
+
+def _submit_replay(dispatcher: OutboundDispatcher, target, letter: Dict[str, Any]) -> asyncio.Future:
+    # Replays run in the recipient's lane so they cannot overtake live replies to the same user.
+    kind, platform = letter["kind"], letter["platform"]
+    lane_platform = platform if kind == "outbound" else f"{kind}:{platform}"
+    return dispatcher.submit(lane_platform, letter["recipient_id"] or "", lambda: _replay(target, letter))
+
+def _target_for(adapters: Dict[str, BaseAdapter], chatbot: ChatbotClient, kind: str, platform: str):
+    if kind == "backend_ask":
+        return chatbot
+    return adapters.get(platform)
+
+async def redrive_once(
+    repo: DeadLetterRepository,
+    adapters: Dict[str, BaseAdapter],
+    chatbot: ChatbotClient,
+    dispatcher: OutboundDispatcher
+) -> int:
+    await asyncio.to_thread(repo.reset_stuck)
+    letters = await asyncio.to_thread(repo.claim_pending, settings.DEAD_LETTER_REDRIVE_BATCH_SIZE)
+    if not letters:
+        return 0
+
+    groups: "OrderedDict[Tuple[str, str], List[Dict[str, Any]]]" = OrderedDict()
+    for letter in letters:
+        groups.setdefault((letter["kind"], letter["platform"]), []).append(letter)
+
+    replayed = 0
+    max_replays = settings.DEAD_LETTER_MAX_REPLAYS
+    for (kind, platform), group in groups.items():
+        target = _target_for(adapters, chatbot, kind, platform)
+        if target is None:
+            await asyncio.to_thread(repo.release, [l["id"] for l in group], f"No handler for {kind}:{platform}", max_replays)
+            continue
+
+        # The oldest letter probes the upstream; the rest stay parked until it recovers.
+        probe, rest = group[0], group[1:]
+        ok, error = await _submit_replay(dispatcher, target, probe)
+        if not ok:
+            logger.info(f"Upstream {kind}:{platform} still failing, keeping {len(group)} dead letters parked")
+            await asyncio.to_thread(repo.release, [probe["id"]], error, max_replays)
+            await asyncio.to_thread(repo.release, [l["id"] for l in rest], None, max_replays, False)
+            continue
+
+        outcomes = await asyncio.gather(*(_submit_replay(dispatcher, target, letter) for letter in rest), return_exceptions=True)
+
+        done_ids = [probe["id"]]
+        for letter, outcome in zip(rest, outcomes):
+            if isinstance(outcome, tuple) and outcome[0]:
+                done_ids.append(letter["id"])
+            else:
+                error = outcome[1] if isinstance(outcome, tuple) else str(outcome)
+                await asyncio.to_thread(repo.release, [letter["id"]], error, max_replays)
+
+        await asyncio.to_thread(repo.mark_replayed, done_ids)
+        metrics.inc("dead_letters_replayed", len(done_ids), kind=kind, platform=platform)
+        replayed += len(done_ids)
+        logger.info(f"Replayed {len(done_ids)}/{len(group)} dead letters for {kind}:{platform}")
+
+    return replayed
+
+async def run_dead_letter_redriver(adapters: Dict[str, BaseAdapter], chatbot: ChatbotClient, dispatcher: OutboundDispatcher):
+    logger.info("Dead Letter Re-driver Started...")
+    repo = DeadLetterRepository()
+    await asyncio.sleep(10)
+
+    while True:
+        try:
+            await redrive_once(repo, adapters, chatbot, dispatcher)
+        except Exception as e:
+            logger.error(f"Re-driver Error: {e}")
+
+        await asyncio.sleep(settings.DEAD_LETTER_REDRIVE_INTERVAL_SECONDS)
@@ -0,0 +1,153 @@
+import asyncio
+import random
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.repositories.dead_letter import DeadLetterRepository
+
+logger = logging.getLogger("service.retry")
+
+THROTTLED = "throttled"
+SERVER_ERROR = "server_error"
+TRANSPORT = "transport"
+
+class RetryPolicy:
+    def __init__(self, max_attempts: int, base_delay: float, max_delay: float):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt: int) -> float:
+        # Full jitter: spreads retries from many senders instead of synchronising them.
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+def _policies() -> Dict[str, RetryPolicy]:
+    return {
+        THROTTLED: RetryPolicy(settings.RETRY_MAX_ATTEMPTS, settings.RETRY_THROTTLED_BASE_DELAY_SECONDS, settings.RETRY_MAX_DELAY_SECONDS),
+        SERVER_ERROR: RetryPolicy(settings.RETRY_MAX_ATTEMPTS, settings.RETRY_BASE_DELAY_SECONDS, settings.RETRY_MAX_DELAY_SECONDS),
+        TRANSPORT: RetryPolicy(settings.RETRY_MAX_ATTEMPTS, settings.RETRY_BASE_DELAY_SECONDS, settings.RETRY_MAX_DELAY_SECONDS),
+    }
+
+def is_success(result: Dict[str, Any]) -> bool:
+    return bool(result.get("success") or result.get("sent"))
+
+def classify_failure(result: Dict[str, Any]) -> Optional[str]:
+    """Maps a failed delivery result to its error class, or None when it must not be retried."""
+    if result.get("retryable") is False:
+        return None
+    status = result.get("status_code")
+    if result.get("throttled") or status == 429:
+        return THROTTLED
+    if status is None or status == 408:
+        return TRANSPORT
+    if status >= 500:
+        return SERVER_ERROR
+    if result.get("retryable"):
+        return SERVER_ERROR
+    return None
+
+async def retry_async(operation: Callable[[], Awaitable[Dict[str, Any]]], label: str) -> Tuple[Dict[str, Any], int, Optional[str]]:
+    """Runs operation until it succeeds or its error class runs out of attempts.
+
+    Returns the last result, the number of attempts made and the last error class.
+    """
+    policies = _policies()
+    attempt = 0
+    while True:
+        attempt += 1
+        result = await operation()
+        if is_success(result):
+            return result, attempt, None
+
+        error_class = classify_failure(result)
+        if error_class is None:
+            return result, attempt, None
+
+        policy = policies[error_class]
+        # "defer": the caller already knows a retry this soon cannot succeed.
+        if attempt >= policy.max_attempts or result.get("defer"):
+            metrics.inc("retry_exhausted", operation=label, error_class=error_class)
+            return result, attempt, error_class
+
+        delay = policy.delay(attempt)
+        metrics.inc("retry_attempts", operation=label, error_class=error_class)
+        logger.warning(f"{label} failed ({error_class}), retry {attempt}/{policy.max_attempts - 1} in {delay:.2f}s")
+        await asyncio.sleep(delay)
+
+class DeadLetterOutbox:
+    """Retries a delivery and parks it in bkpm.dead_letters when its retries are exhausted."""
+
+    def __init__(self, repo: DeadLetterRepository):
+        self.repo = repo
+
+    async def deliver(
+        self,
+        operation: Callable[[], Awaitable[Dict[str, Any]]],
+        kind: str,
+        platform: str,
+        recipient_id: str,
+        payload: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        result, attempts, error_class = await retry_async(operation, f"{kind}:{platform}")
+        if error_class is not None:
+            await self.park(kind, platform, recipient_id, payload, _error(result, error_class), attempts)
+        return result
+
+    async def deliver_in_order(
+        self,
+        send: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+        bodies: List[Dict[str, Any]],
+        kind: str,
+        platform: str,
+        recipient_id: str
+    ) -> List[Dict[str, Any]]:
+        """Delivers `bodies` one after another, stopping at the first that fails.
+
+        If that body's retries run out, it is parked together with every body after it
+        as a single letter (`{"bodies": [...]}`), so a replay cannot overtake or reorder them.
+        """
+        results = []
+        for index, body in enumerate(bodies):
+            result, attempts, error_class = await retry_async(lambda: send(body), f"{kind}:{platform}")
+            results.append(result)
+            if is_success(result):
+                continue
+            if error_class is not None:
+                payload = {"bodies": bodies[index:], "recipient_id": recipient_id}
+                await self.park(kind, platform, recipient_id, payload, _error(result, error_class), attempts)
+            break
+        return results
+
+    async def replay_in_order(
+        self,
+        send: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+        bodies: List[Dict[str, Any]],
+        kind: str,
+        platform: str,
+        recipient_id: str
+    ) -> Dict[str, Any]:
+        """Replays a letter parked by deliver_in_order once, in order.
+
+        A failure after some bodies went out parks the unsent rest as a new letter and
+        reports success, so the redriver does not resend what was already delivered.
+        """
+        for index, body in enumerate(bodies):
+            result = await send(body)
+            if is_success(result):
+                continue
+            if index == 0:
+                return result
+            payload = {"bodies": bodies[index:], "recipient_id": recipient_id}
+            await self.park(kind, platform, recipient_id, payload, _error(result, "replay failed"), 1)
+            return {"success": True, "parked": len(bodies) - index}
+        return {"success": True}
+
+    async def park(self, kind: str, platform: str, recipient_id: str, payload: Dict[str, Any], error: str, attempts: int):
+        await asyncio.to_thread(self.repo.save, kind, platform, recipient_id, payload, error, attempts)
+        metrics.inc("dead_lettered", kind=kind, platform=platform)
+
+def _error(result: Dict[str, Any], fallback: str) -> str:
+    return str(result.get("error") or result.get("data") or fallback)
+
+dead_letter_outbox = DeadLetterOutbox(DeadLetterRepository())
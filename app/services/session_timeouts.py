@@ -0,0 +1,189 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Set, Tuple
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.exceptions import DatabaseError
+from app.core.metrics import metrics
+from app.repositories.conversation import AsyncConversationRepository
+
+logger = logging.getLogger("service.session_timeouts")
+
+TIMEOUT_PLATFORMS = ("whatsapp", "instagram")
+
+OnExpire = Callable[[str, str, str], Awaitable[None]]
+
+_RETRY_SECONDS = 60.0
+
+class SessionTimeoutEngine:
+    """Closes idle chat sessions from an in-memory deadline heap.
+
+    The orchestrator calls `touch` for every inbound message and outbound reply, which
+    pushes the conversation's deadline to `timeout` seconds from now. Superseded heap
+    entries are skipped lazily when they surface. A due session is re-checked against
+    its last activity in the database before it is closed, because another worker may
+    have handled messages this process never saw. Open sessions are reconciled from
+    the database at startup and every `reconcile_interval` seconds as a safety net.
+
+    Only the background worker runs the engine and `touch` is a no-op anywhere
+    else, so a session whose traffic all went to other workers is picked up by
+    the next reconcile and can close up to `reconcile_interval` seconds late.
+    A due session is claimed in the database before it is closed, so two
+    engines never both send the goodbye.
+    """
+
+    def __init__(self, repo: AsyncConversationRepository = None, timeout: float = None,
+                 reconcile_interval: float = None, lookback_hours: int = None, concurrency: int = None):
+        self.repo = repo or AsyncConversationRepository()
+        self.timeout = settings.SESSION_TIMEOUT_MINUTES * 60 if timeout is None else timeout
+        self.reconcile_interval = reconcile_interval or settings.SESSION_TIMEOUT_RECONCILE_SECONDS
+        self.lookback_hours = lookback_hours or settings.SESSION_TIMEOUT_LOOKBACK_HOURS
+        self._sessions: Dict[str, Tuple[float, str, str]] = {}
+        self._heap: List[Tuple[float, int, str]] = []
+        self._seq = itertools.count()
+        # Closed here recently: late replies to the goodbye ask must not re-arm them.
+        self._closed: TTLCache[bool] = TTLCache(settings.SESSION_CACHE_SIZE, self.timeout)
+        self._wake = asyncio.Event()
+        self._slots = asyncio.Semaphore(concurrency or settings.SESSION_TIMEOUT_CONCURRENCY)
+        self._firing: Set[asyncio.Task] = set()
+        self._running = False
+
+    def touch(self, conversation_id: str, platform: str, user_id: str, idle: float = 0.0):
+        """Records activity `idle` seconds ago; never moves a deadline earlier."""
+        if not self._running:
+            # Nothing drains the heap on this worker.
+            return
+        if platform not in TIMEOUT_PLATFORMS or not conversation_id or not user_id:
+            return
+        if conversation_id in self._closed:
+            return
+        deadline = time.monotonic() - idle + self.timeout
+        current = self._sessions.get(conversation_id)
+        if current and current[0] >= deadline:
+            return
+        self._sessions[conversation_id] = (deadline, platform, user_id)
+        wake = not self._heap or deadline < self._heap[0][0]
+        heapq.heappush(self._heap, (deadline, next(self._seq), conversation_id))
+        if len(self._heap) > 2 * len(self._sessions) + 1024:
+            self._compact()
+        if wake:
+            self._wake.set()
+
+    def discard(self, conversation_id: str):
+        self._sessions.pop(conversation_id, None)
+
+    def _compact(self):
+        self._heap = [(deadline, next(self._seq), cid) for cid, (deadline, _, _) in self._sessions.items()]
+        heapq.heapify(self._heap)
+
+    async def reconcile(self):
+        rows = await self.repo.get_open_sessions(list(TIMEOUT_PLATFORMS), self.lookback_hours)
+        for conversation_id, platform, user_id, idle in rows:
+            self.touch(conversation_id, platform, user_id, idle=idle)
+        metrics.inc("session_timeout_reconciles")
+        logger.info(f"Reconciled {len(rows)} open sessions; tracking {len(self._sessions)}.")
+
+    async def run(self, on_expire: OnExpire):
+        logger.info("Session Timeout Engine Started...")
+        next_reconcile = 0.0
+        self._running = True
+        try:
+            while True:
+                if time.monotonic() >= next_reconcile:
+                    try:
+                        await self.reconcile()
+                        next_reconcile = time.monotonic() + self.reconcile_interval
+                    except DatabaseError as e:
+                        logger.error(f"Session reconcile failed: {e}")
+                        metrics.inc("session_timeout_errors", stage="reconcile")
+                        next_reconcile = time.monotonic() + min(_RETRY_SECONDS, self.reconcile_interval)
+
+                self._wake.clear()
+                self._fire_due(on_expire)
+
+                wait = next_reconcile - time.monotonic()
+                if self._heap:
+                    wait = min(wait, self._heap[0][0] - time.monotonic())
+                if wait > 0:
+                    # Not wait_for: it can swallow a cancel that races a wake-up, hanging shutdown.
+                    waiter = asyncio.ensure_future(self._wake.wait())
+                    try:
+                        await asyncio.wait([waiter], timeout=wait)
+                    finally:
+                        waiter.cancel()
+        finally:
+            self._running = False
+            self._sessions.clear()
+            self._heap.clear()
+            for task in self._firing:
+                task.cancel()
+            await asyncio.gather(*self._firing, return_exceptions=True)
+
+    def _fire_due(self, on_expire: OnExpire):
+        now = time.monotonic()
+        while self._heap and self._heap[0][0] <= now:
+            deadline, _, conversation_id = heapq.heappop(self._heap)
+            current = self._sessions.get(conversation_id)
+            if current is None or current[0] != deadline:
+                continue
+            del self._sessions[conversation_id]
+            _, platform, user_id = current
+            metrics.observe("session_timeout_lag_seconds", now - deadline)
+            task = asyncio.create_task(self._expire(conversation_id, platform, user_id, on_expire))
+            self._firing.add(task)
+            task.add_done_callback(self._firing.discard)
+
+    async def _expire(self, conversation_id: str, platform: str, user_id: str, on_expire: OnExpire):
+        async with self._slots:
+            try:
+                activity = await self.repo.get_session_activity(conversation_id)
+            except DatabaseError as e:
+                logger.error(f"Cannot confirm timeout for {conversation_id}, retrying: {e}")
+                metrics.inc("session_timeout_errors", stage="verify")
+                self.touch(conversation_id, platform, user_id, idle=self.timeout - _RETRY_SECONDS)
+                return
+
+            if conversation_id in self._sessions:
+                # New activity arrived while we were checking.
+                return
+            if activity is None or not activity[0]:
+                return
+            idle = activity[1]
+            if idle < self.timeout:
+                metrics.inc("session_timeouts_deferred", platform=platform)
+                self.touch(conversation_id, platform, user_id, idle=idle)
+                return
+
+            try:
+                claimed = await self.repo.claim_session(conversation_id)
+            except DatabaseError as e:
+                logger.error(f"Cannot claim timeout for {conversation_id}, retrying: {e}")
+                metrics.inc("session_timeout_errors", stage="claim")
+                self.touch(conversation_id, platform, user_id, idle=self.timeout - _RETRY_SECONDS)
+                return
+
+            self._closed.set(conversation_id, True)
+            if not claimed:
+                # Closed by another worker's engine, or by the user, since the check above.
+                metrics.inc("session_timeouts_lost_claim", platform=platform)
+                return
+            metrics.inc("session_timeouts_fired", platform=platform)
+            try:
+                await on_expire(conversation_id, platform, user_id)
+            except Exception as e:
+                logger.error(f"Timeout handling failed for {conversation_id}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        next_due = min((deadline for deadline, _, _ in self._sessions.values()), default=None)
+        metrics.set_gauge("session_timeout_tracked", len(self._sessions))
+        return {
+            "tracked": len(self._sessions),
+            "heap_entries": len(self._heap),
+            "firing": len(self._firing),
+            "next_due_in_seconds": round(next_due - time.monotonic(), 3) if next_due is not None else None
+        }
+
+session_timeouts = SessionTimeoutEngine()
@@ -0,0 +1,120 @@
+import asyncio
+import itertools
+import time
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from app.core.config import settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger("service.work_queue")
+
+Job = Callable[[], Awaitable[Any]]
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+_PRIORITY_NAMES = {PRIORITY_HIGH: "high", PRIORITY_NORMAL: "normal"}
+
+class InboundWorkQueue:
+    """Bounded priority queue of inbound work drained by a fixed worker pool.
+
+    Routes submit without blocking and get False back when the queue is full (or
+    shutting down), so callers can push back instead of piling up coroutines.
+    Lower priority values run first; equal priorities run in submission order.
+    """
+
+    def __init__(self, workers: int = None, max_size: int = None):
+        self.workers = workers or settings.INBOUND_WORKER_CONCURRENCY
+        self.max_size = max_size or settings.INBOUND_QUEUE_MAX_SIZE
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._seq = itertools.count()
+        self._busy = 0
+        self._busy_seconds = 0.0
+        self._started_at = 0.0
+        self._accepting = False
+
+    def start(self):
+        if self._tasks:
+            return
+        self._queue = asyncio.PriorityQueue(maxsize=self.max_size)
+        self._started_at = time.monotonic()
+        self._busy_seconds = 0.0
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._accepting = True
+        logger.info(f"Inbound work queue started ({self.workers} workers, capacity {self.max_size})")
+
+    @property
+    def accepting(self) -> bool:
+        return self._accepting
+
+    def free_slots(self) -> int:
+        if not self._accepting:
+            return 0
+        return self.max_size - self._queue.qsize()
+
+    def try_submit(self, jobs: List[Job], priority: int = PRIORITY_NORMAL) -> bool:
+        """Queues all of `jobs` or none of them."""
+        if len(jobs) > self.free_slots():
+            metrics.inc("inbound_jobs_rejected", len(jobs), reason="stopped" if not self._accepting else "full")
+            return False
+        now = time.monotonic()
+        for job in jobs:
+            self._queue.put_nowait((priority, next(self._seq), now, job))
+        metrics.set_gauge("inbound_queue_depth", self._queue.qsize())
+        return True
+
+    async def _worker(self):
+        while True:
+            priority, _, enqueued_at, job = await self._queue.get()
+            started = time.monotonic()
+            metrics.observe("inbound_queue_wait_seconds", started - enqueued_at, priority=_PRIORITY_NAMES.get(priority, priority))
+            self._busy += 1
+            try:
+                await job()
+            except Exception as e:
+                logger.error(f"Inbound job failed: {e}")
+                metrics.inc("inbound_jobs_failed")
+            finally:
+                self._busy -= 1
+                self._busy_seconds += time.monotonic() - started
+                self._queue.task_done()
+                metrics.set_gauge("inbound_queue_depth", self._queue.qsize())
+
+    async def stop(self, timeout: float = None):
+        """Stops admitting work, drains what is queued for up to `timeout`, then cancels the rest."""
+        if not self._tasks:
+            return
+        timeout = settings.INBOUND_QUEUE_DRAIN_SECONDS if timeout is None else timeout
+        self._accepting = False
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Dropping {self._queue.qsize()} inbound jobs still queued at shutdown")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def utilization(self) -> float:
+        """Share of worker time spent on jobs since start; a running job is counted once it finishes."""
+        elapsed = (time.monotonic() - self._started_at) * self.workers
+        if elapsed <= 0:
+            return 0.0
+        return min(self._busy_seconds / elapsed, 1.0)
+
+    def stats(self) -> Dict[str, Any]:
+        depth = self._queue.qsize() if self._queue else 0
+        utilization = round(self.utilization(), 4)
+        metrics.set_gauge("inbound_queue_depth", depth)
+        metrics.set_gauge("inbound_workers_busy", self._busy)
+        metrics.set_gauge("inbound_worker_utilization", utilization)
+        return {
+            "accepting": self._accepting,
+            "queue_depth": depth,
+            "capacity": self.max_size,
+            "workers": self.workers,
+            "busy_workers": self._busy,
+            "utilization": utilization
+        }
+
+inbound_queue = InboundWorkQueue()
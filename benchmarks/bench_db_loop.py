@@ -0,0 +1,111 @@
+"""Benchmark: event-loop blocking per webhook, blocking pool vs. the async repositories.
+
+Run from the repository root against a reachable database (DB_* settings / .env):
+
+    python benchmarks/bench_db_loop.py [--webhooks 500] [--concurrency 50]
+
+Each simulated webhook performs the repository reads the orchestrator does for
+an inbound chat message and an email thread lookup (read-only SELECTs, nothing
+is written). A ticker task sleeps 1 ms in a loop and records how late it wakes
+up; the sum of those delays is time the event loop could not serve anything
+else (acks, other webhooks, timers).
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app.repositories.base import AsyncDatabase, Database  # noqa: E402
+from app.repositories.conversation import _SELECT_LATEST, AsyncConversationRepository  # noqa: E402
+from app.repositories.message import _SELECT_BY_THREAD, AsyncMessageRepository  # noqa: E402
+
+TICK = 0.001
+
+class LoopMonitor:
+    def __init__(self):
+        self.blocked = 0.0
+        self.worst = 0.0
+        self._task = None
+
+    async def _tick(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(TICK)
+            late = time.perf_counter() - started - TICK
+            if late > 0:
+                self.blocked += late
+                self.worst = max(self.worst, late)
+
+    def __enter__(self):
+        self._task = asyncio.create_task(self._tick())
+        return self
+
+    def __exit__(self, *exc):
+        self._task.cancel()
+
+def _ids(i: int):
+    return f"bench-{uuid.uuid4().hex[:12]}-{i}", f"<bench-{i}@example.invalid>"
+
+def _sync_query(sql: str, params: tuple):
+    with Database.get_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchone()
+
+async def _sync_webhook(i: int):
+    # Previous behaviour: the same queries on the blocking pool, called directly from coroutines.
+    user, thread = _ids(i)
+    _sync_query(_SELECT_LATEST, (user, "whatsapp"))
+    _sync_query(_SELECT_BY_THREAD, (thread,))
+    await asyncio.sleep(0)
+
+async def _async_webhook(conv: AsyncConversationRepository, msg: AsyncMessageRepository, i: int):
+    user, thread = _ids(i)
+    await conv.get_active_id(user, "whatsapp")
+    await msg.get_conversation_by_thread(thread)
+
+async def _run(label: str, webhook, repos, webhooks: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            await webhook(*repos, i)
+
+    started = time.perf_counter()
+    with LoopMonitor() as monitor:
+        await asyncio.gather(*(one(i) for i in range(webhooks)))
+    elapsed = time.perf_counter() - started
+    print(
+        f"  {label:<18} loop blocked {monitor.blocked / webhooks * 1000:7.3f} ms/webhook"
+        f"  worst stall {monitor.worst * 1000:7.2f} ms  wall {elapsed:6.2f} s"
+    )
+
+async def main_async(args):
+    Database.initialize()
+    await AsyncDatabase.open()
+    try:
+        # Warm both pools so connection setup is not measured.
+        _sync_query(_SELECT_LATEST, ("bench-warmup", "whatsapp"))
+        await AsyncConversationRepository().get_latest_id("bench-warmup", "whatsapp")
+
+        print(f"{args.webhooks} webhooks, {args.concurrency} in flight:")
+        await _run("blocking pool", _sync_webhook, (), args.webhooks, args.concurrency)
+        await _run("async repositories", _async_webhook, (AsyncConversationRepository(), AsyncMessageRepository()), args.webhooks, args.concurrency)
+    finally:
+        await AsyncDatabase.close()
+        Database.close()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--webhooks", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+if __name__ == "__main__":
+    main()
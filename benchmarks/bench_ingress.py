@@ -0,0 +1,184 @@
+"""Benchmark: webhook ingress cost per request, previous handlers vs. the fast path.
+
+Run from the repository root:
+
+    python benchmarks/bench_ingress.py [--requests 5000] [--batch 50]
+
+Drives the FastAPI app in-process over raw ASGI (no sockets, no server), so the
+numbers are app time only. "ack" is the time until the response has been sent
+(routing, body parsing, message construction, queueing); "total" is the whole
+ASGI call, which for the previous handler includes its background task.
+Orchestrator processing itself is replaced by a no-op, so database, backend
+and Meta calls are not measured.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("BACKEND_API_BASE_URL", "http://localhost")
+for _var in ("DB_HOST", "DB_NAME", "DB_USER", "DB_PASS"):
+    os.environ.setdefault(_var, "bench")
+os.environ.setdefault("DB_PORT", "5432")
+
+from fastapi import APIRouter, BackgroundTasks, Depends, FastAPI, Request  # noqa: E402
+from app.api import dependencies  # noqa: E402
+from app.api.routes import router  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.schemas.models import IncomingMessage  # noqa: E402
+from app.services.orchestrator import MessageOrchestrator  # noqa: E402
+from app.services.work_queue import inbound_queue  # noqa: E402
+
+async def _noop(self, msg):
+    return None
+
+MessageOrchestrator.process_message = _noop
+MessageOrchestrator.handle_feedback = _noop
+
+# --- Previous handler, kept for comparison ------------------------------------
+
+def legacy_get_orchestrator() -> MessageOrchestrator:
+    adapters = {
+        "whatsapp": dependencies._wa_adapter,
+        "instagram": dependencies._ig_adapter,
+        "email": dependencies._email_adapter
+    }
+    return MessageOrchestrator(
+        repo_conv=dependencies._repo_conv,
+        repo_msg=dependencies._repo_msg,
+        chatbot=dependencies._chatbot_client,
+        adapters=adapters,
+        dispatcher=dependencies.outbound_dispatcher
+    )
+
+def legacy_parse_whatsapp_payload(data):
+    try:
+        entry = data.get("entry", [])[0]
+        changes = entry.get("changes", [])[0]
+        value = changes.get("value", {})
+        if "messages" not in value:
+            return None
+        message = value["messages"][0]
+        sender_id = message.get("from")
+        msg_id = message.get("id")
+        if str(sender_id) == str(settings.WHATSAPP_PHONE_NUMBER_ID):
+            return None
+        if message.get("type") == "text":
+            return IncomingMessage(
+                platform_unique_id=sender_id,
+                query=message["text"]["body"],
+                platform="whatsapp",
+                metadata={"phone": sender_id, "message_id": msg_id}
+            )
+    except (IndexError, KeyError, AttributeError):
+        pass
+    return None
+
+legacy_router = APIRouter()
+
+@legacy_router.post("/whatsapp/webhook")
+async def legacy_whatsapp_webhook(
+    request: Request,
+    bg_tasks: BackgroundTasks,
+    orchestrator: MessageOrchestrator = Depends(legacy_get_orchestrator)
+):
+    data = await request.json()
+    msg = legacy_parse_whatsapp_payload(data)
+    if msg:
+        bg_tasks.add_task(orchestrator.process_message, msg)
+    return {"status": "ok"}
+
+# --- Payloads and driver ----------------------------------------------------
+
+def whatsapp_delivery(messages: int) -> bytes:
+    items = [
+        {"from": f"6281234{i:05d}", "id": f"wamid.HBgNNjI4MTIzNDU2Nzg5MBUCABIYFjNFQjA{i:05d}", "timestamp": "1717000000",
+         "type": "text", "text": {"body": "Selamat siang, bagaimana cara mengurus perubahan data NIB di OSS?"}}
+        for i in range(messages)
+    ]
+    return json.dumps({"object": "whatsapp_business_account", "entry": [{"id": "102290129340398", "changes": [{
+        "field": "messages",
+        "value": {
+            "messaging_product": "whatsapp",
+            "metadata": {"display_phone_number": "15550783881", "phone_number_id": "106540352242922"},
+            "contacts": [{"profile": {"name": "Budi"}, "wa_id": items[0]["from"]}],
+            "messages": items
+        }
+    }]}]}).encode()
+
+def _scope(path: str, body: bytes) -> dict:
+    return {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        "client": ("127.0.0.1", 40000), "server": ("bench", 80),
+    }
+
+async def _call(app, scope: dict, body: bytes) -> float:
+    """Runs one request; returns the time at which the response was fully sent."""
+    sent = False
+    acked = 0.0
+
+    async def receive():
+        nonlocal sent
+        if sent:
+            return {"type": "http.disconnect"}
+        sent = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        nonlocal acked
+        if message["type"] == "http.response.start":
+            assert message["status"] == 200, message["status"]
+        elif message["type"] == "http.response.body" and not message.get("more_body"):
+            acked = time.perf_counter()
+
+    await app(scope, receive, send)
+    return acked
+
+async def _measure(app, body: bytes, requests: int):
+    inbound_queue.start()
+    scope = _scope("/whatsapp/webhook", body)
+    ack = total = 0.0
+    for i in range(min(200, requests) + requests):
+        started = time.perf_counter()
+        acked = await _call(app, dict(scope), body)
+        finished = time.perf_counter()
+        if i >= min(200, requests):
+            ack += acked - started
+            total += finished - started
+        # Let the inbound workers drain between requests (outside the timed window).
+        while inbound_queue.stats()["queue_depth"]:
+            await asyncio.sleep(0)
+    await inbound_queue.stop()
+    return ack, total
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--batch", type=int, default=50)
+    args = parser.parse_args()
+
+    legacy_app, app = FastAPI(), FastAPI()
+    legacy_app.include_router(legacy_router)
+    app.include_router(router)
+
+    for label, body in (("single message", whatsapp_delivery(1)), (f"batch of {args.batch}", whatsapp_delivery(args.batch))):
+        print(f"{label} ({len(body):,} bytes):")
+        old = asyncio.run(_measure(legacy_app, body, args.requests))
+        new = asyncio.run(_measure(app, body, args.requests))
+        for name, (ack, total) in (("previous handler", old), ("fast ingress", new)):
+            print(
+                f"  {name:<18} ack {ack / args.requests * 1e6:7.1f} us  total {total / args.requests * 1e6:7.1f} us"
+                f"  {args.requests / total:9,.0f} req/s per worker"
+            )
+        if label != "single message":
+            print("  (the previous handler only parsed and dispatched the first message of the batch)")
+        print(f"  ack speedup: {old[0] / new[0]:.1f}x\n")
+
+if __name__ == "__main__":
+    main()
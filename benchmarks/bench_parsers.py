@@ -0,0 +1,110 @@
+"""Benchmark: fan-out webhook parsing over large, batched Meta deliveries.
+
+Run from the repository root:
+
+    python benchmarks/bench_parsers.py [--entries 200] [--per-entry 10] [--repeat 5]
+
+Builds WhatsApp and Instagram deliveries with many entries/changes/messages
+(mixed with status receipts and unsupported types), checks that every
+supported message is parsed, and reports parse throughput.
+"""
+import argparse
+import os
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("BACKEND_API_BASE_URL", "http://localhost")
+for _var in ("DB_HOST", "DB_NAME", "DB_USER", "DB_PASS"):
+    os.environ.setdefault(_var, "bench")
+os.environ.setdefault("DB_PORT", "5432")
+
+from app.core.metrics import metrics  # noqa: E402
+from app.services.parsers import parse_instagram_payload, parse_whatsapp_payload  # noqa: E402
+
+# --- Payloads ---------------------------------------------------------------
+
+def whatsapp_delivery(entries: int, per_entry: int):
+    """Returns (payload, expected supported messages). Every 5th message is an image."""
+    expected = 0
+    body = []
+    for e in range(entries):
+        messages = []
+        for m in range(per_entry):
+            sender = f"62812{e:04d}{m:03d}"
+            if m % 5 == 4:
+                messages.append({"from": sender, "id": f"wamid.{e}.{m}", "type": "image", "image": {"id": "x"}})
+            elif m % 7 == 3:
+                messages.append({
+                    "from": sender, "id": f"wamid.{e}.{m}", "type": "interactive",
+                    "interactive": {"type": "button_reply", "button_reply": {"id": "helpful", "title": "Ya"}}
+                })
+                expected += 1
+            else:
+                messages.append({"from": sender, "id": f"wamid.{e}.{m}", "type": "text", "text": {"body": f"Halo, status NIB saya {e}-{m}?"}})
+                expected += 1
+        half = len(messages) // 2
+        body.append({"id": f"waba-{e}", "changes": [
+            {"field": "messages", "value": {"messaging_product": "whatsapp", "messages": messages[:half]}},
+            {"field": "messages", "value": {"messaging_product": "whatsapp", "statuses": [{"id": "wamid.s", "status": "read"}]}},
+            {"field": "messages", "value": {"messaging_product": "whatsapp", "messages": messages[half:]}},
+        ]})
+    return {"object": "whatsapp_business_account", "entry": body}, expected
+
+def instagram_delivery(entries: int, per_entry: int):
+    """Returns (payload, expected supported messages). Every 4th event is a read receipt."""
+    expected = 0
+    body = []
+    for e in range(entries):
+        messaging = []
+        for m in range(per_entry):
+            sender = {"id": f"17841{e:05d}{m:03d}"}
+            if m % 4 == 3:
+                messaging.append({"sender": sender, "recipient": {"id": "bot"}, "read": {"mid": "x"}})
+            else:
+                messaging.append({"sender": sender, "recipient": {"id": "bot"}, "message": {"mid": f"mid.{e}.{m}", "text": "Bagaimana cara daftar OSS?"}})
+                expected += 1
+        body.append({"id": f"ig-{e}", "time": 0, "messaging": messaging})
+    return {"object": "instagram", "entry": body}, expected
+
+# --- Helpers ----------------------------------------------------------------
+
+def _check(label, parser, payload, expected):
+    got = sum(1 for _ in parser(payload))
+    status = "ok" if got == expected else "MISMATCH"
+    print(f"  {label:<12} parsed {got:>7,} of {expected:>7,} supported messages  {status}")
+    return got == expected
+
+def _bench(label, parser, payload, expected, repeat):
+    best = min(timeit.repeat(lambda: list(parser(payload)), number=1, repeat=repeat))
+    print(f"  {label:<12} {best * 1000:9.2f} ms  ({expected / best:,.0f} msg/s)")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, default=200)
+    parser.add_argument("--per-entry", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    wa, wa_expected = whatsapp_delivery(args.entries, args.per_entry)
+    ig, ig_expected = instagram_delivery(args.entries, args.per_entry)
+
+    print("Coverage:")
+    ok = _check("whatsapp", parse_whatsapp_payload, wa, wa_expected)
+    ok = _check("instagram", parse_instagram_payload, ig, ig_expected) and ok
+
+    print("\nThroughput:")
+    _bench("whatsapp", parse_whatsapp_payload, wa, wa_expected, args.repeat)
+    _bench("instagram", parse_instagram_payload, ig, ig_expected, args.repeat)
+
+    print("\nUnsupported messages counted (all runs):")
+    for row in metrics.snapshot()["counters"]:
+        if row["name"] == "webhook_unsupported_messages":
+            print(f"  {row['labels']['platform']:<12} {row['labels']['type']:<24} {row['value']:>9,.0f}")
+
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Benchmark + equivalence check: linear sanitizer vs. the previous regex chain.
+
+Run from the repository root:
+
+    python benchmarks/bench_sanitizer.py [--size-kb 2048] [--repeat 5]
+
+Every file in benchmarks/corpus is sanitized by both implementations at several
+`max_chars` budgets and the outputs are compared. The reference is the previous
+implementation with its script/style patterns fixed to what they were meant to
+match (`<script[^>]>.?</script>` never matched anything). Known, intended
+differences are listed in KNOWN_DIFFERENCES; any other mismatch fails the run.
+"""
+import argparse
+import os
+import re
+import sys
+import time
+import timeit
+from html import unescape
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("BACKEND_API_BASE_URL", "http://localhost")
+for _var in ("DB_HOST", "DB_NAME", "DB_USER", "DB_PASS"):
+    os.environ.setdefault(_var, "bench")
+os.environ.setdefault("DB_PORT", "5432")
+
+from app.adapters.email.sanitizer import sanitize  # noqa: E402
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+
+KNOWN_DIFFERENCES = {
+    "gmail_reply_id_wrapped.txt": "attribution wrapped over two lines is now recognised",
+    "outlook_reply_en.html": "Outlook's From:/Sent:/To: block is split by blank lines, which the old pattern missed",
+    "outlook_reply_id.html": "same as above, and Indonesian Outlook labels the date 'Dikirim:'",
+}
+
+# --- Previous implementation (script/style patterns fixed) ------------------
+
+def legacy_strip_html(html):
+    if not html: return ""
+    html = re.sub(r'<hr\s*/?>', '\n__\n', html, flags=re.IGNORECASE)
+    html = re.sub(r'<script[^>]*>.*?</script>', '', html, flags=re.IGNORECASE | re.DOTALL)
+    html = re.sub(r'<style[^>]*>.*?</style>', '', html, flags=re.IGNORECASE | re.DOTALL)
+    html = re.sub(r'</(p|div|br|li|h[1-6]|tr)>', '\n', html, flags=re.IGNORECASE)
+    html = re.sub(r'<br\s*/?>', '\n', html, flags=re.IGNORECASE)
+    html = re.sub(r'<[^>]+>', ' ', html)
+    html = unescape(html)
+    return html.strip()
+
+def legacy_strip_quoted_sections(text):
+    if not text: return ""
+    patterns = [
+        r'(?:\r\n|\n|^)?\s*On\s+.*(?:at|pukul)\s+.*(?:wrote|menulis):?\s*[\s\S]*',
+        r'(?:\r\n|\n|^)?\s*On\s+.*(?:wrote|menulis):?\s*[\s\S]*',
+        r'(?:\r\n|\n|^)?\s*Pada\s+.*menulis:\s*[\s\S]*',
+        r'(?:\r\n|\n|^)?\s*From:\s*.*\n?Sent:\s*.*\n?To:\s*.*[\s\S]*',
+        r'(?:\r\n|\n|^)?\s*Dari:\s*.*\n?Kirim:\s*.*\n?Kepada:\s*.*[\s\S]*',
+        r'\n\s*_{3,}[\s\S]*',
+        r'\n\s*-{3,}\s*Original Message\s*-{3,}[\s\S]*',
+        r'\n\s*>[\s\S]*',
+    ]
+    for pattern in patterns:
+        text = re.sub(pattern, '', text, flags=re.IGNORECASE | re.MULTILINE)
+    return text.strip()
+
+def legacy_sanitize(text_plain, html, max_chars=6000):
+    body = text_plain.strip() if text_plain else legacy_strip_html(html)
+    body = legacy_strip_quoted_sections(body)
+    body = re.sub(r'\s{2,}', ' ', body)
+    body = re.sub(r'\n{3,}', '\n\n', body)
+    return body[:max_chars].strip()
+
+# --- Helpers ----------------------------------------------------------------
+
+def load_corpus():
+    for name in sorted(os.listdir(CORPUS)):
+        with open(os.path.join(CORPUS, name), encoding="utf-8") as fh:
+            content = fh.read()
+        yield name, ((None, content) if name.endswith(".html") else (content, None))
+
+def _bench(label, fn, repeat):
+    best = min(timeit.repeat(fn, number=1, repeat=repeat))
+    print(f"  {label:<28} {best * 1000:9.2f} ms")
+    return best
+
+def check_equivalence() -> bool:
+    print("Equivalence (new vs. reference):")
+    ok = True
+    for name, (plain, html) in load_corpus():
+        results = []
+        for budget in (200, 1000, 6000):
+            new, old = sanitize(plain, html, budget), legacy_sanitize(plain, html, budget)
+            assert len(new) <= budget, f"{name}: {len(new)} chars over budget {budget}"
+            results.append(new == old)
+        if all(results):
+            status = "ok"
+        elif name in KNOWN_DIFFERENCES:
+            status = f"known difference: {KNOWN_DIFFERENCES[name]}"
+        else:
+            status = "MISMATCH"
+            ok = False
+        print(f"  {name:<32} {status}")
+    return ok
+
+def adversarial_line(size: int) -> str:
+    # Many "on " tokens on one line and no "wrote": the old attribution pattern backtracks on every start.
+    return ("Please follow up on the request on time " * (size // 40 + 1))[:size]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-kb", type=int, default=2048)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    ok = check_equivalence()
+
+    print("\nCorpus timings:")
+    for name, (plain, html) in load_corpus():
+        print(f"{name}")
+        old = _bench("regex chain", lambda: legacy_sanitize(plain, html), args.repeat)
+        new = _bench("linear sanitizer", lambda: sanitize(plain, html, 6000), args.repeat)
+        print(f"  speedup: {old / new:.1f}x")
+
+    with open(os.path.join(CORPUS, "newsletter_id.html"), encoding="utf-8") as fh:
+        newsletter = fh.read()
+    big = newsletter * (args.size_kb * 1024 // len(newsletter) + 1)
+    print(f"\nLarge newsletter ({len(big):,} chars):")
+    old = _bench("regex chain", lambda: legacy_sanitize(None, big), args.repeat)
+    new = _bench("linear sanitizer", lambda: sanitize(None, big, 6000), args.repeat)
+    print(f"  speedup: {old / new:.1f}x")
+
+    print("\nAdversarial single line (old cost grows super-linearly):")
+    for size in (2000, 4000, 8000):
+        line = adversarial_line(size)
+        started = time.perf_counter()
+        legacy_sanitize(line, None)
+        old = time.perf_counter() - started
+        new = min(timeit.repeat(lambda: sanitize(line, None, 6000), number=1, repeat=args.repeat))
+        print(f"  {size:>6} chars: regex chain {old * 1000:9.2f} ms, linear sanitizer {new * 1000:7.3f} ms")
+
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+# Settings are validated at import time; tests never reach these endpoints.
+os.environ.setdefault("BACKEND_API_BASE_URL", "http://localhost")
+for _var in ("DB_HOST", "DB_NAME", "DB_USER", "DB_PASS"):
+    os.environ.setdefault(_var, "test")
+os.environ.setdefault("DB_PORT", "5432")
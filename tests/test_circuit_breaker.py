@@ -0,0 +1,76 @@
+import asyncio
+import time
+
+from app.schemas.models import IncomingMessage
+from app.services.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from app.services.dispatcher import OutboundDispatcher
+from app.services.orchestrator import MessageOrchestrator
+from app.core.config import settings
+
+def _breaker(**overrides):
+    options = dict(window_size=10, min_calls=4, error_rate_threshold=0.5,
+                   p95_latency_threshold=2.0, open_seconds=0.05, half_open_max_calls=1)
+    options.update(overrides)
+    return CircuitBreaker("backend", **options)
+
+def test_stays_closed_below_min_calls():
+    breaker = _breaker()
+    for _ in range(3):
+        breaker.record(False, 0.1)
+    assert breaker.state == CLOSED
+
+def test_error_rate_opens_then_half_open_probe_closes():
+    breaker = _breaker()
+    for ok in (True, False, True, False):
+        breaker.record(ok, 0.1)
+    assert breaker.state == OPEN
+    assert not breaker.allow_request() and not breaker.is_available()
+
+    time.sleep(0.06)
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow_request()
+    assert not breaker.allow_request()  # only one probe at a time
+    breaker.record(True, 0.1)
+    assert breaker.state == CLOSED
+    assert breaker.snapshot()["window_calls"] == 0
+
+def test_failed_probe_reopens():
+    breaker = _breaker()
+    for _ in range(4):
+        breaker.record(False, 0.1)
+    time.sleep(0.06)
+    assert breaker.allow_request()
+    breaker.record(False, 0.1)
+    assert breaker.state == OPEN
+    assert breaker.snapshot()["reason"] == "half-open probe failed"
+
+def test_slow_calls_open_on_p95_latency():
+    breaker = _breaker()
+    for _ in range(4):
+        breaker.record(True, 3.0)
+    assert breaker.state == OPEN
+    assert breaker.snapshot()["reason"].startswith("p95 latency")
+
+def test_busy_reply_queues_behind_replies_already_in_the_lane(monkeypatch):
+    monkeypatch.setattr(settings, "BACKEND_BUSY_REPLY_ENABLED", True)
+    sent = []
+
+    class Adapter:
+        async def send_message(self, recipient_id, text, **kwargs):
+            await asyncio.sleep(0.01)
+            sent.append(text)
+
+        async def send_typing_off(self, recipient_id):
+            pass
+
+    async def scenario():
+        orchestrator = MessageOrchestrator.__new__(MessageOrchestrator)
+        orchestrator.dispatcher = OutboundDispatcher(4)
+        adapter = Adapter()
+        orchestrator.dispatcher.submit("whatsapp", "u1", lambda: adapter.send_message("u1", "earlier answer"))
+        msg = IncomingMessage(platform_unique_id="u1", query="halo", platform="whatsapp", metadata={})
+        await orchestrator._fail_fast(adapter, msg)
+        await orchestrator.dispatcher.stop(1)
+
+    asyncio.run(scenario())
+    assert sent == ["earlier answer", settings.BACKEND_BUSY_REPLY_TEXT]
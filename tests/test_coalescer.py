@@ -0,0 +1,88 @@
+import asyncio
+
+from app.schemas.models import IncomingMessage
+from app.services.coalescer import BurstCoalescer
+from app.services.work_queue import InboundWorkQueue
+
+def _msg(text, sender="u1", message_id=None):
+    return IncomingMessage(platform_unique_id=sender, query=text, platform="whatsapp",
+                           metadata={"message_id": message_id or text})
+
+def test_burst_is_merged_and_flushed_on_the_work_queue():
+    async def scenario():
+        queue = InboundWorkQueue(workers=1, max_size=10)
+        queue.start()
+        coalescer = BurstCoalescer(window=0.05, max_delay=1.0, max_chars=100, queue=queue)
+        flushed = []
+
+        async def flush(merged):
+            flushed.append((merged.query, merged.metadata["message_id"], asyncio.current_task() in queue._tasks))
+
+        for text in ("halo", "mau tanya", "izin usaha"):
+            coalescer.add(_msg(text), flush)
+        coalescer.add(_msg("other", sender="u2"), flush)
+        await asyncio.sleep(0.15)
+        await queue.stop()
+        return flushed
+
+    flushed = asyncio.run(scenario())
+    assert sorted(flushed) == [("halo\nmau tanya\nizin usaha", "izin usaha", True), ("other", "other", True)]
+
+def test_max_chars_flushes_the_open_burst_first():
+    async def scenario():
+        queue = InboundWorkQueue(workers=1, max_size=10)
+        queue.start()
+        coalescer = BurstCoalescer(window=0.05, max_delay=1.0, max_chars=10, queue=queue)
+        flushed = []
+
+        async def flush(merged):
+            flushed.append(merged.query)
+
+        coalescer.add(_msg("123456"), flush)
+        coalescer.add(_msg("abcdef"), flush)
+        await asyncio.sleep(0.15)
+        await queue.stop()
+        return flushed
+
+    assert asyncio.run(scenario()) == ["123456", "abcdef"]
+
+def test_full_queue_sheds_the_burst():
+    async def scenario():
+        queue = InboundWorkQueue(workers=1, max_size=1)
+        queue.start()
+        gate = asyncio.Event()
+        queue.try_submit([gate.wait])          # occupies the only worker
+        await asyncio.sleep(0)
+        queue.try_submit([gate.wait])          # fills the queue
+        coalescer = BurstCoalescer(window=0.01, max_delay=1.0, max_chars=100, queue=queue)
+        flushed = []
+
+        async def flush(merged):
+            flushed.append(merged.query)
+
+        coalescer.add(_msg("halo"), flush)
+        await asyncio.sleep(0.05)
+        gate.set()
+        await queue.stop()
+        await coalescer.stop()
+        return flushed
+
+    assert asyncio.run(scenario()) == []
+
+def test_stop_flushes_open_bursts_after_the_queue_stopped():
+    async def scenario():
+        queue = InboundWorkQueue(workers=1, max_size=10)
+        queue.start()
+        coalescer = BurstCoalescer(window=10, max_delay=10, max_chars=100, queue=queue)
+        flushed = []
+
+        async def flush(merged):
+            flushed.append(merged.query)
+
+        coalescer.add(_msg("halo"), flush)
+        coalescer.add(_msg("lagi"), flush)
+        await queue.stop()
+        await coalescer.stop()
+        return flushed, coalescer.pending()
+
+    assert asyncio.run(scenario()) == (["halo\nlagi"], 0)
@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+from app.services.dispatcher import OutboundDispatcher
+
+def test_jobs_for_one_recipient_run_in_submission_order():
+    done = []
+
+    def job(recipient, n, delay):
+        async def run():
+            await asyncio.sleep(delay)
+            done.append((recipient, n))
+            return n
+        return run
+
+    async def scenario():
+        dispatcher = OutboundDispatcher(max_concurrency=10)
+        # Earlier jobs are slower, so any overtaking would reorder them.
+        futures = [dispatcher.submit("whatsapp", "u1", job("u1", n, 0.03 - n * 0.01)) for n in range(3)]
+        futures.append(dispatcher.submit("whatsapp", "u2", job("u2", 0, 0)))
+        results = await asyncio.gather(*futures)
+        return results
+
+    assert asyncio.run(scenario()) == [0, 1, 2, 0]
+    assert [n for recipient, n in done if recipient == "u1"] == [0, 1, 2]
+    # Another recipient's lane is not held up behind u1.
+    assert done[0] == ("u2", 0)
+
+def test_lanes_share_the_global_concurrency_cap():
+    running = 0
+    peak = 0
+
+    async def job():
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+
+    async def scenario():
+        dispatcher = OutboundDispatcher(max_concurrency=2)
+        await asyncio.gather(*(dispatcher.submit("instagram", f"u{n}", job) for n in range(6)))
+        return dispatcher.stats()
+
+    stats = asyncio.run(scenario())
+    assert peak == 2
+    assert stats["active_lanes"] == 0 and stats["queue_depth"] == 0
+
+def test_a_failed_job_does_not_block_the_lane():
+    async def boom():
+        raise RuntimeError("send failed")
+
+    async def ok():
+        return "sent"
+
+    async def scenario():
+        dispatcher = OutboundDispatcher(max_concurrency=1)
+        failed = dispatcher.submit("whatsapp", "u1", boom)
+        after = dispatcher.submit("whatsapp", "u1", ok)
+        with pytest.raises(RuntimeError):
+            await failed
+        return await after
+
+    assert asyncio.run(scenario()) == "sent"
+
+def test_stop_drains_then_cancels_what_is_left():
+    async def slow():
+        await asyncio.sleep(10)
+
+    async def scenario():
+        dispatcher = OutboundDispatcher(max_concurrency=1)
+        stuck = dispatcher.submit("whatsapp", "u1", slow)
+        queued = dispatcher.submit("whatsapp", "u1", slow)
+        await asyncio.sleep(0)
+        await dispatcher.stop(timeout=0.05)
+        return stuck.cancelled(), queued.cancelled(), dispatcher.queue_depth()
+
+    assert asyncio.run(scenario()) == (True, True, 0)
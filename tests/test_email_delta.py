@@ -0,0 +1,80 @@
+import asyncio
+
+import httpx
+
+from app.adapters.email import listener
+
+class _Repo:
+    def __init__(self, cursor=None):
+        self.values = {} if cursor is None else {"graph:inbox@example.go.id:inbox": cursor}
+        self.cleared = 0
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value):
+        self.values[key] = value
+
+    def clear(self, key):
+        self.cleared += 1
+        self.values.pop(key, None)
+
+class _Batch:
+    def mark_read(self, message_id):
+        pass
+
+    async def flush(self):
+        return {}
+
+def _setup(monkeypatch, repo, responses):
+    requests = []
+
+    async def graph_get(url, token, params=None, extra_headers=None):
+        requests.append(url)
+        return responses(len(requests), url)
+
+    async def token():
+        return "token"
+
+    monkeypatch.setattr(listener.settings, "AZURE_EMAIL_USER", "inbox@example.go.id")
+    monkeypatch.setattr(listener, "sync_repo", repo)
+    monkeypatch.setattr(listener, "get_graph_token", token)
+    monkeypatch.setattr(listener, "_mailbox_batch", lambda: _Batch())
+    monkeypatch.setattr(listener, "_graph_get", graph_get)
+    return requests
+
+def _poll():
+    async def run():
+        queue = asyncio.Queue()
+
+        async def worker():
+            while True:
+                await queue.get()
+                queue.task_done()
+
+        task = asyncio.create_task(worker())
+        found = await listener._poll_graph_delta(queue)
+        task.cancel()
+        return found
+    return asyncio.run(run())
+
+def test_invalid_cursor_resyncs_once_from_a_fresh_start(monkeypatch):
+    repo = _Repo("https://graph.test/delta?$deltatoken=stale")
+
+    def responses(n, url):
+        if n == 1:
+            return httpx.Response(410, json={"error": {"code": "syncStateNotFound"}})
+        return httpx.Response(200, json={"value": [{"id": "m1", "isRead": False}],
+                                         "@odata.deltaLink": "https://graph.test/delta?$deltatoken=new"})
+
+    requests = _setup(monkeypatch, repo, responses)
+    assert _poll() == 1
+    assert len(requests) == 2 and "receivedDateTime" in requests[1]
+    assert repo.values["graph:inbox@example.go.id:inbox"].endswith("deltatoken=new")
+
+def test_rejected_fresh_start_gives_up_for_the_cycle(monkeypatch):
+    repo = _Repo("https://graph.test/delta?$deltatoken=stale")
+    requests = _setup(monkeypatch, repo, lambda n, url: httpx.Response(400, json={"error": {"code": "syncStateNotFound"}}))
+    assert _poll() == 0
+    assert len(requests) == 2
+    assert repo.cleared == 1
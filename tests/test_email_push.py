@@ -0,0 +1,182 @@
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app.adapters.email import listener, subscriptions
+from app.adapters.email.subscriptions import GraphSubscriptionManager, graph_subscriptions
+from app.core.config import settings
+from app.main import app
+
+SECRET = "s3cret-client-state"
+
+class _Repo:
+    def __init__(self, **values):
+        self.values = dict(values)
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value):
+        self.values[key] = value
+
+class _Tokens:
+    configured = True
+
+    async def get_token(self):
+        return "token"
+
+class _FakeGraph:
+    """Stands in for Graph's /subscriptions endpoints."""
+
+    def __init__(self):
+        self.requests = []
+        self.renew_status = 200
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content) if request.content else {}
+        self.requests.append((request.method, request.url.path, body))
+        if request.method == "POST":
+            return httpx.Response(201, json={"id": f"sub-{len(self.requests)}", "expirationDateTime": body["expirationDateTime"]})
+        if request.method == "PATCH":
+            if self.renew_status != 200:
+                return httpx.Response(self.renew_status, json={"error": {"code": "x"}})
+            return httpx.Response(200, json={"expirationDateTime": body["expirationDateTime"]})
+        return httpx.Response(204)
+
+@pytest.fixture
+def graph(monkeypatch):
+    fake = _FakeGraph()
+    client = httpx.AsyncClient(transport=httpx.MockTransport(fake))
+    monkeypatch.setattr(subscriptions.http_clients, "client_for", lambda url: client)
+    return fake
+
+def _manager(repo=None):
+    return GraphSubscriptionManager(
+        user_id="inbox@example.go.id", notification_url="https://bot.example/email/webhook",
+        client_state=SECRET, tokens=_Tokens(), repo=repo or _Repo(),
+        lifetime_minutes=60, renew_margin_seconds=600
+    )
+
+@pytest.fixture
+def live_subscription(monkeypatch):
+    monkeypatch.setattr(graph_subscriptions, "client_state", SECRET)
+    monkeypatch.setattr(graph_subscriptions, "subscription_id", "sub-1")
+    monkeypatch.setattr(graph_subscriptions, "expires_at", time.time() + 3600)
+    monkeypatch.setattr(graph_subscriptions, "failure", None)
+    monkeypatch.setattr(graph_subscriptions, "_wakeup", asyncio.Event())
+    return graph_subscriptions
+
+def _notification(client_state=SECRET, **extra):
+    return {"subscriptionId": "sub-1", "changeType": "created", "clientState": client_state,
+            "resource": "Users/x/Messages/AAMk", **extra}
+
+def test_validation_handshake_echoes_the_token():
+    resp = TestClient(app).post("/email/webhook", params={"validationToken": "Validation: Testing client application"})
+    assert resp.status_code == 200
+    assert resp.text == "Validation: Testing client application"
+    assert resp.headers["content-type"].startswith("text/plain")
+
+def test_trusted_notification_wakes_the_listener(live_subscription):
+    client = TestClient(app)
+    assert client.post("/email/webhook", json={"value": [_notification()]}).status_code == 202
+    assert live_subscription._wakeup.is_set()
+    assert live_subscription.healthy()
+
+def test_wrong_client_state_is_rejected_and_marks_push_failed(live_subscription):
+    client = TestClient(app)
+    assert client.post("/email/webhook", json={"value": [_notification("guess")]}).status_code == 202
+    assert not live_subscription._wakeup.is_set()
+    assert not live_subscription.healthy()
+    client.post("/email/webhook", json={"value": [_notification()]})
+    assert live_subscription.healthy()
+
+def test_malformed_notification_bodies():
+    client = TestClient(app)
+    assert client.post("/email/webhook", json=[1, 2]).status_code == 400
+    assert client.post("/email/webhook", json={"value": "x"}).status_code == 400
+    assert client.post("/email/webhook", json={}).status_code == 202
+
+def test_quiet_inbox_stays_healthy(live_subscription):
+    assert live_subscription.healthy()
+    live_subscription.report_unannounced(0)
+    assert live_subscription.healthy()
+    live_subscription.report_unannounced(2)
+    assert live_subscription.failure == "unannounced mail"
+
+def test_subscription_is_created_then_renewed_before_expiry(graph):
+    repo = _Repo()
+    manager = _manager(repo)
+
+    async def scenario():
+        assert await manager._ensure()
+        first_expiry = manager.expires_at
+        manager.expires_at = time.time() + 300  # inside the renew margin
+        assert await manager._ensure()
+        return first_expiry
+
+    asyncio.run(scenario())
+    assert [(method, path) for method, path, _ in graph.requests] == [
+        ("POST", "/v1.0/subscriptions"), ("PATCH", "/v1.0/subscriptions/sub-1")
+    ]
+    assert graph.requests[0][2]["clientState"] == SECRET
+    assert repo.values[manager._state_key] == "sub-1"
+    assert manager.healthy()
+
+def test_vanished_subscription_is_recreated(graph):
+    manager = _manager(_Repo())
+    graph.renew_status = 404
+
+    async def scenario():
+        await manager._ensure()
+        manager.expires_at = time.time() + 300
+        return await manager._ensure()
+
+    assert asyncio.run(scenario())
+    assert [method for method, _, _ in graph.requests] == ["POST", "PATCH", "POST"]
+    assert manager.subscription_id == "sub-3"
+
+def test_rotated_client_state_recreates_instead_of_renewing(graph):
+    manager = _manager(_Repo(**{"graph:inbox@example.go.id:subscription": "old-sub",
+                                "graph:inbox@example.go.id:subscription:client_state": "stale-digest"}))
+    assert asyncio.run(manager._ensure())
+    assert [(method, path) for method, path, _ in graph.requests] == [
+        ("DELETE", "/v1.0/subscriptions/old-sub"), ("POST", "/v1.0/subscriptions")
+    ]
+
+def test_failed_renewal_falls_back_to_polling(graph):
+    manager = _manager(_Repo())
+    graph.renew_status = 503
+
+    async def scenario():
+        await manager._ensure()
+        manager.expires_at = time.time() + 300
+        task = asyncio.create_task(manager.run())
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(scenario())
+    assert manager.failure == "subscription not renewed"
+    assert not manager.healthy()
+
+def test_listener_flags_only_unprompted_safety_polls(monkeypatch, live_subscription):
+    monkeypatch.setattr(settings, "EMAIL_INGEST_MODE", "push")
+    monkeypatch.setattr(settings, "EMAIL_PROVIDER", "azure_oauth2")
+    monkeypatch.setattr(settings, "EMAIL_PUSH_SILENCE_SECONDS", 0.01)
+    monkeypatch.setattr(settings, "EMAIL_POLL_INTERVAL_SECONDS", 0.01)
+    monkeypatch.setattr(listener, "_poll_interval", 0.01)
+
+    async def scenario():
+        unprompted = await listener._wait_for_next_poll(0)
+        live_subscription.notify([_notification()])
+        prompted = await listener._wait_for_next_poll(0)
+        live_subscription.report_unannounced(1)
+        degraded = await listener._wait_for_next_poll(0)  # adaptive polling, not a safety poll
+        return unprompted, prompted, degraded
+
+    assert asyncio.run(scenario()) == (True, False, False)
+    assert not live_subscription.healthy()
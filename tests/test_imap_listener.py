@@ -0,0 +1,123 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.adapters.email import imap_listener
+from app.adapters.email.imap_listener import ImapIdleListener, parse_fetch_response, parse_message
+
+HEADER_1 = (
+    b"From: =?UTF-8?Q?Budi_Santoso?= <budi@example.co.id>\r\n"
+    b"Subject: Re: Izin usaha\r\n"
+    b"Message-ID: <m2@example.co.id>\r\n"
+    b"In-Reply-To: <m1@bkpm.go.id>\r\n"
+    b"References: <m0@bkpm.go.id>\r\n <m1@bkpm.go.id>\r\n"
+    b"Content-Type: text/plain; charset=utf-8\r\n\r\n"
+)
+TEXT_1 = b"Terima kasih, dokumen sudah saya unggah.\r\n"
+HEADER_2 = (
+    b"From: Alice <alice@example.com>\r\n"
+    b"Subject: Question\r\n"
+    b"Message-ID: <a1@example.com>\r\n"
+    b"Content-Type: text/plain\r\n\r\n"
+)
+TEXT_2 = b"Hello"
+
+_SECTION = b"BODY[HEADER.FIELDS (FROM SUBJECT MESSAGE-ID IN-REPLY-TO REFERENCES CONTENT-TYPE CONTENT-TRANSFER-ENCODING MIME-VERSION)]"
+
+# resp.lines of aioimaplib 2.0.3 for a two-message UID FETCH of the listener's parts.
+FETCH_LINES = [
+    b"1 FETCH (UID 101 " + _SECTION + b" {230}",
+    bytearray(HEADER_1),
+    b" BODY[TEXT]<0> {42}",
+    bytearray(TEXT_1),
+    b")",
+    b"2 FETCH (UID 102 " + _SECTION + b" {110}",
+    bytearray(HEADER_2),
+    b" BODY[TEXT]<0> {5}",
+    bytearray(TEXT_2),
+    b")",
+    b"Success",
+]
+
+def test_parse_fetch_response_pairs_literals_with_uids():
+    assert parse_fetch_response(FETCH_LINES) == [(101, HEADER_1, TEXT_1), (102, HEADER_2, TEXT_2)]
+
+def test_parse_fetch_response_skips_untagged_noise():
+    lines = [b"3 EXISTS", b"1 FETCH (FLAGS (\\Seen))"] + FETCH_LINES
+    assert [uid for uid, _, _ in parse_fetch_response(lines)] == [101, 102]
+
+def test_parse_message_threads_on_first_reference():
+    sender, plain, html, metadata = parse_message(HEADER_1, TEXT_1)
+    assert sender == "budi@example.co.id"
+    assert plain == TEXT_1.decode()
+    assert html is None
+    assert metadata == {
+        "subject": "Re: Izin usaha",
+        "sender_name": "Budi Santoso",
+        "message_id": "<m2@example.co.id>",
+        "references": "<m0@bkpm.go.id> <m1@bkpm.go.id> <m2@example.co.id>",
+        "thread_key": "<m0@bkpm.go.id>",
+    }
+
+def test_parse_message_starts_thread_without_references():
+    sender, plain, _, metadata = parse_message(HEADER_2, TEXT_2)
+    assert (sender, plain) == ("alice@example.com", "Hello")
+    assert metadata["thread_key"] == metadata["references"] == "<a1@example.com>"
+
+class _FakeImap:
+    """Stands in for aioimaplib.IMAP4; `outcomes` says per connection whether it comes up."""
+
+    outcomes = []
+
+    def __init__(self, host, port, timeout):
+        self.up = self.outcomes.pop(0)
+
+    async def wait_hello_from_server(self):
+        if not self.up:
+            raise ConnectionRefusedError("connection refused")
+
+    async def login(self, username, password):
+        return SimpleNamespace(result="OK", lines=[b"LOGIN completed"])
+
+    async def select(self, mailbox):
+        return SimpleNamespace(result="OK", lines=[b"OK [UIDVALIDITY 7] UIDs valid", b"SELECT completed"])
+
+    def has_capability(self, capability):
+        return True
+
+    async def uid_search(self, criteria, charset=None):
+        raise ConnectionResetError("connection reset")
+
+    async def logout(self):
+        pass
+
+def test_reconnect_backs_off_and_resets_after_a_session(monkeypatch):
+    # Four refused connects, one session that comes up and then drops, one more refusal.
+    monkeypatch.setattr(_FakeImap, "outcomes", [False, False, False, False, True, False])
+    monkeypatch.setattr(imap_listener.aioimaplib, "IMAP4", _FakeImap)
+    monkeypatch.setattr(imap_listener.random, "uniform", lambda low, high: high)
+
+    delays = []
+
+    async def fake_sleep(delay):
+        delays.append(delay)
+        if len(delays) == 6:
+            raise asyncio.CancelledError
+
+    monkeypatch.setattr(imap_listener.asyncio, "sleep", fake_sleep)
+
+    listener = ImapIdleListener(
+        host="imap.test", port=143, username="user", password="secret", use_ssl=False,
+        sync_repo=SimpleNamespace(get=lambda key: None), max_backoff=5.0
+    )
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(listener.run(asyncio.Queue(), None))
+
+    assert delays == [1.0, 2.0, 4.0, 5.0, 1.0, 2.0]
+    assert listener._uidvalidity == "7"
+
+def test_run_without_credentials_returns():
+    listener = ImapIdleListener(host="imap.test", port=143, username=None, password=None,
+                                sync_repo=SimpleNamespace())
+    asyncio.run(listener.run(asyncio.Queue(), None))
@@ -0,0 +1,82 @@
+import asyncio
+import json
+import time
+
+import httpx
+
+from app.adapters.ratelimit import MetaRateLimiter, TokenBucket, throttle_error_code
+from app.adapters.utils import make_meta_request
+from app.core.config import settings
+
+def test_bucket_spends_its_burst_then_spaces_requests_at_the_rate():
+    bucket = TokenBucket(rate=10, capacity=2)
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    assert 0.09 < bucket.reserve() <= 0.1
+    bucket.refund()
+    assert bucket.reserve() <= 0.1
+
+def test_pause_delays_reservations():
+    bucket = TokenBucket(rate=10, capacity=2)
+    bucket.pause(5)
+    assert 4.9 < bucket.reserve() <= 5
+
+def test_usage_headers_scale_down_and_cap_the_pause(monkeypatch):
+    monkeypatch.setattr(settings, "META_THROTTLE_MAX_WAIT_SECONDS", 30.0)
+    limiter = MetaRateLimiter()
+    usage = {"123": [{"type": "messenger", "call_count": 96, "estimated_time_to_regain_access": 60}]}
+    limiter.observe_usage("acct", {"x-business-use-case-usage": json.dumps(usage)})
+    bucket = limiter._account_bucket("acct")
+    assert bucket.scale == 0.1
+    # An hour-long regain estimate pauses for the cap, not the hour.
+    assert 29 < bucket.paused_until - time.monotonic() <= 30
+
+def test_unreadable_usage_headers_are_ignored():
+    limiter = MetaRateLimiter()
+    limiter.observe_usage("acct", {"x-app-usage": "[1, 2]"})
+    limiter.observe_usage("acct", {"x-business-use-case-usage": "{\"1\": 5}"})
+    assert limiter._account_bucket("acct").scale == 1.0
+
+def test_acquire_refuses_waits_past_the_cap_without_spending_tokens(monkeypatch):
+    monkeypatch.setattr(settings, "META_THROTTLE_MAX_WAIT_SECONDS", 1.0)
+    limiter = MetaRateLimiter()
+    limiter.throttle("acct", 30)
+    tokens = limiter._account_bucket("acct").tokens
+    assert asyncio.run(limiter.acquire("acct", "user")) is False
+    assert limiter._account_bucket("acct").tokens == tokens
+    assert asyncio.run(limiter.acquire("other", "user")) is True
+
+def test_throttle_error_code():
+    assert throttle_error_code(400, {"error": {"code": 131056}}) == 131056
+    assert throttle_error_code(400, {"error": {"code": 100}}) is None
+    assert throttle_error_code(400, {"error": "upstream rate limited"}) is None
+    assert throttle_error_code(429, {"error": "upstream rate limited"}) == 429
+    assert throttle_error_code(503, None) is None
+
+def _send(handler, limiter, recipient_id="user"):
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await make_meta_request(client, "POST", "https://graph.test/v1/me/messages", "token",
+                                           {"text": "hi"}, limiter, "acct", recipient_id)
+    return asyncio.run(run())
+
+def test_throttled_send_pauses_only_the_recipient_for_pair_limits(monkeypatch):
+    monkeypatch.setattr(settings, "META_THROTTLE_MAX_WAIT_SECONDS", 60.0)
+    limiter = MetaRateLimiter()
+    result = _send(lambda request: httpx.Response(400, json={"error": {"code": 131056}}, headers={"Retry-After": "7"}), limiter)
+    assert result["throttled"] is True and "defer" not in result
+    assert 6 < limiter._recipient_bucket("acct", "user").paused_until - time.monotonic() <= 7
+    assert limiter._account_bucket("acct").paused_until == 0.0
+
+def test_send_on_a_long_paused_account_is_deferred_without_a_request(monkeypatch):
+    monkeypatch.setattr(settings, "META_THROTTLE_MAX_WAIT_SECONDS", 1.0)
+    limiter = MetaRateLimiter()
+    limiter.throttle("acct", 30)
+    requests = []
+    result = _send(lambda request: requests.append(request) or httpx.Response(200, json={}), limiter)
+    assert result["defer"] is True and result["throttled"] is True
+    assert requests == []
+
+def test_string_error_body_is_a_plain_failure():
+    result = _send(lambda request: httpx.Response(400, json={"error": "bad gateway"}), MetaRateLimiter())
+    assert result["success"] is False and "throttled" not in result
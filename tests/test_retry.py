@@ -0,0 +1,160 @@
+import asyncio
+
+import pytest
+
+from app.services import retry
+from app.services.dispatcher import OutboundDispatcher
+from app.services.redriver import redrive_once
+from app.services.retry import SERVER_ERROR, THROTTLED, TRANSPORT, DeadLetterOutbox, classify_failure, retry_async
+
+class _Letters:
+    """In-memory stand-in for DeadLetterRepository."""
+
+    def __init__(self, pending=()):
+        self.saved = []
+        self.pending = list(pending)
+        self.replayed = []
+        self.released = []
+
+    def save(self, kind, platform, recipient_id, payload, error, attempts):
+        self.saved.append({"kind": kind, "platform": platform, "recipient_id": recipient_id,
+                           "payload": payload, "error": error, "attempts": attempts})
+
+    def reset_stuck(self):
+        pass
+
+    def claim_pending(self, limit):
+        claimed, self.pending = self.pending[:limit], self.pending[limit:]
+        return claimed
+
+    def mark_replayed(self, ids):
+        self.replayed.extend(ids)
+
+    def release(self, ids, error, max_replays, count_attempt=True):
+        self.released.extend(ids)
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(retry.random, "uniform", lambda low, high: 0)
+
+@pytest.mark.parametrize("result,expected", [
+    ({"success": False, "throttled": True, "status_code": 400}, THROTTLED),
+    ({"success": False, "status_code": 429}, THROTTLED),
+    ({"success": False, "error": "connect timeout"}, TRANSPORT),
+    ({"success": False, "status_code": 408}, TRANSPORT),
+    ({"success": False, "status_code": 502}, SERVER_ERROR),
+    ({"sent": False, "status_code": 421, "retryable": True}, SERVER_ERROR),
+    ({"success": False, "status_code": 400}, None),
+    ({"sent": False, "status_code": 503, "retryable": False}, None),
+])
+def test_classify_failure(result, expected):
+    assert classify_failure(result) == expected
+
+def _flaky(*results):
+    calls = []
+
+    async def operation():
+        calls.append(1)
+        return results[min(len(calls), len(results)) - 1]
+    return operation, calls
+
+def test_retries_until_success():
+    operation, calls = _flaky({"success": False, "status_code": 503}, {"success": True})
+    result, attempts, error_class = asyncio.run(retry_async(operation, "test"))
+    assert (result, attempts, error_class) == ({"success": True}, 2, None)
+
+def test_permanent_failure_is_not_retried_or_parked():
+    letters = _Letters()
+    operation, calls = _flaky({"success": False, "status_code": 400})
+    asyncio.run(DeadLetterOutbox(letters).deliver(operation, "outbound", "whatsapp", "u1", {"body": 1}))
+    assert len(calls) == 1 and letters.saved == []
+
+def test_exhausted_retries_are_parked(monkeypatch):
+    monkeypatch.setattr(retry.settings, "RETRY_MAX_ATTEMPTS", 3)
+    letters = _Letters()
+    operation, calls = _flaky({"success": False, "status_code": 503, "data": "unavailable"})
+    asyncio.run(DeadLetterOutbox(letters).deliver(operation, "outbound", "whatsapp", "u1", {"body": 1}))
+    assert len(calls) == 3
+    assert letters.saved == [{"kind": "outbound", "platform": "whatsapp", "recipient_id": "u1",
+                              "payload": {"body": 1}, "error": "unavailable", "attempts": 3}]
+
+def test_deferred_send_is_parked_without_retrying():
+    letters = _Letters()
+    operation, calls = _flaky({"success": False, "throttled": True, "defer": True, "error": "paused"})
+    asyncio.run(DeadLetterOutbox(letters).deliver(operation, "outbound", "instagram", "u1", {"body": 1}))
+    assert len(calls) == 1 and letters.saved[0]["error"] == "paused"
+
+def test_deliver_in_order_parks_the_failed_chunk_with_everything_after_it():
+    letters = _Letters()
+    sent = []
+
+    async def send(body):
+        if body == 2:
+            return {"success": False, "status_code": 400}
+        sent.append(body)
+        return {"success": True}
+
+    async def always_down(body):
+        return {"success": False, "status_code": 503}
+
+    outbox = DeadLetterOutbox(letters)
+    results = asyncio.run(outbox.deliver_in_order(send, [1, 2, 3], "outbound", "whatsapp", "u1"))
+    assert sent == [1] and len(results) == 2 and letters.saved == []
+
+    asyncio.run(outbox.deliver_in_order(always_down, [1, 2, 3], "outbound", "whatsapp", "u1"))
+    assert letters.saved[0]["payload"] == {"bodies": [1, 2, 3], "recipient_id": "u1"}
+
+def test_replay_parks_only_the_unsent_rest():
+    letters = _Letters()
+
+    async def send(body):
+        return {"success": body != 3}
+
+    result = asyncio.run(DeadLetterOutbox(letters).replay_in_order(send, [1, 2, 3, 4], "outbound", "whatsapp", "u1"))
+    assert result == {"success": True, "parked": 2}
+    assert letters.saved[0]["payload"] == {"bodies": [3, 4], "recipient_id": "u1"}
+
+def _letter(id, recipient_id="u1"):
+    return {"id": id, "kind": "outbound", "platform": "whatsapp", "recipient_id": recipient_id,
+            "payload": {"body": f"replay-{id}"}, "replay_count": 0}
+
+def test_redriver_replays_in_the_recipient_lane_behind_live_replies():
+    sent = []
+
+    class Adapter:
+        async def redeliver(self, payload):
+            sent.append(payload["body"])
+            return {"success": True}
+
+        async def send_live(self, text):
+            await asyncio.sleep(0.02)
+            sent.append(text)
+
+    letters = _Letters([_letter(1), _letter(2, "u2")])
+
+    async def scenario():
+        dispatcher = OutboundDispatcher(4)
+        adapter = Adapter()
+        dispatcher.submit("whatsapp", "u1", lambda: adapter.send_live("live reply"))
+        replayed = await redrive_once(letters, {"whatsapp": adapter}, None, dispatcher)
+        await dispatcher.stop(1)
+        return replayed
+
+    assert asyncio.run(scenario()) == 2
+    assert sent.index("live reply") < sent.index("replay-1")
+    assert letters.replayed == [1, 2]
+
+def test_failed_probe_keeps_the_group_parked():
+    class Adapter:
+        async def redeliver(self, payload):
+            raise RuntimeError("still down")
+
+    letters = _Letters([_letter(1), _letter(2)])
+
+    async def scenario():
+        dispatcher = OutboundDispatcher(4)
+        await redrive_once(letters, {"whatsapp": Adapter()}, None, dispatcher)
+        await dispatcher.stop(1)
+
+    asyncio.run(scenario())
+    assert letters.released == [1, 2] and letters.replayed == []
@@ -0,0 +1,37 @@
+import time
+
+import pytest
+
+from app.adapters.email.sanitizer import sanitize
+from bench_sanitizer import KNOWN_DIFFERENCES, legacy_sanitize, load_corpus
+
+CORPUS = list(load_corpus())
+BUDGETS = (200, 1000, 6000)
+
+@pytest.mark.parametrize("name,plain,html", [(name, plain, html) for name, (plain, html) in CORPUS])
+def test_matches_previous_implementation(name, plain, html):
+    for budget in BUDGETS:
+        new, old = sanitize(plain, html, budget), legacy_sanitize(plain, html, budget)
+        assert len(new) <= budget
+        if name in KNOWN_DIFFERENCES:
+            # Intended differences only cut more of the quoted tail, never change the reply itself.
+            assert old.startswith(new) and new, f"{name} @ {budget}"
+        else:
+            assert new == old, f"{name} @ {budget}"
+
+def test_known_differences_are_in_corpus():
+    assert set(KNOWN_DIFFERENCES) <= {name for name, _ in CORPUS}
+
+@pytest.mark.parametrize("html", [
+    "<style>x" * 40000,
+    "<script>x" * 40000,
+    "<style>a</style>b" * 20000 + "<style>" * 20000,
+], ids=["style", "script", "closed-then-unclosed"])
+def test_unclosed_raw_text_tags_stay_linear(html):
+    started = time.perf_counter()
+    sanitize(None, html, 6000)
+    # Rescanning to the end for every unclosed tag took seconds on these inputs.
+    assert time.perf_counter() - started < 1.5
+
+def test_unclosed_style_is_left_as_text():
+    assert sanitize(None, "<p>Halo</p><style>p{color:red}", 6000) == legacy_sanitize(None, "<p>Halo</p><style>p{color:red}")
@@ -0,0 +1,88 @@
+import asyncio
+
+from app.services.session_timeouts import SessionTimeoutEngine
+
+class _FakeRepo:
+    def __init__(self, idle=60.0, claimable=True):
+        self.idle = idle
+        self.claimable = claimable
+        self.claims = []
+
+    async def get_open_sessions(self, platforms, lookback_hours):
+        return []
+
+    async def get_session_activity(self, conversation_id):
+        return (True, self.idle)
+
+    async def claim_session(self, conversation_id):
+        self.claims.append(conversation_id)
+        return self.claimable
+
+def _engine(repo, timeout=0.05):
+    return SessionTimeoutEngine(repo=repo, timeout=timeout, reconcile_interval=3600,
+                                lookback_hours=1, concurrency=2)
+
+async def _start(engine):
+    expired = []
+
+    async def on_expire(conversation_id, platform, user_id):
+        expired.append((conversation_id, platform, user_id))
+
+    task = asyncio.create_task(engine.run(on_expire))
+    await asyncio.sleep(0)
+    return task, expired
+
+def test_touch_is_ignored_while_the_engine_is_not_running():
+    engine = _engine(_FakeRepo())
+    engine.touch("c1", "whatsapp", "u1")
+    assert engine.stats()["tracked"] == 0
+
+def test_due_session_is_claimed_then_expired_once():
+    repo = _FakeRepo()
+
+    async def scenario():
+        engine = _engine(repo)
+        task, expired = await _start(engine)
+        engine.touch("c1", "whatsapp", "u1")
+        engine.touch("c2", "email", "u2")  # not a timeout platform
+        await asyncio.sleep(0.2)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return engine, expired
+
+    engine, expired = asyncio.run(scenario())
+    assert expired == [("c1", "whatsapp", "u1")]
+    assert repo.claims == ["c1"]
+    assert engine.stats()["tracked"] == 0
+
+def test_lost_claim_skips_the_goodbye():
+    repo = _FakeRepo(claimable=False)
+
+    async def scenario():
+        engine = _engine(repo)
+        task, expired = await _start(engine)
+        engine.touch("c1", "instagram", "u1")
+        await asyncio.sleep(0.2)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return expired
+
+    assert asyncio.run(scenario()) == []
+    assert repo.claims == ["c1"]
+
+def test_activity_seen_elsewhere_defers_the_deadline():
+    repo = _FakeRepo(idle=0.0)
+
+    async def scenario():
+        engine = _engine(repo, timeout=0.1)
+        task, expired = await _start(engine)
+        engine.touch("c1", "whatsapp", "u1")
+        await asyncio.sleep(0.15)
+        deferred = engine.stats()["tracked"]
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return deferred, expired
+
+    deferred, expired = asyncio.run(scenario())
+    assert deferred == 1 and expired == []
+    assert repo.claims == []
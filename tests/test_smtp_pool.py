@@ -0,0 +1,135 @@
+import asyncio
+import socket
+from email.message import EmailMessage
+
+import aiosmtplib
+import pytest
+from aiosmtpd.controller import Controller
+
+from app.adapters.email.sender import EmailAdapter
+from app.adapters.email.smtp_pool import SmtpSessionPool
+from app.core.config import settings
+
+class _Inbox:
+    """aiosmtpd handler: refuses bounce@, drops the connection on drop@, keeps the rest."""
+
+    def __init__(self):
+        self.sessions = 0
+        self.delivered = []
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.sessions += 1
+        session.host_name = hostname
+        return responses
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith("bounce@"):
+            return "550 5.1.1 No such user"
+        if address.startswith("drop@"):
+            server.transport.close()
+            return "421 4.3.0 Going away"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.delivered.append(envelope.rcpt_tos[0])
+        return "250 Message accepted"
+
+@pytest.fixture
+def inbox():
+    handler = _Inbox()
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        handler.port = probe.getsockname()[1]
+    controller = Controller(handler, hostname="127.0.0.1", port=handler.port)
+    controller.start()
+    yield handler
+    controller.stop()
+
+def _pool(inbox, **kwargs):
+    return SmtpSessionPool("127.0.0.1", inbox.port, None, None, size=1, start_tls=False, timeout=5, **kwargs)
+
+def _message(to):
+    message = EmailMessage()
+    message["From"] = "bot@example.go.id"
+    message["To"] = to
+    message["Subject"] = "Re: Izin usaha"
+    message.set_content("Terima kasih")
+    return message
+
+def test_sequential_sends_reuse_one_session(inbox):
+    async def scenario():
+        pool = _pool(inbox)
+        for n in range(3):
+            await pool.send(_message(f"user{n}@example.com"))
+        await pool.close()
+
+    asyncio.run(scenario())
+    assert inbox.delivered == ["user0@example.com", "user1@example.com", "user2@example.com"]
+    assert inbox.sessions == 1
+
+def test_refused_recipient_keeps_the_session(inbox):
+    async def scenario():
+        pool = _pool(inbox)
+        with pytest.raises(aiosmtplib.SMTPRecipientsRefused):
+            await pool.send(_message("bounce@example.com"))
+        await pool.send(_message("user@example.com"))
+        await pool.close()
+
+    asyncio.run(scenario())
+    assert inbox.delivered == ["user@example.com"]
+    assert inbox.sessions == 1
+
+def test_lost_connection_discards_the_session(inbox):
+    async def scenario():
+        pool = _pool(inbox)
+        with pytest.raises(aiosmtplib.SMTPException):
+            await pool.send(_message("drop@example.com"))
+        assert not pool._idle
+        await pool.send(_message("user@example.com"))
+        await pool.close()
+
+    asyncio.run(scenario())
+    assert inbox.delivered == ["user@example.com"]
+    assert inbox.sessions == 2
+
+def test_batch_keeps_per_message_results(inbox):
+    async def scenario():
+        pool = _pool(inbox)
+        results = await pool.send_batch([_message("a@example.com"), _message("bounce@example.com"), _message("b@example.com")])
+        lost = await pool.send_batch([_message("c@example.com"), _message("drop@example.com"), _message("d@example.com")])
+        await pool.close()
+        return results, lost
+
+    results, lost = asyncio.run(scenario())
+    assert [type(r).__name__ for r in results] == ["tuple", "SMTPRecipientsRefused", "tuple"]
+    # Messages accepted before the connection dropped keep their responses.
+    assert isinstance(lost[0], tuple)
+    assert all(isinstance(r, aiosmtplib.SMTPException) for r in lost[1:])
+    assert inbox.delivered == ["a@example.com", "b@example.com", "c@example.com"]
+
+def test_batch_window_sends_queued_replies_over_one_session(inbox):
+    async def scenario():
+        pool = _pool(inbox, batch_window=0.05, batch_max=10)
+        await asyncio.gather(*(pool.send(_message(f"user{n}@example.com")) for n in range(4)))
+        await pool.close()
+
+    asyncio.run(scenario())
+    assert sorted(inbox.delivered) == [f"user{n}@example.com" for n in range(4)]
+    assert inbox.sessions == 1
+
+def test_sender_reports_smtp_outcomes(inbox, monkeypatch):
+    monkeypatch.setattr(settings, "EMAIL_USER", "bot@example.go.id")
+
+    async def scenario():
+        pool = _pool(inbox)
+        adapter = EmailAdapter(http=None, outbox=None, smtp=pool, tokens=None)
+        sent = await adapter._send_via_smtp("user@example.com", "Re: Izin", "<p>Halo</p>", "<m1@example.com>", "<m0@example.com> <m1@example.com>")
+        refused = await adapter._send_via_smtp("bounce@example.com", "Re: Izin", "<p>Halo</p>", None, None)
+        await pool.close()
+        return sent, refused
+
+    sent, refused = asyncio.run(scenario())
+    assert sent["sent"] is True and sent["message_id"]
+    assert refused == {"sent": False, "error": refused["error"], "retryable": False}
+    assert inbox.delivered == ["user@example.com"]
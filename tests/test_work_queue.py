@@ -0,0 +1,116 @@
+import asyncio
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import routes
+from app.services.work_queue import InboundWorkQueue, PRIORITY_HIGH, PRIORITY_NORMAL
+
+def _job(log, name, gate=None):
+    async def run():
+        if gate is not None:
+            await gate.wait()
+        log.append(name)
+    return run
+
+def test_full_queue_rejects_the_whole_batch():
+    async def scenario():
+        queue = InboundWorkQueue(workers=1, max_size=2)
+        queue.start()
+        gate = asyncio.Event()
+        log = []
+        # Park the only worker so queued jobs stay queued.
+        assert queue.try_submit([_job(log, "blocker", gate)])
+        await asyncio.sleep(0)
+        assert queue.try_submit([_job(log, "a")])
+        accepted = queue.try_submit([_job(log, "b"), _job(log, "c")])
+        free = queue.free_slots()
+        gate.set()
+        await queue.stop(timeout=1)
+        return accepted, free, log
+
+    accepted, free, log = asyncio.run(scenario())
+    assert accepted is False
+    assert free == 1
+    # Nothing from the rejected batch ran.
+    assert log == ["blocker", "a"]
+
+def test_high_priority_jobs_run_first():
+    async def scenario():
+        queue = InboundWorkQueue(workers=1, max_size=10)
+        queue.start()
+        gate = asyncio.Event()
+        log = []
+        queue.try_submit([_job(log, "blocker", gate)])
+        await asyncio.sleep(0)
+        queue.try_submit([_job(log, "n1"), _job(log, "n2")], PRIORITY_NORMAL)
+        queue.try_submit([_job(log, "h1")], PRIORITY_HIGH)
+        gate.set()
+        await queue.stop(timeout=1)
+        return log
+
+    assert asyncio.run(scenario()) == ["blocker", "h1", "n1", "n2"]
+
+def test_worker_pool_bounds_concurrency():
+    running = 0
+    peak = 0
+
+    async def job():
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+
+    async def scenario():
+        queue = InboundWorkQueue(workers=3, max_size=20)
+        queue.start()
+        assert queue.try_submit([job for _ in range(12)])
+        await queue.stop(timeout=1)
+
+    asyncio.run(scenario())
+    assert peak == 3
+
+def test_stop_drains_queued_work_then_refuses_more():
+    async def scenario():
+        queue = InboundWorkQueue(workers=1, max_size=10)
+        queue.start()
+        log = []
+        queue.try_submit([_job(log, n) for n in range(5)])
+        await queue.stop(timeout=1)
+        return queue, log, queue.try_submit([_job(log, "late")])
+
+    queue, log, late = asyncio.run(scenario())
+    assert log == [0, 1, 2, 3, 4]
+    assert queue.accepting is False
+    assert late is False
+
+def test_failing_job_does_not_kill_its_worker():
+    async def boom():
+        raise RuntimeError("boom")
+
+    async def scenario():
+        queue = InboundWorkQueue(workers=1, max_size=10)
+        queue.start()
+        log = []
+        queue.try_submit([boom, _job(log, "after")])
+        await queue.stop(timeout=1)
+        return log
+
+    assert asyncio.run(scenario()) == ["after"]
+
+def test_webhook_answers_503_with_retry_after_when_full(monkeypatch):
+    monkeypatch.setattr(routes.inbound_queue, "try_submit", lambda jobs, priority=PRIORITY_NORMAL: False)
+    monkeypatch.setattr(routes, "get_orchestrator", lambda: None)
+    monkeypatch.setattr(routes.settings, "INBOUND_RETRY_AFTER_SECONDS", 7)
+    app = FastAPI()
+    app.include_router(routes.router)
+    payload = {"entry": [{"changes": [{"value": {
+        "contacts": [{"profile": {"name": "Budi"}, "wa_id": "628111"}],
+        "messages": [{"from": "628111", "id": "wamid.1", "type": "text", "text": {"body": "halo"}}]
+    }}]}]}
+
+    response = TestClient(app).post("/whatsapp/webhook", json=payload)
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "7"